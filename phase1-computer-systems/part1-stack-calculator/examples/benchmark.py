@@ -0,0 +1,140 @@
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from tokenizer import (
+    RESERVED_CONSTANTS,
+    VALID_OPERATORS,
+    InvalidTokenError,
+    TokenType,
+    check_variable_name,
+    tokenize,
+)
+
+WORDS = ["3", "4.5", "-2", "1e3", "+", "-", "*", "/", "sqrt", "pi", "x", "rate"]
+
+
+@dataclass
+class MutableToken:
+    """Token as it was before interning: a plain, cheaper to build dataclass."""
+
+    type: TokenType
+    value: float | str
+
+
+def split_tokenize(expression: str) -> list[MutableToken]:
+    """Tokenize as before the scanner: split, then try float() on each token."""
+    result = []
+    for token in expression.split():
+        try:
+            result.append(MutableToken(TokenType.NUMBER, float(token)))
+        except ValueError:
+            if token in VALID_OPERATORS:
+                result.append(MutableToken(TokenType.OPERATOR, token))
+            elif token in RESERVED_CONSTANTS:
+                result.append(MutableToken(TokenType.CONSTANT, token))
+            elif check_variable_name(token):
+                result.append(MutableToken(TokenType.VARIABLE, token))
+            else:
+                raise InvalidTokenError(f"Invalid token: {token}")
+    return result
+
+
+def benchmark_tokenizer(lengths=(3, 15, 100), tokens: int = 300_000) -> None:
+    """Print tokens per second for the scanner and the split-based loop."""
+    rng = random.Random(0)
+    for length in lengths:
+        expressions = [
+            " ".join(rng.choice(WORDS) for _ in range(length))
+            for _ in range(max(1, tokens // length))
+        ]
+        count = length * len(expressions)
+        print(f"{length}-token expressions:")
+        baseline = None
+        for name, function in (("split", split_tokenize), ("scanner", tokenize)):
+            start = time.perf_counter()
+            for expression in expressions:
+                function(expression)
+            rate = count / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"  {name:>8}: {rate:>12,.0f} tokens/s  ({rate / baseline:.2f}x)")
+
+
+def benchmark_columns(rows=(100, 10_000, 1_000_000), expression="x 2 * y + sqrt"):
+    """Print rows per second for evaluate per row and evaluate_many."""
+    import numpy as np
+    from calculator import Calculator
+
+    rng = np.random.default_rng(0)
+    Calculator().evaluate_many(expression, x=[1.0], y=[1.0])  # warm up
+    for size in rows:
+        x = rng.uniform(-1, 10, size)
+        y = rng.uniform(-1, 10, size)
+        calc = Calculator()
+        start = time.perf_counter()
+        calc.evaluate_many(expression, x=x, y=y)
+        many = size / (time.perf_counter() - start)
+
+        sample = min(size, 10_000)
+        start = time.perf_counter()
+        for i in range(sample):
+            calc._vars.update(x=float(x[i]), y=float(y[i]))
+            try:
+                calc.evaluate(expression)
+            except ValueError:
+                pass
+        single = sample / (time.perf_counter() - start)
+        print(
+            f"{size:>9} rows: evaluate {single:>12,.0f} rows/s  "
+            f"evaluate_many {many:>14,.0f} rows/s  ({many / single:.1f}x)"
+        )
+
+
+def benchmark_parallel(count: int = 200_000, max_workers: int | None = None) -> None:
+    """Print lines per second for a batch on 1 to max_workers processes.
+
+    One workload reads no state; in the other, every tenth line reads ans
+    and is evaluated in order by the parent.
+    """
+    from batch import evaluate_lines
+    from calculator import Calculator
+    from parallel import evaluate_parallel
+
+    max_workers = max_workers or os.cpu_count() or 1
+    rng = random.Random(0)
+    stateless = [
+        f"{rng.randint(1, 99)} {rng.randint(1, 9)} * 3 sqrt + {rng.randint(1, 9)} /"
+        for _ in range(count)
+    ]
+    chained = [
+        "ans 2 /" if n % 10 == 9 else expression
+        for n, expression in enumerate(stateless)
+    ]
+    print(f"{count} lines, {os.cpu_count()} CPUs:")
+    for name, texts in (("stateless", stateless), ("ans every 10th", chained)):
+        lines = [("<bench>", n, text) for n, text in enumerate(texts, start=1)]
+        start = time.perf_counter()
+        for _ in evaluate_lines(Calculator(), lines):
+            pass
+        baseline = count / (time.perf_counter() - start)
+        print(f"  {name:>14} sequential: {baseline:>10,.0f} lines/s")
+        for workers in range(1, max_workers + 1):
+            start = time.perf_counter()
+            for _ in evaluate_parallel(lines, workers):
+                pass
+            rate = count / (time.perf_counter() - start)
+            print(
+                f"  {name:>14} {workers:>2} workers: {rate:>10,.0f} lines/s  "
+                f"({rate / baseline:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_tokenizer()
+    benchmark_columns()
+    benchmark_parallel()
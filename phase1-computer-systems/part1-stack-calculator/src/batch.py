@@ -0,0 +1,157 @@
+import argparse
+import sys
+from dataclasses import dataclass
+from typing import Iterable, Iterator, TextIO
+
+from calculator import Calculator
+
+# Results held before each write, bounding memory whatever the input size.
+BUFFER_LINES = 4096
+
+
+@dataclass
+class LineResult:
+    """The outcome of one input line: its output, or the error it raised."""
+
+    source: str
+    line: int
+    output: str | None
+    error: str | None = None
+
+    def format_error(self) -> str:
+        return f"{self.source}:{self.line}: {self.error}"
+
+
+def read_lines(
+    paths: Iterable[str],
+) -> Iterator[tuple[str, int, str] | LineResult]:
+    """Yields (source, line number, text) for each non-blank line, lazily.
+
+    A path of "-" reads stdin. A source that cannot be opened or decoded
+    gives a LineResult with the error instead, numbered as the first line
+    not read, and reading carries on with the next path.
+    """
+    for path in paths:
+        if path == "-":
+            source, lines = "<stdin>", _numbered("<stdin>", sys.stdin)
+        else:
+            source, lines = path, _read_file(path)
+        number = 0
+        try:
+            for line in lines:
+                number = line[1]
+                yield line
+        except (OSError, UnicodeDecodeError) as e:
+            yield LineResult(source, number + 1, None, f"{type(e).__name__}: {e}")
+
+
+def _read_file(path: str) -> Iterator[tuple[str, int, str]]:
+    with open(path) as file:
+        yield from _numbered(path, file)
+
+
+def _numbered(source: str, file: TextIO) -> Iterator[tuple[str, int, str]]:
+    for number, text in enumerate(file, start=1):
+        text = text.strip()
+        if text:
+            yield source, number, text
+
+
+def evaluate_line(
+    calc: Calculator, source: str, number: int, text: str
+) -> LineResult | None:
+    """Returns the result of one line as `handle_input` gives it.
+
+    An error is reported on the result rather than raised. Returns None if
+    the line is `exit` or `quit`.
+    """
+    try:
+        result = calc.handle_input(text)
+    except Exception as e:
+        return LineResult(source, number, None, f"{type(e).__name__}: {e}")
+    if result.quit:
+        return None
+    return LineResult(source, number, result.output)
+
+
+def evaluate_lines(
+    calc: Calculator, lines: Iterable[tuple[str, int, str] | LineResult]
+) -> Iterator[LineResult]:
+    """Yields the result of each line, stopping at `exit` or `quit`.
+
+    Lines go through `handle_input`, so `ans`, variables and commands such
+    as `clear` behave as in the REPL. Evaluation carries on past errors.
+    LineResults from `read_lines` are passed through as they are.
+    """
+    for line in lines:
+        if isinstance(line, LineResult):
+            yield line
+            continue
+        result = evaluate_line(calc, *line)
+        if result is None:
+            return
+        yield result
+
+
+def write_results(
+    results: Iterable[LineResult],
+    out: TextIO,
+    err: TextIO,
+    buffer_lines=BUFFER_LINES,
+) -> int:
+    """Writes outputs to out and errors to err. Returns the error count.
+
+    Both are written in blocks of up to buffer_lines lines, out first.
+    Whatever is buffered is written even if results raises.
+    """
+    errors = 0
+    outputs, messages = [], []
+    try:
+        for result in results:
+            if result.error is not None:
+                errors += 1
+                messages.append(result.format_error() + "\n")
+            elif result.output is not None:
+                outputs.append(result.output + "\n")
+            if len(outputs) + len(messages) >= buffer_lines:
+                _flush(outputs, out, messages, err)
+    finally:
+        _flush(outputs, out, messages, err)
+    return errors
+
+
+def _flush(outputs: list[str], out: TextIO, messages: list[str], err: TextIO) -> None:
+    out.write("".join(outputs))
+    err.write("".join(messages))
+    outputs.clear()
+    messages.clear()
+    out.flush()
+    err.flush()
+
+
+def main(argv=None) -> int:
+    """Evaluates expressions from files or stdin. Returns the exit status."""
+    parser = argparse.ArgumentParser(
+        description="Evaluate postfix expressions, one per line."
+    )
+    parser.add_argument(
+        "files", nargs="*", default=["-"], help="input files; - for stdin"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="evaluate on a process pool"
+    )
+    args = parser.parse_args(argv)
+
+    lines = read_lines(args.files)
+    if args.workers is None:
+        results = evaluate_lines(Calculator(), lines)
+    else:
+        from parallel import evaluate_parallel
+
+        results = evaluate_parallel(lines, args.workers)
+    errors = write_results(results, sys.stdout, sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
 import math
+from collections import OrderedDict
 from dataclasses import dataclass
+from typing import Callable
 
-from stack import Stack
-from tokenizer import TokenType, tokenize
+from stack import ArrayStack, Stack, StackOverflowError
+from tokenizer import Token, TokenType, tokenize
+
+DEFAULT_CACHE_SIZE = 1024
 
 OPERATORS = {
     "+": (2, lambda a, b: a + b),
@@ -22,6 +26,12 @@ CONSTANTS = {
     "e": math.e,
 }
 
+# Inputs handle_input treats as REPL commands rather than expressions.
+COMMANDS = {"exit", "quit", "clear", "help", "vars"}
+
+# Binary operators compiled to the Python operator of the same name.
+INFIX_OPERATORS = {"+", "-", "*", "/"}
+
 
 @dataclass
 class REPLResult:
@@ -53,18 +63,296 @@ class UndefinedVariableError(CalculatorError):
     pass
 
 
+@dataclass
+class CacheInfo:
+    """Statistics of a Calculator's compiled-expression cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    compiles: int
+    size: int
+    maxsize: int
+
+
+def compile_expression(
+    expression: str, stack_capacity: int | None = None
+) -> Callable[..., float]:
+    """Compiles a postfix expression to a Python function.
+
+    The function is called as `function(variables, ans=0.0)`. Variables are
+    looked up in, and STO writes to, the variables dict at call time, so one
+    compiled expression serves any bindings. Operands are kept in local
+    variables rather than on a stack, but the result, and any error, is what
+    evaluating on a Stack (or an ArrayStack of stack_capacity) would give,
+    raised at the same point. Tokenizing errors are raised here.
+
+    `function.reads` holds the names the expression may read, as given by
+    variable_reads.
+    """
+    return _compile(tokenize(expression), expression, stack_capacity)
+
+
+def _compile(
+    tokens: list[Token], expression: str, stack_capacity: int | None
+) -> Callable[..., float]:
+    lines = ["def expression(variables, ans=0.0):", "    try:"]
+    lines.extend(f"        {line}" for line in _translate(tokens, stack_capacity))
+    lines.append("    except KeyError as e:")
+    lines.append(
+        "        raise UndefinedVariableError("
+        "f\"Variable '{e.args[0]}' is not defined.\") from None"
+    )
+    source = "\n".join(lines) + "\n"
+
+    def leftover(values: list[float]) -> Stack | ArrayStack:
+        stack = Stack() if stack_capacity is None else ArrayStack(stack_capacity)
+        stack.extend(values)
+        return stack
+
+    namespace = {
+        **{name: operation for name, (_, operation) in OPERATORS.items()},
+        "inf": math.inf,
+        "nan": math.nan,
+        "leftover": leftover,
+        "CalculatorError": CalculatorError,
+        "InsufficientOperandsError": InsufficientOperandsError,
+        "TooManyOperandsError": TooManyOperandsError,
+        "UndefinedVariableError": UndefinedVariableError,
+    }
+    exec(compile(source, f"<expression {expression!r}>", "exec"), namespace)
+    function = namespace["expression"]
+    function.source = source
+    function.reads = variable_reads(tokens)
+    return function
+
+
+def variable_reads(tokens: list[Token]) -> frozenset[str]:
+    """Returns the variable names, including ans, that tokens may read.
+
+    The variable after STO is written, not read.
+    """
+    return frozenset(
+        token.value
+        for i, token in enumerate(tokens)
+        if token.type == TokenType.VARIABLE and not (i and tokens[i - 1].value == "STO")
+    )
+
+
+def _translate(tokens: list[Token], stack_capacity: int | None) -> list[str]:
+    """Returns the statements that evaluate tokens.
+
+    Operand i of the stack is held in local s<i>, or inlined where it is a
+    literal or `ans`. Errors that depend only on the shape of the
+    expression are found here and compiled to a raise at the point where
+    evaluation would have hit them.
+    """
+    lines = []
+    stack = []
+    last_token_consumed = -1
+    for i, token in enumerate(tokens):
+        if last_token_consumed >= i:
+            continue
+        slot = f"s{len(stack)}"
+
+        if token.type == TokenType.NUMBER:
+            operand = _literal(token.value)
+
+        elif token.type == TokenType.CONSTANT:
+            operand = _literal(CONSTANTS[token.value])
+
+        elif token.type == TokenType.VARIABLE:
+            if token.value == "ans":
+                operand = "ans"
+            else:
+                lines.append(f"{slot} = variables[{token.value!r}]")
+                operand = slot
+
+        elif token.value == "STO":
+            if len(stack) < 1:
+                return lines + [
+                    _raise(
+                        InsufficientOperandsError,
+                        "Not enough operands for 'STO' operation.",
+                    )
+                ]
+            last_token_consumed = i + 1
+            if last_token_consumed >= len(tokens):
+                return lines + [
+                    _raise(CalculatorError, "No variable provided for 'STO' operation.")
+                ]
+            next_token = tokens[last_token_consumed]
+            if next_token.type != TokenType.VARIABLE:
+                return lines + [
+                    _raise(
+                        CalculatorError,
+                        f"Expected variable after 'STO', got '{next_token.value}'.",
+                    )
+                ]
+            if next_token.value == "ans":
+                return lines + [
+                    _raise(CalculatorError, "Cannot overwrite reserved name 'ans'.")
+                ]
+            lines.append(f"variables[{next_token.value!r}] = {stack[-1]}")
+            continue
+
+        else:
+            arity, _ = OPERATORS[token.value]
+            if len(stack) < arity:
+                return lines + [
+                    _raise(
+                        InsufficientOperandsError,
+                        f"Not enough operands for '{token.value}' operation.",
+                    )
+                ]
+            operands = stack[-arity:]
+            del stack[-arity:]
+            if token.value in INFIX_OPERATORS:
+                value = f" {token.value} ".join(operands)
+            else:
+                value = f"{token.value}({', '.join(operands)})"
+            slot = f"s{len(stack)}"
+            lines.append(f"{slot} = {value}")
+            stack.append(slot)
+            continue
+
+        if len(stack) == stack_capacity:
+            return lines + [
+                _raise(
+                    CalculatorError,
+                    "Expression needs too many operands. "
+                    f"Stack capacity of {stack_capacity} exceeded.",
+                )
+            ]
+        stack.append(operand)
+
+    if len(stack) > 1:
+        return lines + [
+            "raise TooManyOperandsError("
+            "f'Too many operands left after evaluation. "
+            f"{{leftover([{', '.join(stack)}])}}')"
+        ]
+    return lines + [f"return {stack[0]}"]
+
+
+def _literal(value: float) -> str:
+    """Returns Python source for a float, parenthesized if negative."""
+    if math.isnan(value):
+        return "nan"
+    text = repr(value) if math.isfinite(value) else "inf" if value > 0 else "-inf"
+    return f"({text})" if text.startswith("-") else text
+
+
+def _raise(error: type, message: str) -> str:
+    return f"raise {error.__name__}({message!r})"
+
+
 class Calculator:
 
-    def __init__(self) -> None:
-        """Initializes the calculator."""
+    def __init__(
+        self, stack_capacity: int | None = None, cache_size=DEFAULT_CACHE_SIZE
+    ) -> None:
+        """Initializes the calculator.
+
+        With a stack_capacity, expressions are evaluated on one reusable
+        ArrayStack of floats holding at most that many operands. The
+        cache_size most recently evaluated expression strings are cached.
+        """
         self._vars = {}
         self._ans = 0.0
+        self._stack_capacity = stack_capacity
+        self._stack = None if stack_capacity is None else ArrayStack(stack_capacity)
+        # Expression -> its tokens once seen, or its compiled function once
+        # seen again.
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self.cache_clear()
 
     def evaluate(self, expression: str) -> float:
-        """Evaluates a postfix expressions and returns the result."""
-        tokens = tokenize(expression)
-        stack = Stack()
+        """Evaluates a postfix expressions and returns the result.
+
+        An expression is tokenized and interpreted the first time it is
+        seen. If it is seen again while still cached, it is compiled, and
+        from then on evaluating it just calls the compiled function.
+        """
+        return self._execute(self._lookup(expression))
+
+    def evaluate_many(self, expression: str, /, **columns) -> "ColumnResult":
+        """Evaluates a postfix expression over NumPy columns of bindings.
+
+        Columns are bound by name, on top of the stored variables, and a
+        column named ans replaces ans. Returns a vectorized.ColumnResult
+        with per-row values and error masks. Needs NumPy.
+        """
+        from vectorized import evaluate_columns
+
+        ans = columns.pop("ans", self._ans)
+        return evaluate_columns(expression, {**self._vars, **columns}, ans)
+
+    def compile(self, expression: str) -> Callable[..., float]:
+        """Returns expression compiled, caching it.
 
+        See compile_expression for how to call the result.
+        """
+        entry = self._lookup(expression)
+        if isinstance(entry, list):
+            entry = self._compile(expression, entry)
+        return entry
+
+    def _lookup(self, expression: str) -> list[Token] | Callable[..., float]:
+        """Returns the cache entry for expression, compiling it on a hit."""
+        cache = self._cache
+        entry = cache.get(expression)
+        if entry is None:
+            self._misses += 1
+            entry = tokenize(expression)
+            if self._cache_size > 0:
+                cache[expression] = entry
+                if len(cache) > self._cache_size:
+                    cache.popitem(last=False)
+                    self._evictions += 1
+            return entry
+        self._hits += 1
+        cache.move_to_end(expression)
+        if isinstance(entry, list):
+            entry = self._compile(expression, entry)
+        return entry
+
+    def _execute(self, entry: list[Token] | Callable[..., float]) -> float:
+        """Evaluates a cache entry against the stored variables and ans."""
+        if isinstance(entry, list):
+            return self._interpret(entry)
+        return entry(self._vars, self._ans)
+
+    def _compile(self, expression: str, tokens: list[Token]) -> Callable[..., float]:
+        function = _compile(tokens, expression, self._stack_capacity)
+        self._compiles += 1
+        if expression in self._cache:
+            self._cache[expression] = function
+        return function
+
+    def _interpret(self, tokens: list[Token]) -> float:
+        """Evaluates tokens on a stack and returns the result."""
+        if self._stack is None:
+            stack = Stack()
+        else:
+            stack = self._stack
+            stack.clear()
+
+        try:
+            self._run(tokens, stack)
+        except StackOverflowError as e:
+            raise CalculatorError(f"Expression needs too many operands. {e}") from e
+
+        if stack.size() > 1:
+            raise TooManyOperandsError(
+                f"Too many operands left after evaluation. {stack}"
+            )
+
+        return stack.peek()
+
+    def _run(self, tokens: list, stack: Stack | ArrayStack) -> None:
+        """Evaluates tokens onto the given stack."""
         last_token_consumed = -1
         for i, token in enumerate(tokens):
             if last_token_consumed >= i:
@@ -105,15 +393,10 @@ class Calculator:
                             f"Not enough operands for '{token.value}' operation."
                         )
 
-                    result = None
                     if arity == 2:
-                        b = stack.pop()
-                        a = stack.pop()
-                        result = operation(a, b)
+                        stack.binop(operation)
                     elif arity == 1:
-                        a = stack.pop()
-                        result = operation(a)
-                    stack.push(result)
+                        stack.push(operation(stack.pop()))
 
             elif token.type == TokenType.VARIABLE:
                 if token.value == "ans":
@@ -125,12 +408,24 @@ class Calculator:
                         f"Variable '{token.value}' is not defined."
                     )
 
-        if stack.size() > 1:
-            raise TooManyOperandsError(
-                f"Too many operands left after evaluation. {stack}"
-            )
-
-        return stack.peek()
+    def cache_info(self) -> CacheInfo:
+        """Returns the expression cache statistics."""
+        return CacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            compiles=self._compiles,
+            size=len(self._cache),
+            maxsize=self._cache_size,
+        )
+
+    def cache_clear(self) -> None:
+        """Empties the expression cache and zeroes its statistics."""
+        self._cache.clear()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._compiles = 0
 
     def repl(self) -> None:
         """Starts a REPL for the calculator."""
@@ -191,5 +486,11 @@ class Calculator:
 
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 or not sys.stdin.isatty():
+        from batch import main
+
+        sys.exit(main())
     calc = Calculator()
     calc.repl()
@@ -0,0 +1,126 @@
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from batch import LineResult, evaluate_line
+from calculator import COMMANDS, Calculator, variable_reads
+
+CHUNK_SIZE = 2048
+# Chunks submitted per worker ahead of the one being consumed.
+CHUNKS_AHEAD = 2
+
+
+class StateDependencyError(Exception):
+    """Raised when a line depends on earlier lines and state is not allowed."""
+
+    pass
+
+
+# The worker's Calculator, built once per process by _start_worker.
+_calc = None
+
+
+def _start_worker() -> None:
+    global _calc
+    _calc = Calculator()
+
+
+def _evaluate_chunk(texts: list[str]) -> list[tuple | None]:
+    """Evaluates the lines of a chunk that do not read any state.
+
+    Each such line gives (value, error, stores), where stores are the
+    variables its STOs wrote, which happens even when the line fails later.
+    Lines that read variables or ans, and commands, give None: their
+    results depend on earlier lines.
+    """
+    results = []
+    for text in texts:
+        if text in COMMANDS:
+            results.append(None)
+            continue
+        stores = _calc._vars = {}
+        try:
+            entry = _calc._lookup(text)
+            if isinstance(entry, list):
+                reads = variable_reads(entry)
+            else:
+                reads = entry.reads
+            if reads:
+                results.append(None)
+                continue
+            results.append((_calc._execute(entry), None, stores))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}", stores))
+    return results
+
+
+def evaluate_parallel(
+    lines: Iterable[tuple[str, int, str] | LineResult],
+    workers: int | None = None,
+    chunk_size=CHUNK_SIZE,
+    allow_state=True,
+) -> Iterator[LineResult]:
+    """Yields the same results as batch.evaluate_lines, in input order.
+
+    Lines are sent in chunks to a pool of worker processes, each with its
+    own Calculator, which evaluate every line that reads no variables or
+    ans. Those results do not depend on anything before them. Lines that
+    do read state are evaluated here, in order, on one Calculator that has
+    seen the effect (ans and STOs) of every line before them, so results
+    are exactly those of a sequential run; only the stateless lines scale
+    with workers. With allow_state False, the first stateful line raises
+    StateDependencyError instead. LineResults from `read_lines` are passed
+    through in order.
+
+    At most CHUNKS_AHEAD chunks per worker are in flight, so memory stays
+    bounded for any input size.
+    """
+    workers = workers or os.cpu_count() or 1
+    calc = Calculator()
+    lines = iter(lines)
+    with ProcessPoolExecutor(workers, initializer=_start_worker) as pool:
+        pending = deque()
+
+        def submit() -> bool:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if chunk:
+                texts = [line[2] for line in chunk if not isinstance(line, LineResult)]
+                pending.append((chunk, pool.submit(_evaluate_chunk, texts)))
+            return bool(chunk)
+
+        while len(pending) < workers * CHUNKS_AHEAD and submit():
+            pass
+        try:
+            while pending:
+                chunk, future = pending.popleft()
+                submit()
+                results = iter(future.result())
+                for line in chunk:
+                    if isinstance(line, LineResult):
+                        yield line
+                        continue
+                    source, number, text = line
+                    result = next(results)
+                    if result is not None:
+                        value, error, stores = result
+                        calc._vars.update(stores)
+                        if error is not None:
+                            yield LineResult(source, number, None, error)
+                            continue
+                        calc._ans = value
+                        yield LineResult(source, number, str(value))
+                        continue
+                    if not allow_state:
+                        raise StateDependencyError(
+                            f"{source}:{number}: '{text}' depends on earlier "
+                            "lines through variables, ans or a command."
+                        )
+                    result = evaluate_line(calc, source, number, text)
+                    if result is None:
+                        return
+                    yield result
+        finally:
+            for _, future in pending:
+                future.cancel()
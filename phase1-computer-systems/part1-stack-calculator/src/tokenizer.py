@@ -4,6 +4,26 @@ from enum import Enum
 
 VALID_OPERATORS = {"+", "-", "*", "/", "sin", "cos", "tan", "log", "exp", "sqrt", "STO"}
 RESERVED_CONSTANTS = {"pi", "e"}
+INTERNED_TOKENS = 4096
+
+_VARIABLE_NAME = re.compile(r"[a-zA-Z][a-zA-Z0-9]*")
+
+# The same grammar as float(): underscores only between digits, and any
+# Unicode decimal digit, which \d matches too.
+_DIGITS = r"\d(?:_?\d)*"
+_FLOAT = (
+    rf"[+-]?(?:(?:{_DIGITS}(?:\.(?:{_DIGITS})?)?|\.{_DIGITS})"
+    rf"(?:[eE][+-]?{_DIGITS})?|(?i:inf(?:inity)?|nan))"
+)
+
+# One whitespace-separated token per match, in the group naming its kind.
+# Any run of non-space characters that is not a whole NUMBER or NAME is
+# INVALID. Operators and constants are NAMEs or INVALID here, but are
+# found in _interned first.
+_SCANNER = re.compile(
+    rf"\s*(?:(?P<NUMBER>{_FLOAT})|(?P<NAME>{_VARIABLE_NAME.pattern})"
+    r"|(?P<INVALID>\S+))(?!\S)"
+)
 
 
 class TokenType(Enum):
@@ -13,12 +33,22 @@ class TokenType(Enum):
     VARIABLE = "VARIABLE"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Token:
+    """A token. Frozen, since tokenize hands out the same Token repeatedly."""
+
     type: TokenType
     value: float | str
 
 
+# Token text -> Token. Operators and constants are always here; numbers
+# and variable names are added until there are INTERNED_TOKENS entries.
+_interned = {
+    **{name: Token(TokenType.OPERATOR, name) for name in VALID_OPERATORS},
+    **{name: Token(TokenType.CONSTANT, name) for name in RESERVED_CONSTANTS},
+}
+
+
 class TokenizerError(Exception):
     """Base tokenizer error"""
 
@@ -40,33 +70,37 @@ class EmptyInputError(TokenizerError):
 def check_variable_name(name: str) -> bool:
     """Checks if a variable name is valid."""
     return (
-        re.fullmatch(r"[a-zA-Z][a-zA-Z0-9]*", name) is not None
+        _VARIABLE_NAME.fullmatch(name) is not None
         and name not in RESERVED_CONSTANTS
         and name not in VALID_OPERATORS
     )
 
 
 def tokenize(expression: str) -> list[Token]:
-    """Tokenizes a postfix expression into a list of Tokens."""
-    expression = expression.strip()
-    if not expression:
-        raise EmptyInputError("Input expression is empty.")
+    """Tokenizes a postfix expression into a list of Tokens.
 
-    tokens = expression.split()
+    Tokens are separated by whitespace. A token is a NUMBER if `float()`
+    accepts it, so `-7`, `1e3`, `1_000` and `inf` are all numbers. One
+    scan with _SCANNER classifies every token; operators, constants and
+    tokens seen before are looked up rather than built again.
+    """
     result = []
-
-    for token in tokens:
-        try:
-            value = float(token)
-            result.append(Token(TokenType.NUMBER, value))
-        except ValueError:
-            if token in VALID_OPERATORS:
-                result.append(Token(TokenType.OPERATOR, token))
-            elif token in RESERVED_CONSTANTS:
-                result.append(Token(TokenType.CONSTANT, token))
-            elif check_variable_name(token):
-                result.append(Token(TokenType.VARIABLE, token))
+    interned = _interned
+    for match in _SCANNER.finditer(expression):
+        kind = match.lastgroup
+        text = match[kind]
+        token = interned.get(text)
+        if token is None:
+            if kind == "NUMBER":
+                token = Token(TokenType.NUMBER, float(text))
+            elif kind == "NAME":
+                token = Token(TokenType.VARIABLE, text)
             else:
-                raise InvalidTokenError(f"Invalid token: {token}")
+                raise InvalidTokenError(f"Invalid token: {text}")
+            if len(interned) < INTERNED_TOKENS:
+                interned[text] = token
+        result.append(token)
 
+    if not result:
+        raise EmptyInputError("Input expression is empty.")
     return result
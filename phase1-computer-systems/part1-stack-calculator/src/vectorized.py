@@ -0,0 +1,147 @@
+from dataclasses import dataclass
+
+import numpy as np
+from calculator import (
+    CONSTANTS,
+    OPERATORS,
+    CalculatorError,
+    InsufficientOperandsError,
+    TooManyOperandsError,
+    UndefinedVariableError,
+)
+from tokenizer import TokenType, tokenize
+
+# The NumPy ufunc for each entry in OPERATORS.
+UFUNCS = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.divide,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "log": np.log,
+    "exp": np.exp,
+    "sqrt": np.sqrt,
+}
+
+# Operator -> (error, rows check). The check takes the operands and the
+# ufunc's result and returns the rows where the scalar operator raises the
+# error; ufuncs return inf or NaN there instead.
+ROW_ERRORS = {
+    "/": (ZeroDivisionError, lambda a, b, result: b == 0),
+    "sin": (ValueError, lambda a, result: np.isinf(a)),
+    "cos": (ValueError, lambda a, result: np.isinf(a)),
+    "tan": (ValueError, lambda a, result: np.isinf(a)),
+    "log": (ValueError, lambda a, result: a <= 0),
+    "sqrt": (ValueError, lambda a, result: a < 0),
+    "exp": (OverflowError, lambda a, result: np.isinf(result) & np.isfinite(a)),
+}
+
+
+@dataclass
+class ColumnResult:
+    """Per-row results of evaluating one expression over columns.
+
+    `errors` maps each exception `Calculator.evaluate` would have raised for
+    some rows to a mask of those rows. Each failed row is in exactly one
+    mask, for the first error it hit, and its value is NaN.
+    """
+
+    values: np.ndarray
+    errors: dict[type, np.ndarray]
+
+    @property
+    def failed(self) -> np.ndarray:
+        """Mask of the rows that raised any error."""
+        failed = np.zeros(self.values.shape, dtype=bool)
+        for mask in self.errors.values():
+            failed |= mask
+        return failed
+
+
+def evaluate_columns(expression: str, variables: dict, ans=0.0) -> ColumnResult:
+    """Evaluates a postfix expression once over whole columns.
+
+    Variables and ans may be scalars or equal-length arrays, which are
+    broadcast together. Each operator is applied to every row at once by
+    its ufunc, so values match `Calculator.evaluate` row by row to within
+    rounding. Errors that depend on the row are recorded in the result's
+    masks; errors in the expression itself are raised as evaluate raises
+    them. STO binds a variable for the rest of the expression only.
+    """
+    tokens = tokenize(expression)
+    variables = {
+        name: np.asarray(value, dtype=float) for name, value in variables.items()
+    }
+    ans = np.asarray(ans, dtype=float)
+    shape = np.broadcast_shapes(
+        ans.shape, *(value.shape for value in variables.values())
+    )
+    errors = {}
+    failed = np.zeros(shape, dtype=bool)
+    stack = []
+
+    with np.errstate(all="ignore"):
+        last_token_consumed = -1
+        for i, token in enumerate(tokens):
+            if last_token_consumed >= i:
+                continue
+
+            if token.type == TokenType.NUMBER:
+                stack.append(np.float64(token.value))
+
+            elif token.type == TokenType.CONSTANT:
+                stack.append(np.float64(CONSTANTS[token.value]))
+
+            elif token.type == TokenType.VARIABLE:
+                if token.value == "ans":
+                    stack.append(ans)
+                elif token.value in variables:
+                    stack.append(variables[token.value])
+                else:
+                    raise UndefinedVariableError(
+                        f"Variable '{token.value}' is not defined."
+                    )
+
+            elif token.value == "STO":
+                if not stack:
+                    raise InsufficientOperandsError(
+                        "Not enough operands for 'STO' operation."
+                    )
+                last_token_consumed = i + 1
+                if last_token_consumed >= len(tokens):
+                    raise CalculatorError("No variable provided for 'STO' operation.")
+                next_token = tokens[last_token_consumed]
+                if next_token.type != TokenType.VARIABLE:
+                    raise CalculatorError(
+                        f"Expected variable after 'STO', got '{next_token.value}'."
+                    )
+                if next_token.value == "ans":
+                    raise CalculatorError("Cannot overwrite reserved name 'ans'.")
+                variables[next_token.value] = stack[-1]
+
+            else:
+                arity, _ = OPERATORS[token.value]
+                if len(stack) < arity:
+                    raise InsufficientOperandsError(
+                        f"Not enough operands for '{token.value}' operation."
+                    )
+                operands = stack[-arity:]
+                del stack[-arity:]
+                result = UFUNCS[token.value](*operands)
+                if token.value in ROW_ERRORS:
+                    error, check = ROW_ERRORS[token.value]
+                    rows = check(*operands, result) & ~failed
+                    if rows.any():
+                        errors[error] = errors.get(error, False) | rows
+                        failed |= rows
+                stack.append(result)
+
+    if len(stack) > 1:
+        raise TooManyOperandsError(
+            f"Too many operands left after evaluation. {len(stack)} columns."
+        )
+    values = np.broadcast_to(stack[0], shape).astype(float)
+    values[failed] = np.nan
+    return ColumnResult(values, errors)
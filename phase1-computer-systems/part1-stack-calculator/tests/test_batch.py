@@ -0,0 +1,115 @@
+import io
+import tracemalloc
+
+import pytest
+from batch import LineResult, evaluate_lines, main, read_lines, write_results
+from calculator import Calculator
+
+
+def run(text: str, buffer_lines=4096) -> tuple[str, str, int]:
+    """Evaluate text as a batch and return (stdout, stderr, error count)."""
+    lines = (
+        ("<test>", number, line)
+        for number, line in enumerate(text.splitlines(), start=1)
+        if line
+    )
+    out, err = io.StringIO(), io.StringIO()
+    errors = write_results(evaluate_lines(Calculator(), lines), out, err, buffer_lines)
+    return out.getvalue(), err.getvalue(), errors
+
+
+def test_ans_and_variables_carry_through():
+    """Test that each line sees ans and variables from earlier lines."""
+    out, err, errors = run("3 4 +\nans 2 *\n5 STO x\nx ans +\n")
+    assert out == "7.0\n14.0\n5.0\n10.0\n"
+    assert err == ""
+    assert errors == 0
+
+
+def test_errors_reported_with_line_numbers():
+    """Test that a failing line is reported and the batch carries on."""
+    out, err, errors = run("1 2 +\n\n1 0 /\nfoo\nans 1 +\n")
+    assert out == "3.0\n4.0\n"
+    assert err == (
+        "<test>:3: ZeroDivisionError: float division by zero\n"
+        "<test>:4: UndefinedVariableError: Variable 'foo' is not defined.\n"
+    )
+    assert errors == 2
+
+
+def test_repl_commands():
+    """Test that REPL commands work, and quit ends the batch."""
+    out, _, _ = run("2 STO a\nvars\nclear\nquit\n5\n")
+    assert out == "2.0\na: 2.0\nAll variables cleared.\n"
+
+
+def test_small_buffer_keeps_order():
+    """Test that flushing often writes the same output."""
+    text = "\n".join(f"{n} 1 +" for n in range(10))
+    assert run(text, buffer_lines=3) == run(text)
+
+
+def test_files_and_stdin(tmp_path, monkeypatch, capsys):
+    """Test main over a file then stdin, sharing one calculator."""
+    path = tmp_path / "input.txt"
+    path.write_text("1 2 +\nbad$\n")
+    monkeypatch.setattr("sys.stdin", io.StringIO("ans 10 *\n"))
+    assert main([str(path), "-"]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "3.0\n30.0\n"
+    assert captured.err == f"{path}:2: InvalidTokenError: Invalid token: bad$\n"
+    assert list(read_lines([str(path)])) == [
+        (str(path), 1, "1 2 +"),
+        (str(path), 2, "bad$"),
+    ]
+
+
+def test_unreadable_sources_reported(tmp_path, monkeypatch, capsys):
+    """Test that missing and undecodable sources are errors of their own."""
+    path = tmp_path / "a.txt"
+    path.write_text("1 2 +\n")
+    missing = tmp_path / "missing.txt"
+    stdin = io.TextIOWrapper(io.BytesIO(b"ans 1 +\n\xff\n"), encoding="utf-8")
+    monkeypatch.setattr("sys.stdin", stdin)
+    assert main([str(path), str(missing), "-", str(path)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "3.0\n3.0\n"
+    missing_error, stdin_error = captured.err.splitlines()
+    assert missing_error.startswith(f"{missing}:1: FileNotFoundError: ")
+    assert stdin_error.startswith("<stdin>:1: UnicodeDecodeError: ")
+
+
+def test_results_written_when_input_fails():
+    """Test that buffered results are written before an error propagates."""
+
+    def lines():
+        yield "<test>", 1, "1 2 +"
+        raise KeyboardInterrupt
+
+    out, err = io.StringIO(), io.StringIO()
+    with pytest.raises(KeyboardInterrupt):
+        write_results(evaluate_lines(Calculator(), lines()), out, err)
+    assert out.getvalue() == "3.0\n"
+
+
+def test_memory_is_constant():
+    """Test that peak memory does not grow with the number of lines."""
+
+    class Discard(io.TextIOBase):
+        def write(self, text: str) -> int:
+            return len(text)
+
+    def peak(count: int) -> int:
+        lines = (("<gen>", n, f"{n % 97} ans + 3 /") for n in range(count))
+        tracemalloc.start()
+        write_results(evaluate_lines(Calculator(), lines), Discard(), Discard())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    assert peak(50_000) < 2 * peak(5_000)
+
+
+def test_line_result_format():
+    """Test the error line format."""
+    assert LineResult("f", 3, None, "E: boom").format_error() == "f:3: E: boom"
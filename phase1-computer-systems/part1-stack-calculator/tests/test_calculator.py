@@ -1,13 +1,16 @@
 import math
 
+import calculator
 import pytest
 from calculator import (
+    CacheInfo,
     Calculator,
     CalculatorError,
     InsufficientOperandsError,
     REPLResult,
     TooManyOperandsError,
     UndefinedVariableError,
+    compile_expression,
 )
 
 
@@ -253,3 +256,134 @@ def test_handle_input_errors(calc):
 
     with pytest.raises(CalculatorError):
         calc.handle_input("5 STO pi")
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("3 4 + 2 *", 14.0),
+        ("10 4 -", 6.0),
+        ("9 sqrt 2 /", 1.5),
+        ("2 STO x x *", 4.0),
+        ("pi cos", -1.0),
+    ],
+)
+def test_array_stack_matches_list_stack(expression, expected):
+    """Test that a calculator on an ArrayStack gives the same results."""
+    calc = Calculator(stack_capacity=8)
+    assert calc.evaluate(expression) == expected
+    assert calc.evaluate(expression) == Calculator().evaluate(expression)
+
+
+def test_array_stack_errors():
+    """Test errors from a calculator with a fixed-capacity stack."""
+    calc = Calculator(stack_capacity=2)
+    with pytest.raises(CalculatorError, match="too many operands"):
+        calc.evaluate("1 2 3 + +")
+    with pytest.raises(InsufficientOperandsError):
+        calc.evaluate("3 +")
+    with pytest.raises(TooManyOperandsError):
+        calc.evaluate("3 3")
+    assert calc.evaluate("1 2 +") == 3.0
+
+
+def test_compiled_expression_binds_variables_at_call_time():
+    """Test that one compiled expression serves different variable values."""
+    function = compile_expression("x 2 * y +")
+    assert function({"x": 3.0, "y": 1.0}) == 7.0
+    assert function({"x": 5.0, "y": 0.5}) == 10.5
+    with pytest.raises(UndefinedVariableError, match="'y' is not defined"):
+        function({"x": 1.0})
+
+
+def test_compiled_expression_sto_and_ans():
+    """Test that STO writes to the bound variables and ans is an argument."""
+    variables = {}
+    function = compile_expression("ans 1 + STO x x *")
+    assert function(variables, ans=2.0) == 9.0
+    assert variables == {"x": 3.0}
+    assert function(variables) == 1.0
+
+
+@pytest.mark.parametrize(
+    "expression, error",
+    [
+        ("y 1 0 / +", UndefinedVariableError),
+        ("1 0 / y +", ZeroDivisionError),
+        ("y STO", UndefinedVariableError),
+        ("-1 log +", ValueError),
+        ("1 + y", InsufficientOperandsError),
+    ],
+)
+def test_compiled_errors_keep_evaluation_order(calc, expression, error):
+    """Test that errors are raised in the order the tokens would hit them."""
+    for _ in range(2):
+        with pytest.raises(error):
+            calc.evaluate(expression)
+    assert calc.cache_info().compiles == 1
+
+
+def test_compiled_sto_before_error_still_stores(calc):
+    """Test that a STO before a failing token takes effect, as before."""
+    with pytest.raises(TooManyOperandsError, match=r"Stack\(\[5.0, 3.0\]\)"):
+        calc.evaluate("5 STO x 3")
+    assert calc._vars == {"x": 5.0}
+
+
+def test_compiled_non_finite_literals(calc):
+    """Test that inf and nan tokens compile."""
+    assert calc.evaluate("inf -1 +") == math.inf
+    assert calc.evaluate("-inf 1 *") == -math.inf
+    assert math.isnan(calc.evaluate("nan"))
+
+
+def test_cache_skips_tokenizing(calc, monkeypatch):
+    """Test that a repeated expression is not tokenized again."""
+    calls = []
+    tokenize = calculator.tokenize
+    monkeypatch.setattr(
+        calculator, "tokenize", lambda s: calls.append(s) or tokenize(s)
+    )
+    for x in range(3):
+        calc._vars["x"] = float(x)
+        assert calc.evaluate("x 1 +") == x + 1
+    assert calls == ["x 1 +"]
+
+
+def test_cache_info_and_eviction():
+    """Test hit, miss and eviction counts of a small cache."""
+    calc = Calculator(cache_size=2)
+    for expression in ["1 2 +", "3 4 +", "1 2 +", "5 6 +", "3 4 +"]:
+        calc.evaluate(expression)
+    assert calc.cache_info() == CacheInfo(
+        hits=1, misses=4, evictions=2, compiles=1, size=2, maxsize=2
+    )
+    calc.cache_clear()
+    assert calc.cache_info() == CacheInfo(0, 0, 0, 0, 0, 2)
+
+
+def test_cache_disabled():
+    """Test that a zero-size cache compiles every time."""
+    calc = Calculator(cache_size=0)
+    assert calc.evaluate("2 3 *") == calc.evaluate("2 3 *") == 6.0
+    assert calc.cache_info() == CacheInfo(0, 2, 0, 0, 0, 0)
+
+
+@pytest.mark.parametrize("stack_capacity", [None, 2])
+@pytest.mark.parametrize(
+    "expression",
+    ["x 2 * ans +", "3 STO y y y * *", "1 2 3", "x 0 /", "9 sqrt STO", "+", "1 2 3 +"],
+)
+def test_compiled_matches_interpreted(stack_capacity, expression):
+    """Test that the compiled second evaluation matches the interpreted first."""
+    calc = Calculator(stack_capacity=stack_capacity)
+    outcomes = []
+    for _ in range(2):
+        calc._vars = {"x": 1.5}
+        calc._ans = 4.0
+        try:
+            outcomes.append((calc.evaluate(expression), dict(calc._vars)))
+        except Exception as e:
+            outcomes.append((type(e), str(e), dict(calc._vars)))
+    assert outcomes[0] == outcomes[1]
+    assert calc.cache_info().compiles == 1
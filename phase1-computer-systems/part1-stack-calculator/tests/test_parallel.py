@@ -0,0 +1,86 @@
+import io
+
+import pytest
+from batch import evaluate_lines, main
+from calculator import Calculator
+from parallel import StateDependencyError, evaluate_parallel
+
+
+def numbered(texts: list[str]) -> list[tuple[str, int, str]]:
+    return [("<test>", number, text) for number, text in enumerate(texts, start=1)]
+
+
+def test_stateless_results_in_input_order():
+    """Test that results from many chunks come back in input order."""
+    lines = numbered([f"{n} 2 *" for n in range(500)])
+    results = list(evaluate_parallel(lines, workers=2, chunk_size=16))
+    assert [result.output for result in results] == [str(n * 2.0) for n in range(500)]
+    assert [result.line for result in results] == list(range(1, 501))
+
+
+def test_chains_match_sequential():
+    """Test that STO and ans chains give exactly the sequential results."""
+    texts = [
+        "3 4 +",
+        "ans 2 *",
+        "1 0 /",
+        "ans 1 +",
+        "5 STO x 0 /",
+        "x 1 +",
+        "2 STO y",
+        "clear",
+        "y",
+        "7 8 +",
+        "ans x",
+        "vars",
+    ] * 20
+    lines = numbered(texts)
+    expected = list(evaluate_lines(Calculator(), lines))
+    assert list(evaluate_parallel(lines, workers=2, chunk_size=5)) == expected
+
+
+def test_errors_reported_per_line():
+    """Test that a failing line in a worker does not stop the batch."""
+    results = list(evaluate_parallel(numbered(["1 0 /", "bad$", "2"]), workers=2))
+    assert [result.error for result in results] == [
+        "ZeroDivisionError: float division by zero",
+        "InvalidTokenError: Invalid token: bad$",
+        None,
+    ]
+    assert results[2].output == "2.0"
+
+
+def test_refuse_state():
+    """Test that a line reading state is refused when state is not allowed."""
+    lines = numbered(["1 2 +", "5 STO x", "x 1 +"])
+    results = evaluate_parallel(lines, workers=2, allow_state=False)
+    assert next(results).output == "3.0"
+    assert next(results).output == "5.0"
+    with pytest.raises(StateDependencyError, match="<test>:3: 'x 1 \\+'"):
+        next(results)
+
+
+def test_quit_stops():
+    """Test that quit ends the results, as in a sequential batch."""
+    results = list(evaluate_parallel(numbered(["1", "quit", "2"]), workers=2))
+    assert [result.output for result in results] == ["1.0"]
+
+
+def test_main_with_workers(monkeypatch, capsys):
+    """Test the --workers option of the batch CLI."""
+    monkeypatch.setattr("sys.stdin", io.StringIO("1 2 +\nans 3 *\nfoo\n"))
+    assert main(["--workers", "2"]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "3.0\n9.0\n"
+    assert "<stdin>:3: UndefinedVariableError" in captured.err
+
+
+def test_unreadable_file_with_workers(tmp_path, capsys):
+    """Test that a missing file is reported in order with --workers."""
+    path = tmp_path / "a.txt"
+    path.write_text("1 2 +\n")
+    missing = tmp_path / "missing.txt"
+    assert main(["--workers", "2", str(missing), str(path)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "3.0\n"
+    assert captured.err.startswith(f"{missing}:1: FileNotFoundError: ")
@@ -1,3 +1,5 @@
+import re
+
 import pytest
 from tokenizer import (
     EmptyInputError,
@@ -98,3 +100,56 @@ def test_valid_variable_token():
         Token(TokenType.VARIABLE, "world"),
     ]
     assert tokenize("var1") == [Token(TokenType.VARIABLE, "var1")]
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("1e3", 1000.0),
+        ("1_000", 1000.0),
+        (".5", 0.5),
+        ("5.", 5.0),
+        ("+2", 2.0),
+        ("-Infinity", float("-inf")),
+    ],
+)
+def test_float_syntax_numbers(text, value):
+    """Test that anything float() accepts is a number"""
+    assert tokenize(text) == [Token(TokenType.NUMBER, value)]
+
+
+@pytest.mark.parametrize("text", ["1__0", "1_", "3+", "-x", "1.2.3", "e+"])
+def test_invalid_number_like_tokens(text):
+    """Test that near-numbers are invalid tokens"""
+    with pytest.raises(InvalidTokenError, match=f"Invalid token: {re.escape(text)}"):
+        tokenize(f"1 {text} 2")
+
+
+def test_names_that_look_like_numbers():
+    """Test that names float() rejects are variables, and e is a constant"""
+    assert tokenize("E e5 infinit") == [
+        Token(TokenType.VARIABLE, "E"),
+        Token(TokenType.VARIABLE, "e5"),
+        Token(TokenType.VARIABLE, "infinit"),
+    ]
+    assert tokenize("1e5 e") == [
+        Token(TokenType.NUMBER, 1e5),
+        Token(TokenType.CONSTANT, "e"),
+    ]
+
+
+def test_whitespace_separators():
+    """Test that any whitespace separates tokens"""
+    assert tokenize("\t3\n4 \xa0+  ") == tokenize("3 4 +")
+    with pytest.raises(EmptyInputError):
+        tokenize("\n\t")
+
+
+def test_tokens_are_interned():
+    """Test that repeated operators, constants and variables share Tokens"""
+    first = tokenize("x pi * 2 +")
+    second = tokenize("2 x pi + *")
+    assert first[0] is second[1]
+    assert first[1] is second[2]
+    assert first[3] is second[0]
+    assert first[2] is second[4]
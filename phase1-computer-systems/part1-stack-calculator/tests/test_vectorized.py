@@ -0,0 +1,89 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from calculator import (
+    OPERATORS,
+    Calculator,
+    InsufficientOperandsError,
+    TooManyOperandsError,
+    UndefinedVariableError,
+)
+from vectorized import UFUNCS, evaluate_columns
+
+
+@pytest.fixture
+def calc():
+    """Fixture to create a Calculator instance."""
+    return Calculator()
+
+
+def test_every_operator_has_a_ufunc():
+    """Test that every calculator operator can be vectorized."""
+    assert UFUNCS.keys() == OPERATORS.keys()
+
+
+def test_matches_evaluate_per_row(calc):
+    """Test that column results equal evaluating each row."""
+    x = np.linspace(-3, 3, 25)
+    y = np.linspace(10, 0.5, 25)
+    expression = "x 2 * y + sqrt pi * x sin + y log / 1 exp -"
+    result = calc.evaluate_many(expression, x=x, y=y)
+    assert not result.errors
+    for i in range(len(x)):
+        row = Calculator()
+        row._vars = {"x": float(x[i]), "y": float(y[i])}
+        assert math.isclose(result.values[i], row.evaluate(expression), rel_tol=1e-12)
+
+
+def test_domain_errors_are_masked_per_row(calc):
+    """Test that failing rows are masked instead of aborting the batch."""
+    result = calc.evaluate_many(
+        "x log y / y 800 * exp +",
+        x=[1.0, -1.0, 0.0, 2.0, 3.0],
+        y=[0.5, 1.0, 0.0, 0.0, 1.0],
+    )
+    assert result.errors[ValueError].tolist() == [False, True, True, False, False]
+    assert result.errors[ZeroDivisionError].tolist() == [False] * 3 + [True, False]
+    assert result.errors[OverflowError].tolist() == [False] * 4 + [True]
+    assert result.failed.tolist() == [False, True, True, True, True]
+    assert math.isclose(result.values[0], math.exp(400))
+    assert np.isnan(result.values[1:]).all()
+
+
+def test_scalars_variables_and_ans_broadcast(calc):
+    """Test that stored variables and ans apply to every row."""
+    calc.evaluate("10 STO k")
+    result = calc.evaluate_many("x k * ans +", x=np.arange(3.0), ans=0.5)
+    assert result.values.tolist() == [0.5, 10.5, 20.5]
+    calc._ans = 1.0
+    assert calc.evaluate_many("x ans +", x=[1.0, 2.0]).values.tolist() == [2.0, 3.0]
+
+
+def test_sto_binds_within_the_expression(calc):
+    """Test that STO of a column is seen by later tokens only."""
+    result = calc.evaluate_many("x 1 + STO z z *", x=[1.0, 2.0])
+    assert result.values.tolist() == [4.0, 9.0]
+    assert "z" not in calc._vars
+
+
+@pytest.mark.parametrize(
+    "expression, error",
+    [
+        ("x +", InsufficientOperandsError),
+        ("x x", TooManyOperandsError),
+        ("x w +", UndefinedVariableError),
+    ],
+)
+def test_expression_errors_raise(calc, expression, error):
+    """Test that errors in the expression itself still raise."""
+    with pytest.raises(error):
+        calc.evaluate_many(expression, x=[1.0, 2.0])
+
+
+def test_mismatched_columns():
+    """Test that columns of different lengths are rejected."""
+    with pytest.raises(ValueError):
+        evaluate_columns("x y +", {"x": [1.0, 2.0], "y": [1.0, 2.0, 3.0]})
@@ -0,0 +1,230 @@
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from demo import factorial, fibonacci
+from opcodes import Opcode
+from peephole import PATTERNS, fuse, profile_sequences, trace
+from register_vm import RegisterVM
+from translator import run as run_translated
+from vm import ENGINES, VirtualMachine
+
+
+def countdown(n: int) -> list[int]:
+    """Generate bytecode that sums n down to 1 into memory[1]."""
+    return [
+        *(Opcode.PUSH.value, n, Opcode.STORE.value, 0),
+        *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.ADD.value),
+        *(Opcode.STORE.value, 1),
+        *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+        *(Opcode.DUP.value, Opcode.STORE.value, 0),
+        *(Opcode.PUSH.value, 1, Opcode.GE.value, Opcode.JNZ.value, 4),
+        Opcode.HALT.value,
+    ]
+
+
+PROGRAMS = {
+    "factorial(20)": factorial(20),
+    "fibonacci(90)": fibonacci(90),
+    "countdown(20000)": countdown(20000),
+}
+
+# Runs per program, chosen so each engine takes a similar time.
+REPEATS = {
+    "countdown(20000)": 5,
+}
+
+
+def count_instructions(bytecode: list[int]) -> int:
+    """Count the instructions executed by one run of the bytecode."""
+    return len(trace(bytecode))
+
+
+def time_engine(engine: str, bytecode: list[int], repeat: int, **options) -> float:
+    """Return the seconds taken to run the bytecode `repeat` times.
+
+    Extra keyword arguments are passed on to VirtualMachine.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            VirtualMachine(engine=engine, **options).run(bytecode)
+        return time.perf_counter() - start
+
+
+def time_translated(bytecode: list[int], repeat: int) -> float:
+    """Return the seconds taken to run the translated bytecode `repeat` times."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_translated(VirtualMachine(), bytecode)  # compile outside the timing
+        start = time.perf_counter()
+        for _ in range(repeat):
+            run_translated(VirtualMachine(), bytecode)
+        return time.perf_counter() - start
+
+
+def benchmark_engines(default_repeat: int = 2000) -> None:
+    """Print instructions per second for each engine on the demo programs.
+
+    Rates are in terms of the original program's instructions, so fused
+    programs show how much faster the same work gets done.
+    """
+    for name, bytecode in PROGRAMS.items():
+        repeat = REPEATS.get(name, default_repeat)
+        instructions = count_instructions(bytecode) * repeat
+        fused = fuse(bytecode)
+        fused_count = count_instructions(fused)
+        print(
+            f"{name}: {instructions // repeat} instructions per run "
+            f"({fused_count} after fusion)"
+        )
+        baseline = None
+        for label, program in (("", bytecode), ("+fused", fused)):
+            for engine in ENGINES:
+                elapsed = time_engine(engine, program, repeat)
+                rate = instructions / elapsed
+                baseline = baseline or rate
+                print(
+                    f"  {engine + label:>14}: {rate:>12,.0f} instr/s  "
+                    f"({rate / baseline:.2f}x)"
+                )
+        rate = instructions / time_engine("match", bytecode, repeat, verify=True)
+        print(f"  {'verified':>14}: {rate:>12,.0f} instr/s  ({rate / baseline:.2f}x)")
+        rate = instructions / time_translated(bytecode, repeat)
+        print(f"  {'translated':>14}: {rate:>12,.0f} instr/s  ({rate / baseline:.2f}x)")
+
+
+def benchmark_registers(default_repeat: int = 2000) -> None:
+    """Compare dispatch counts and speed of the register backend."""
+    for name, bytecode in PROGRAMS.items():
+        repeat = REPEATS.get(name, default_repeat)
+        stack_dispatches = count_instructions(bytecode)
+        vm = RegisterVM()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vm.run(bytecode)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                RegisterVM().run(bytecode)
+            elapsed = time.perf_counter() - start
+        rate = stack_dispatches * repeat / elapsed
+        print(
+            f"{name}: {stack_dispatches} stack dispatches, "
+            f"{vm.dispatches} register dispatches, {rate:,.0f} instr/s"
+        )
+
+
+def benchmark_batch(sizes=(1, 100, 10_000, 100_000)) -> None:
+    """Print how batched throughput grows with the number of lanes."""
+    from batch_vm import BatchVM
+
+    instructions = count_instructions(factorial(20))
+    for size in sizes:
+        programs = [factorial(20)] * size
+        start = time.perf_counter()
+        BatchVM().run(programs)
+        elapsed = time.perf_counter() - start
+        rate = instructions * size / elapsed
+        print(f"batch of {size:>7} x factorial(20): {rate:>14,.0f} instr/s")
+
+
+def benchmark_output(n: int = 90, repeat: int = 500) -> None:
+    """Compare print() with buffered sinks on a PRINT-heavy program."""
+    from sinks import BufferedTextSink, ListSink
+
+    bytecode = fibonacci(n)
+    with open(os.devnull, "w") as devnull:
+        sinks = {
+            "print": lambda: None,
+            "buffered": lambda: BufferedTextSink(devnull),
+            "list": ListSink,
+        }
+        for label, make_sink in sinks.items():
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    VirtualMachine(engine="threaded", output=make_sink()).run(bytecode)
+                elapsed = time.perf_counter() - start
+            print(f"fibonacci({n}) x {repeat}, {label:>8}: {elapsed:.3f}s")
+
+
+def scalar_sum(n: int) -> list[int]:
+    """Bytecode that sums memory[0:n] one LOAD/ADD at a time."""
+    code = [Opcode.LOAD.value, 0]
+    for address in range(1, n):
+        code += [Opcode.LOAD.value, address, Opcode.ADD.value]
+    return code + [Opcode.POP.value, Opcode.HALT.value]
+
+
+def scalar_copy(n: int) -> list[int]:
+    """Bytecode that copies memory[0:n] to memory[n:2n] one cell at a time."""
+    code = []
+    for address in range(n):
+        code += [Opcode.LOAD.value, address, Opcode.STORE.value, n + address]
+    return code + [Opcode.HALT.value]
+
+
+def benchmark_bulk(n: int = 10_000, repeat: int = 20) -> None:
+    """Compare bulk opcodes with the scalar code they replace.
+
+    LOAD and STORE take constant addresses, so without bulk opcodes a pass
+    over n cells is n unrolled instructions (or more) rather than a loop.
+    """
+    cases = {
+        "sum": (scalar_sum(n), [Opcode.SUM.value, 0, n, Opcode.POP.value, 0]),
+        "copy": (scalar_copy(n), [Opcode.MEMCPY.value, n, 0, n, Opcode.HALT.value]),
+    }
+    for label, (scalar, bulk) in cases.items():
+        for engine in ("match", "threaded"):
+            options = {"memory_size": 2 * n}
+            scalar_time = time_engine(engine, scalar, repeat, **options)
+            bulk_time = time_engine(engine, bulk, repeat, **options)
+            print(
+                f"{label} of {n} cells, {engine:>8}: scalar {scalar_time:.3f}s, "
+                f"bulk {bulk_time:.4f}s ({scalar_time / bulk_time:,.0f}x)"
+            )
+
+
+def benchmark_pool(requests: int = 20_000) -> None:
+    """Compare a fresh VM per request with VMs checked out of a pool."""
+    from vm_pool import VMPool
+
+    bytecode = factorial(5)
+    pool = VMPool(size=4, engine="table")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(requests):
+            VirtualMachine(engine="table").run(bytecode)
+        fresh = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            with pool.vm() as vm:
+                vm.run(bytecode)
+        pooled = time.perf_counter() - start
+    print(f"{requests} x factorial(5), fresh VM: {fresh:.3f}s, pooled: {pooled:.3f}s")
+    print(pool.metrics().format(), end="")
+
+
+def report_fusion_candidates(top: int = 5) -> None:
+    """Print the most executed fusable sequences across the demo programs."""
+    fused = {sequence for sequence, _ in PATTERNS}
+    counts = profile_sequences(list(PROGRAMS.values()))
+    print(f"Top {top} fusable sequences:")
+    for sequence, count in counts.most_common(top):
+        names = " ".join(opcode.name for opcode in sequence)
+        marker = " (fused)" if sequence in fused else ""
+        print(f"  {count:>6}  {names}{marker}")
+
+
+if __name__ == "__main__":
+    benchmark_engines()
+    benchmark_registers()
+    benchmark_batch()
+    benchmark_output()
+    benchmark_bulk()
+    benchmark_pool()
+    report_fusion_candidates()
@@ -0,0 +1,221 @@
+import argparse
+import io
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+from bytecode_file import BytecodeFileError, dumps, load, loads
+from sinks import BufferedTextSink
+from vm import VirtualMachine
+
+
+@dataclass
+class Job:
+    """One program to run: its bytecode, memory size and initial memory.
+
+    `memory` fills the first cells of the VM's memory before the run.
+    """
+
+    bytecode: list[int]
+    memory_size: int = 256
+    memory: list[int] = field(default_factory=list)
+
+
+@dataclass
+class ProgramResult:
+    """What one program printed and left in memory.
+
+    `status` is "ok", "error" (with the message in `error`) or "timeout".
+    `seconds` is the time the worker spent running the program.
+    """
+
+    output: str
+    memory: list[int]
+    status: str
+    error: str | None
+    seconds: float
+
+
+@dataclass
+class BatchReport:
+    """Throughput and latency percentiles for a batch, in seconds."""
+
+    programs: int
+    workers: int
+    elapsed: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+    def format(self) -> str:
+        return (
+            f"{self.programs} programs on {self.workers} workers in "
+            f"{self.elapsed:.3f}s ({self.throughput:,.0f} programs/s)\n"
+            f"latency p50 {self.p50 * 1000:.3f}ms  p95 {self.p95 * 1000:.3f}ms  "
+            f"p99 {self.p99 * 1000:.3f}ms  max {self.max * 1000:.3f}ms"
+        )
+
+
+class ProgramTimeout(Exception):
+    """Raised inside a worker when a program exceeds its time limit."""
+
+    pass
+
+
+# Shared memory block holding every program image, attached once per worker.
+_images = None
+
+
+def _attach(name: str) -> None:
+    global _images
+    # Workers share the parent's resource tracker, so attaching does not
+    # register a second owner; the parent unlinks the block when done.
+    _images = shared_memory.SharedMemory(name=name)
+
+
+def _on_alarm(signum, frame) -> None:
+    raise ProgramTimeout()
+
+
+def _run_job(task: tuple) -> ProgramResult:
+    offset, length, memory_size, memory, engine, timeout = task
+    output = io.StringIO()
+    vm = VirtualMachine(
+        memory_size=memory_size, engine=engine, output=BufferedTextSink(output)
+    )
+    vm._memory[: len(memory)] = memory
+    status, error = "ok", None
+
+    image = loads(_images.buf[offset : offset + length])
+    if timeout is not None:
+        signal.signal(signal.SIGALRM, _on_alarm)
+    start = time.perf_counter()
+    # The timer is disarmed inside the try, so an alarm that fires after
+    # the run but before the timer is stopped is still caught here.
+    try:
+        try:
+            if timeout is not None:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            vm.run(image.code)
+        finally:
+            if timeout is not None:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except ProgramTimeout:
+        status = "timeout"
+    except Exception as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+    finally:
+        seconds = time.perf_counter() - start
+        image.close()
+    return ProgramResult(output.getvalue(), vm._memory, status, error, seconds)
+
+
+def _image(bytecode: list[int]) -> bytes:
+    try:
+        return dumps(bytecode)
+    except BytecodeFileError:
+        # Words wider than 64 bits only fit the varint encoding.
+        return dumps(bytecode, encoding="varint")
+
+
+def run_batch(
+    jobs: list[Job], workers=None, timeout=None, engine="match"
+) -> tuple[list[ProgramResult], BatchReport]:
+    """Run jobs on a process pool and return their results in job order.
+
+    Program images are written once into a shared memory block in the
+    binary bytecode format; workers read them in place. `timeout` is a
+    per-program limit in seconds, enforced with SIGALRM in the worker. The
+    alarm is only handled between instructions, so it does not bound one
+    instruction that runs long, such as a MUL of huge integers.
+
+    Raises ValueError if a job has more initial memory values than cells.
+    """
+    for index, job in enumerate(jobs):
+        if len(job.memory) > job.memory_size:
+            raise ValueError(
+                f"Job {index} has {len(job.memory)} initial memory values "
+                f"for {job.memory_size} cells."
+            )
+    workers = workers or os.cpu_count() or 1
+    images = [_image(job.bytecode) for job in jobs]
+    size = sum(len(image) for image in images)
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        tasks = []
+        offset = 0
+        for job, image in zip(jobs, images):
+            block.buf[offset : offset + len(image)] = image
+            tasks.append(
+                (offset, len(image), job.memory_size, job.memory, engine, timeout)
+            )
+            offset += len(image)
+
+        chunksize = max(1, len(tasks) // (workers * 4))
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            workers, initializer=_attach, initargs=(block.name,)
+        ) as pool:
+            results = list(pool.map(_run_job, tasks, chunksize=chunksize))
+        elapsed = time.perf_counter() - start
+    finally:
+        block.close()
+        block.unlink()
+    return results, summarize(results, workers, elapsed)
+
+
+def summarize(
+    results: list[ProgramResult], workers: int, elapsed: float
+) -> BatchReport:
+    """Compute throughput and nearest-rank latency percentiles."""
+    latencies = sorted(result.seconds for result in results) or [0.0]
+
+    def percentile(p: float) -> float:
+        rank = max(1, -(-len(latencies) * p // 100))
+        return latencies[int(rank) - 1]
+
+    return BatchReport(
+        programs=len(results),
+        workers=workers,
+        elapsed=elapsed,
+        throughput=len(results) / elapsed if elapsed else 0.0,
+        p50=percentile(50),
+        p95=percentile(95),
+        p99=percentile(99),
+        max=latencies[-1],
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run bytecode files on a process pool."
+    )
+    parser.add_argument("files", nargs="+", help="binary bytecode files")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds")
+    parser.add_argument("--memory-size", type=int, default=256)
+    parser.add_argument("--engine", default="match")
+    args = parser.parse_args(argv)
+
+    jobs = []
+    for path in args.files:
+        with load(path) as image:
+            jobs.append(Job(list(image.code), args.memory_size))
+    results, report = run_batch(jobs, args.workers, args.timeout, args.engine)
+
+    for path, result in zip(args.files, results):
+        print(f"== {path}: {result.status} ({result.seconds * 1000:.3f}ms)")
+        if result.output:
+            print(result.output, end="")
+        if result.error:
+            print(result.error)
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+from opcodes import JUMP_OPERANDS, OPERAND_COUNTS, STACK_EFFECTS, Opcode
+from verifier import verify
+
+# Operands that may differ between lanes: the pushed or added constant.
+# Every other operand (addresses, jump targets) must be the same in every
+# program of a batch.
+VALUE_OPERANDS = {
+    Opcode.PUSH: 0,
+    Opcode.PUSH_ADD: 0,
+    Opcode.PUSH_SUB: 0,
+    Opcode.PUSH_GE_JNZ: 0,
+}
+
+BINARY_UFUNCS = {
+    Opcode.ADD: np.add,
+    Opcode.SUB: np.subtract,
+    Opcode.MUL: np.multiply,
+    Opcode.DIV: np.floor_divide,
+    Opcode.EQ: np.equal,
+    Opcode.NEQ: np.not_equal,
+    Opcode.LT: np.less,
+    Opcode.GT: np.greater,
+    Opcode.LE: np.less_equal,
+    Opcode.GE: np.greater_equal,
+}
+
+INT64 = np.iinfo(np.int64)
+
+# Ufunc -> check. The check takes the operands and the wrapped int64 result
+# and returns where the exact result does not fit in int64.
+OVERFLOW_CHECKS = {
+    np.add: lambda left, right, result: ((left ^ result) & (right ^ result)) < 0,
+    np.subtract: lambda left, right, result: ((left ^ right) & (left ^ result)) < 0,
+    np.multiply: lambda left, right, result: (
+        (right != 0) & (result // np.where(right == 0, 1, right) != left)
+    )
+    | ((left == INT64.min) & (right == -1)),
+    np.floor_divide: lambda left, right, result: (left == INT64.min) & (right == -1),
+}
+
+# Bulk opcodes over memory rows, applied to every lane at once.
+RANGE_REDUCTIONS = {
+    Opcode.SUM: np.sum,
+    Opcode.MIN: np.min,
+    Opcode.MAX: np.max,
+}
+VECTOR_UFUNCS = {
+    Opcode.VADD: np.add,
+    Opcode.VMUL: np.multiply,
+}
+
+
+# Lanes have no input to read from.
+UNSUPPORTED = {Opcode.INPUT, Opcode.EOF}
+
+
+class BatchError(Exception):
+    """Raised when programs cannot run together as one batch."""
+
+    pass
+
+
+@dataclass
+class BatchResult:
+    """Per-lane results of a batched run.
+
+    `memory` has one row per lane. `steps` counts vector instructions
+    executed, which is independent of the number of lanes.
+
+    `errors` maps each exception a lane stopped with to a mask of those
+    lanes: ZeroDivisionError as the VM raises it, and OverflowError where a
+    value would not fit in int64. A failed lane's pc is the instruction that
+    failed, and its stack and memory are as they were before it.
+    """
+
+    outputs: list[list[int]]
+    memory: np.ndarray
+    stacks: list[list[int]]
+    pcs: list[int]
+    steps: int
+    errors: dict[type, np.ndarray] = field(default_factory=dict)
+
+    @property
+    def failed(self) -> np.ndarray:
+        """Mask of the lanes that stopped with any error."""
+        failed = np.zeros(len(self.pcs), dtype=bool)
+        for mask in self.errors.values():
+            failed |= mask
+        return failed
+
+
+class BatchVM:
+    """Runs one program over many inputs, one NumPy lane per input.
+
+    The programs in a batch must be identical except for pushed constants,
+    as with `factorial(n)` for different n. They must pass verification, so
+    every lane at a given pc has the same stack depth; the stack is then a
+    (depth, lanes) array indexed by that static depth.
+
+    Each step runs the lowest pc any lane is waiting at, for the lanes
+    waiting there, so lanes that diverge at a branch reconverge afterwards.
+    Values are int64: results match VirtualMachine as long as they fit, and
+    a lane whose arithmetic would overflow stops with an OverflowError. A
+    lane that fails stops alone; the others run on. PRINT output is
+    collected per lane rather than written to stdout.
+    """
+
+    def __init__(self, memory_size=256) -> None:
+        self._memory_size = memory_size
+
+    def run(self, programs: list[list[int]]) -> BatchResult:
+        """Run every program as one lane and return the per-lane results."""
+        if not programs:
+            raise BatchError("A batch needs at least one program.")
+        code, lane_values = self._merge(programs)
+        depths = verify(code, self._memory_size)
+        lanes = len(programs)
+
+        decoded = {}
+        for pc, depth in depths.items():
+            opcode = Opcode(code[pc])
+            if opcode in UNSUPPORTED:
+                raise BatchError(
+                    f"Unsupported opcode in a batch at pc {pc}: {opcode.name}"
+                )
+            count = OPERAND_COUNTS.get(opcode, 0)
+            operands = [
+                lane_values.get(pc + 1 + i, code[pc + 1 + i]) for i in range(count)
+            ]
+            decoded[pc] = (opcode, operands, depth, pc + 1 + count)
+        height = max(
+            depth + STACK_EFFECTS[op][1] for op, _, depth, _ in decoded.values()
+        )
+
+        stack = np.zeros((max(height, 1), lanes), dtype=np.int64)
+        memory = np.zeros((self._memory_size, lanes), dtype=np.int64)
+        done = len(code)
+        pcs = np.zeros(lanes, dtype=np.int64)
+        final_pcs = np.zeros(lanes, dtype=np.int64)
+        printed = []
+        errors = {}
+        failures = []
+        steps = 0
+
+        while True:
+            pc = int(pcs.min())
+            if pc == done:
+                break
+            waiting = pcs == pc
+            lanes_at = slice(None) if waiting.all() else np.flatnonzero(waiting)
+            opcode, operands, depth, next_pc = decoded[pc]
+            steps += 1
+            if opcode == Opcode.HALT:
+                final_pcs[lanes_at] = pc
+                pcs[lanes_at] = done
+                continue
+            pcs[lanes_at] = self._execute(
+                opcode,
+                operands,
+                depth,
+                next_pc,
+                lanes_at,
+                stack,
+                memory,
+                printed,
+                failures,
+            )
+            for error, bad in failures:
+                failed = np.arange(lanes)[lanes_at][bad]
+                errors.setdefault(error, np.zeros(lanes, dtype=bool))[failed] = True
+                final_pcs[failed] = pc
+                pcs[failed] = done
+            failures.clear()
+
+        outputs = [[] for _ in range(lanes)]
+        for lanes_at, values in printed:
+            indices = range(lanes) if isinstance(lanes_at, slice) else lanes_at.tolist()
+            for lane, value in zip(indices, values.tolist()):
+                outputs[lane].append(value)
+        stacks = [
+            stack[: depths[int(pc)], lane].tolist() for lane, pc in enumerate(final_pcs)
+        ]
+        return BatchResult(
+            outputs, memory.T.copy(), stacks, final_pcs.tolist(), steps, errors
+        )
+
+    def _merge(self, programs: list[list[int]]) -> tuple[list[int], dict]:
+        """Check programs share a shape and collect lane-varying constants.
+
+        Returns the first program and a map from bytecode position to the
+        array of per-lane values at that position.
+        """
+        code = list(programs[0])
+        if any(len(program) != len(code) for program in programs):
+            raise BatchError("Programs in a batch must have the same length.")
+        matrix = np.array(programs, dtype=np.int64)
+        varying = np.flatnonzero((matrix != matrix[0]).any(axis=0))
+
+        allowed = set()
+        pc = 0
+        while pc < len(code):
+            try:
+                opcode = Opcode(code[pc])
+            except ValueError:
+                break
+            if opcode in VALUE_OPERANDS:
+                allowed.add(pc + 1 + VALUE_OPERANDS[opcode])
+            pc += 1 + OPERAND_COUNTS.get(opcode, 0)
+        for position in varying.tolist():
+            if position not in allowed:
+                raise BatchError(
+                    f"Programs differ at position {position}, which is not a "
+                    "pushed constant."
+                )
+        return code, {position: matrix[:, position] for position in varying.tolist()}
+
+    def _execute(
+        self,
+        opcode,
+        operands,
+        depth,
+        next_pc,
+        lanes_at,
+        stack,
+        memory,
+        printed,
+        failures,
+    ):
+        """Run one instruction for the lanes at it and return their next pcs.
+
+        Lanes the instruction fails for are added to failures as (error,
+        mask) and keep the values it would have overwritten.
+        """
+
+        def value(operand):
+            if isinstance(operand, np.ndarray):
+                return operand[lanes_at]
+            return operand
+
+        def apply(ufunc, left, right, keep=None):
+            """Return ufunc(left, right), keeping keep (or left) in lanes
+            it fails for. Ranges of memory rows fail per lane."""
+            bad = np.zeros(left.shape[-1], dtype=bool)
+            if ufunc is np.floor_divide:
+                bad = right == 0
+                if bad.any():
+                    failures.append((ZeroDivisionError, bad))
+                    right = np.where(bad, 1, right)
+            with np.errstate(all="ignore"):
+                result = ufunc(left, right)
+                if ufunc in OVERFLOW_CHECKS:
+                    overflow = OVERFLOW_CHECKS[ufunc](left, right, result)
+                    if overflow.ndim > 1:
+                        overflow = overflow.any(axis=0)
+                    overflow &= ~bad
+                    if overflow.any():
+                        failures.append((OverflowError, overflow))
+                        bad = bad | overflow
+            if not bad.any():
+                return result
+            return np.where(bad, left if keep is None else keep, result)
+
+        top = depth - 1
+        if opcode in BINARY_UFUNCS:
+            stack[top - 1, lanes_at] = apply(
+                BINARY_UFUNCS[opcode], stack[top - 1, lanes_at], stack[top, lanes_at]
+            )
+        elif opcode == Opcode.PUSH:
+            stack[depth, lanes_at] = value(operands[0])
+        elif opcode == Opcode.LOAD:
+            stack[depth, lanes_at] = memory[operands[0], lanes_at]
+        elif opcode == Opcode.STORE:
+            memory[operands[0], lanes_at] = stack[top, lanes_at]
+        elif opcode == Opcode.POP:
+            pass
+        elif opcode == Opcode.DUP:
+            stack[depth, lanes_at] = stack[top, lanes_at]
+        elif opcode == Opcode.SWAP:
+            first = stack[top, lanes_at].copy()
+            stack[top, lanes_at] = stack[top - 1, lanes_at]
+            stack[top - 1, lanes_at] = first
+        elif opcode == Opcode.PRINT:
+            printed.append((lanes_at, stack[top, lanes_at].copy()))
+        elif opcode == Opcode.LOAD_LOAD_MUL:
+            left, right = operands
+            stack[depth, lanes_at] = apply(
+                np.multiply, memory[left, lanes_at], memory[right, lanes_at]
+            )
+        elif opcode == Opcode.LOAD_LOAD_ADD:
+            left, right = operands
+            stack[depth, lanes_at] = apply(
+                np.add, memory[left, lanes_at], memory[right, lanes_at]
+            )
+        elif opcode == Opcode.LOAD_ADD:
+            stack[top, lanes_at] = apply(
+                np.add, stack[top, lanes_at], memory[operands[0], lanes_at]
+            )
+        elif opcode == Opcode.PUSH_ADD:
+            stack[top, lanes_at] = apply(
+                np.add, stack[top, lanes_at], value(operands[0])
+            )
+        elif opcode == Opcode.PUSH_SUB:
+            stack[top, lanes_at] = apply(
+                np.subtract, stack[top, lanes_at], value(operands[0])
+            )
+        elif opcode == Opcode.DUP_STORE:
+            memory[operands[0], lanes_at] = stack[top, lanes_at]
+        elif opcode == Opcode.MEMCPY:
+            dst, src, count = operands
+            memory[dst : dst + count, lanes_at] = memory[src : src + count, lanes_at]
+        elif opcode == Opcode.MEMSET:
+            dst, count = operands
+            memory[dst : dst + count, lanes_at] = stack[top, lanes_at]
+        elif opcode in RANGE_REDUCTIONS:
+            start, count = operands
+            cells = memory[start : start + count, lanes_at]
+            if opcode == Opcode.SUM:
+                overflow = _sum_overflows(cells)
+                if overflow.any():
+                    failures.append((OverflowError, overflow))
+            stack[depth, lanes_at] = RANGE_REDUCTIONS[opcode](cells, axis=0)
+        elif opcode in VECTOR_UFUNCS:
+            dst, left, right, count = operands
+            memory[dst : dst + count, lanes_at] = apply(
+                VECTOR_UFUNCS[opcode],
+                memory[left : left + count, lanes_at],
+                memory[right : right + count, lanes_at],
+                keep=memory[dst : dst + count, lanes_at],
+            )
+        elif opcode == Opcode.JMP:
+            return operands[0]
+        elif opcode in JUMP_OPERANDS:
+            top_values = stack[top, lanes_at]
+            if opcode == Opcode.JZ:
+                taken = top_values == 0
+            elif opcode == Opcode.JNZ:
+                taken = top_values != 0
+            else:
+                taken = top_values >= value(operands[0])
+            target = operands[JUMP_OPERANDS[opcode]]
+            return np.where(taken, target, next_pc)
+        else:
+            raise BatchError(f"Unsupported opcode in a batch: {opcode.name}")
+        return next_pc
+
+
+def _sum_overflows(cells: np.ndarray) -> np.ndarray:
+    """Return a mask of the columns whose exact sum does not fit in int64.
+
+    The int64 sum wraps, but is still right whenever the exact sum fits. A
+    float sum is far closer than 2**62 to the exact one, so only columns
+    near the limit are added up again as Python ints.
+    """
+    suspect = np.abs(cells.sum(axis=0, dtype=np.float64)) >= 2.0**62
+    overflow = np.zeros(cells.shape[1], dtype=bool)
+    for lane in np.flatnonzero(suspect).tolist():
+        total = sum(cells[:, lane].tolist())
+        overflow[lane] = not INT64.min <= total <= INT64.max
+    return overflow
@@ -0,0 +1,41 @@
+import operator
+from array import array
+
+# Range operations behind the bulk opcodes. They do no bounds checking; the
+# checked handlers validate ranges first. Each runs as slice reads and one
+# slice assignment, so on list, array and memoryview memory the copying
+# happens in C rather than once per cell in the dispatch loop.
+
+
+def _assign(memory, start: int, values: list[int]) -> None:
+    """Write values into memory from start, converting for typed memory."""
+    if isinstance(memory, array):
+        values = array(memory.typecode, values)
+    elif isinstance(memory, memoryview):
+        values = array(memory.format, values)
+    memory[start : start + len(values)] = values
+
+
+def memcpy(memory, dst: int, src: int, count: int) -> None:
+    """Copy count cells from src to dst. Overlapping ranges are safe."""
+    memory[dst : dst + count] = memory[src : src + count]
+
+
+def memset(memory, dst: int, count: int, value: int) -> None:
+    """Set count cells from dst to value."""
+    _assign(memory, dst, [value] * count)
+
+
+def vadd(memory, dst: int, left: int, right: int, count: int) -> None:
+    """Store the elementwise sums of two ranges at dst."""
+    _vector(operator.add, memory, dst, left, right, count)
+
+
+def vmul(memory, dst: int, left: int, right: int, count: int) -> None:
+    """Store the elementwise products of two ranges at dst."""
+    _vector(operator.mul, memory, dst, left, right, count)
+
+
+def _vector(operation, memory, dst: int, left: int, right: int, count: int) -> None:
+    values = map(operation, memory[left : left + count], memory[right : right + count])
+    _assign(memory, dst, list(values))
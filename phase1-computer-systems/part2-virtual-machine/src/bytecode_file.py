@@ -0,0 +1,174 @@
+import json
+import mmap
+import struct
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# File layout (all integers little-endian):
+#
+#   header   24 bytes: magic, version, encoding, word size, word count,
+#            code length and symbols length in bytes, 4 reserved bytes
+#   code     fixed: signed integers of `word size` bytes, padded to 8 bytes
+#            varint: zigzag LEB128 integers (word size is 0)
+#   symbols  optional UTF-8 JSON object of name -> int
+#
+# Fixed-width code starts 8-byte aligned and can be indexed in place through
+# a memoryview, so an mmap'd file runs without being copied into a list.
+
+MAGIC = b"VMBC"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBIII4x")
+
+FIXED = 0
+VARINT = 1
+ENCODINGS = {"fixed": FIXED, "varint": VARINT}
+
+# memoryview.cast format for each fixed word size.
+WORD_FORMATS = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+
+class BytecodeFileError(Exception):
+    """Raised when a bytecode image cannot be written or read."""
+
+    pass
+
+
+@dataclass
+class BytecodeImage:
+    """A loaded program. `code` supports len() and indexing like a list."""
+
+    code: memoryview | list[int]
+    symbols: dict[str, int] = field(default_factory=dict)
+    version: int = VERSION
+    _mmap: mmap.mmap | None = None
+
+    def close(self) -> None:
+        """Release the memoryview and unmap the file, if any."""
+        if isinstance(self.code, memoryview):
+            self.code.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "BytecodeImage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _word_size(bytecode: list[int]) -> int:
+    """Return the smallest fixed width that holds every word."""
+    for size in WORD_FORMATS:
+        limit = 1 << (size * 8 - 1)
+        if all(-limit <= word < limit for word in bytecode):
+            return size
+    raise BytecodeFileError("Word does not fit in 64 bits; use varint encoding.")
+
+
+def _encode_varint(words: list[int]) -> bytes:
+    out = bytearray()
+    for word in words:
+        # Zigzag maps small negative numbers to small unsigned ones.
+        value = word * 2 if word >= 0 else -word * 2 - 1
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def _decode_varint(data: memoryview, count: int) -> list[int]:
+    words = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            words.append(value >> 1 if not value & 1 else -(value >> 1) - 1)
+            value = shift = 0
+    if len(words) != count or shift:
+        raise BytecodeFileError("Truncated varint code section.")
+    return words
+
+
+def dumps(bytecode: list[int], symbols=None, encoding="fixed") -> bytes:
+    """Encode bytecode (and optional symbols) into the binary format."""
+    if encoding not in ENCODINGS:
+        raise BytecodeFileError(f"Unknown encoding: {encoding}")
+    if encoding == "fixed":
+        size = _word_size(bytecode)
+        code = struct.pack(f"<{len(bytecode)}{WORD_FORMATS[size]}", *bytecode)
+        code += bytes(-len(code) % 8)
+    else:
+        size = 0
+        code = _encode_varint(bytecode)
+    symbol_bytes = json.dumps(symbols).encode() if symbols else b""
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        ENCODINGS[encoding],
+        size,
+        len(bytecode),
+        len(code),
+        len(symbol_bytes),
+    )
+    return header + code + symbol_bytes
+
+
+def dump(bytecode: list[int], path: str | Path, symbols=None, encoding="fixed") -> None:
+    """Write bytecode to a file in the binary format."""
+    Path(path).write_bytes(dumps(bytecode, symbols, encoding))
+
+
+def loads(data: bytes | memoryview) -> BytecodeImage:
+    """Read a binary image. Fixed-width code is a view into `data`."""
+    view = memoryview(data).cast("B")
+    if len(view) < HEADER.size:
+        raise BytecodeFileError("File is too short to hold a header.")
+    magic, version, encoding, size, count, code_length, symbols_length = HEADER.unpack(
+        view[: HEADER.size]
+    )
+    if magic != MAGIC:
+        raise BytecodeFileError("Not a bytecode file (bad magic number).")
+    if version != VERSION:
+        raise BytecodeFileError(f"Unsupported bytecode file version: {version}")
+
+    start = HEADER.size
+    end = start + code_length
+    if end + symbols_length > len(view):
+        raise BytecodeFileError("Truncated bytecode file.")
+    if encoding == FIXED:
+        if size not in WORD_FORMATS or count * size > code_length:
+            raise BytecodeFileError("Bad fixed-width code section.")
+        raw = view[start : start + count * size]
+        if sys.byteorder == "little":
+            code = raw.cast(WORD_FORMATS[size])
+        else:
+            code = list(struct.unpack(f"<{count}{WORD_FORMATS[size]}", raw))
+    elif encoding == VARINT:
+        code = _decode_varint(view[start:end], count)
+    else:
+        raise BytecodeFileError(f"Unknown encoding: {encoding}")
+
+    symbols = {}
+    if symbols_length:
+        symbols = json.loads(bytes(view[end : end + symbols_length]))
+    return BytecodeImage(code, symbols, version)
+
+
+def load(path: str | Path) -> BytecodeImage:
+    """Memory-map a bytecode file and return an image backed by the map.
+
+    Close the image (or use it as a context manager) to unmap the file.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        image = loads(mapped)
+    except BytecodeFileError:
+        mapped.close()
+        raise
+    image._mmap = mapped
+    return image
@@ -0,0 +1,324 @@
+import itertools
+import json
+import os
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+from opcodes import (
+    JUMP_OPERANDS,
+    MEMORY_OPERANDS,
+    MEMORY_RANGES,
+    OPERAND_COUNTS,
+    STACK_EFFECTS,
+    Opcode,
+)
+
+ANALYSIS_CACHE_SIZE = 256
+PENDING_PROGRAMS = 64
+MAX_OPERANDS = max(OPERAND_COUNTS.values())
+
+# (name, type, help) for each exported field, in export order.
+METRICS = (
+    ("runs", "counter", "Calls to VirtualMachine.run."),
+    ("instructions", "counter", "Instructions retired."),
+    ("jumps", "counter", "Jumps and branches taken."),
+    ("memory_cells", "counter", "Memory cells read or written."),
+    ("prints", "counter", "Values sent to output by PRINT."),
+    ("peak_stack_depth", "gauge", "Deepest the stack has been."),
+    ("wall_seconds", "counter", "Wall time spent in run."),
+    ("last_wall_seconds", "gauge", "Wall time of the most recent run."),
+)
+
+
+@dataclass
+class VMStats:
+    """Totals over every `run()` of one VirtualMachine.
+
+    `memory_cells` counts each cell a LOAD, STORE or bulk opcode reads or
+    writes, so a cell used twice counts twice. `peak_stack_depth` is None
+    once it cannot be known, see Counters.
+    """
+
+    runs: int = 0
+    instructions: int = 0
+    jumps: int = 0
+    memory_cells: int = 0
+    prints: int = 0
+    peak_stack_depth: int | None = 0
+    wall_seconds: float = 0.0
+    last_wall_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json_line(self, **labels) -> str:
+        """Return one JSON object on a single line, labels first."""
+        return json.dumps({**labels, **self.to_dict()}) + "\n"
+
+    def to_prometheus(self, prefix="vm", **labels) -> str:
+        """Return the stats in the Prometheus text exposition format."""
+        selector = ",".join(f'{key}="{value}"' for key, value in labels.items())
+        selector = f"{{{selector}}}" if selector else ""
+        lines = []
+        for field, kind, description in METRICS:
+            name = f"{prefix}_{field}"
+            if kind == "counter":
+                name += "_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            value = getattr(self, field)
+            lines.append(f"{name}{selector} {'NaN' if value is None else value}")
+        return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, stats: VMStats, prefix="vm", **labels) -> None:
+    """Write stats as a Prometheus textfile, replacing path atomically.
+
+    The file is written next to path and renamed over it, so a collector
+    reading the directory never sees a partial file.
+    """
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "w") as file:
+        file.write(stats.to_prometheus(prefix, **labels))
+    os.replace(partial, path)
+
+
+def append_json_line(path: str, stats: VMStats, **labels) -> None:
+    """Append stats to a JSON lines file as one line."""
+    with open(path, "a") as file:
+        file.write(stats.to_json_line(**labels))
+
+
+class Counters:
+    """The always-on counters behind `VirtualMachine.stats()`.
+
+    Nothing is counted per instruction. The only work while a program runs
+    is one increment per jump taken, at the index of the pc after the jump
+    instruction, which the VM's jump handlers do themselves. From those,
+    the pcs runs started and stopped at, and a static analysis of the
+    bytecode, `execution_counts` recovers how often each instruction ran.
+
+    Programs are told apart by identity, so starting a run costs no more
+    than comparing a list program with the copy taken on its first run,
+    which catches programs changed in place; their earlier runs are then
+    counted against the copy. Each program is analysed when stats are read,
+    or when more than PENDING_PROGRAMS programs have run since. A
+    memoryview image, which its owner may release, is analysed as each run
+    ends instead, reading only the span of pcs its runs could have reached.
+
+    Peak stack depth follows the paths runs took, from the depths they
+    started at. Code that does not verify can reach one pc at different
+    depths, a loop that pushes more each time round say; once a run has
+    done that the peak is unknown (None) until the counters are reset.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero every counter."""
+        self._stats = VMStats()
+        self._wall_ns = 0
+        self._last_wall_ns = 0
+        # id(bytecode) -> (bytecode, code, jumps taken, runs) for programs
+        # not yet added to _stats. Holding the bytecode keeps its id unique;
+        # code is a copy of it unless it is a tuple or memoryview. Runs are
+        # keyed by the (pc, stack depth) they started and stopped at.
+        self._pending = {}
+        self._program = None
+        self.taken = [0]
+        self._runs = {}
+
+    def begin(self, bytecode: list[int]) -> list[int] | dict[int, int]:
+        """Start a run of bytecode. Returns the counts jump handlers update."""
+        program = self._pending.get(id(bytecode))
+        if program is not None and program[1] is not bytecode:
+            if bytecode != program[1]:
+                # Changed in place: earlier runs were of the old code.
+                self._add(*self._pending.pop(id(bytecode))[1:])
+                program = None
+        if program is None:
+            if len(self._pending) >= PENDING_PROGRAMS:
+                self._fold()
+            if isinstance(bytecode, memoryview):
+                code, taken = bytecode, defaultdict(int)
+            else:
+                code = bytecode if isinstance(bytecode, tuple) else bytecode[:]
+                taken = [0] * (len(code) + 1)
+            program = self._pending[id(bytecode)] = (bytecode, code, taken, {})
+        self._program = bytecode
+        _, _, self.taken, self._runs = program
+        return self.taken
+
+    def end(self, entry: tuple, exit: tuple, elapsed_ns: int) -> None:
+        """Finish a run between two (pc, stack depth) points.
+
+        The instruction at the exit pc has not been executed.
+        """
+        key = (entry, exit)
+        self._runs[key] = self._runs.get(key, 0) + 1
+        self._wall_ns += elapsed_ns
+        self._last_wall_ns = elapsed_ns
+        if isinstance(self._program, memoryview):
+            self._add(*self._pending.pop(id(self._program))[1:])
+            self._program = None
+
+    def stats(self) -> VMStats:
+        """Return a copy of the totals so far."""
+        self._fold()
+        stats = VMStats(**self._stats.to_dict())
+        stats.wall_seconds = self._wall_ns / 1e9
+        stats.last_wall_seconds = self._last_wall_ns / 1e9
+        return stats
+
+    def _fold(self) -> None:
+        """Add every pending program's runs to the totals."""
+        for _, code, taken, runs in self._pending.values():
+            self._add(code, taken, runs)
+        self._pending.clear()
+        self._program = None
+
+    def _add(self, bytecode, taken: list[int] | dict[int, int], runs: dict) -> None:
+        starts = Counter()
+        stops = Counter()
+        deepest = 0
+        for ((start, start_depth), (stop, stop_depth)), count in runs.items():
+            starts[start] += count
+            stops[stop] += count
+            deepest = max(deepest, start_depth, stop_depth)
+        if isinstance(taken, list):
+            jumps = list(itertools.compress(range(len(taken)), taken))
+        else:
+            jumps = [next_pc for next_pc, count in taken.items() if count]
+
+        low, end = 0, len(bytecode)
+        if isinstance(bytecode, memoryview):
+            # Runs only move up from where they start or land, until they
+            # stop or jump, so every pc they executed lies in [low, high).
+            # Every jump's target is its last operand, just before next_pc.
+            targets = [bytecode[next_pc - 1] for next_pc in jumps]
+            low = max(0, min([*starts, *targets], default=0))
+            high = max([*stops, *jumps], default=0)
+            end = min(end, high + MAX_OPERANDS)
+        if (low, end) != (0, len(bytecode)):
+            bytecode = bytecode[low:end]
+        rows = _analyse(tuple(bytecode), low)
+        counts = _counts(rows, low, starts, stops, taken)
+
+        stats = self._stats
+        stats.runs += stops.total()
+        stats.jumps += sum(taken[next_pc] for next_pc in jumps)
+        for pc, count in counts.items():
+            opcode, _, _, cells = rows[pc - low]
+            stats.instructions += count
+            stats.memory_cells += count * cells
+            if opcode == Opcode.PRINT:
+                stats.prints += count
+        peak = _peak(rows, low, counts, taken, [entry for entry, _ in runs])
+        if peak is None or stats.peak_stack_depth is None:
+            stats.peak_stack_depth = None
+        else:
+            stats.peak_stack_depth = max(stats.peak_stack_depth, deepest, peak)
+
+
+def execution_counts(
+    bytecode: list[int] | tuple[int, ...],
+    starts: dict[int, int],
+    stops: dict[int, int],
+    taken: list[int],
+) -> dict[int, int]:
+    """Return how many times each pc executed, from jump counts alone.
+
+    `starts` and `stops` count the pcs runs started at and stopped before;
+    `taken[pc]` counts jumps taken by the instruction that ends at pc. Every
+    instruction but JMP and HALT falls through to a higher pc, so one pass
+    in pc order can add up everything that reaches each pc.
+    """
+    rows = _analyse(tuple(bytecode), 0)
+    return _counts(rows, 0, starts, stops, taken)
+
+
+def _counts(rows: list, low: int, starts, stops, taken) -> dict[int, int]:
+    """execution_counts over the rows of the pcs from low on."""
+    arrivals = Counter(starts)
+    for opcode, next_pc, target, _ in rows:
+        if target is not None and taken[next_pc]:
+            arrivals[target] += taken[next_pc]
+    counts = {}
+    for pc, (opcode, next_pc, target, _) in enumerate(rows, start=low):
+        count = arrivals[pc] - stops.get(pc, 0)
+        if count <= 0:
+            continue
+        counts[pc] = count
+        if opcode is None or opcode in (Opcode.HALT, Opcode.JMP):
+            continue
+        if target is not None:
+            count -= taken[next_pc]
+        arrivals[next_pc] += count
+    return counts
+
+
+def _peak(rows: list, low: int, counts: dict, taken, entries: list) -> int | None:
+    """Return the deepest stack along the paths runs took, if it is fixed.
+
+    Depths spread from each run's (entry pc, depth) over the fall-throughs
+    and jumps that were taken. None if two paths reach a pc at different
+    depths, as nothing then says which depth each visit had.
+    """
+    depths = {}
+    for pc, depth in entries:
+        if depths.setdefault(pc, depth) != depth:
+            return None
+    deepest = 0
+    pending = list(depths)
+    while pending:
+        pc = pending.pop()
+        if pc not in counts:
+            continue
+        opcode, next_pc, target, _ = rows[pc - low]
+        pops, pushes = STACK_EFFECTS[opcode]
+        deepest = max(deepest, depths[pc] + max(0, pushes - pops))
+        after = depths[pc] - pops + pushes
+        jumped = taken[next_pc] if target is not None else 0
+        successors = [target] if jumped else []
+        if counts[pc] > jumped and opcode not in (Opcode.HALT, Opcode.JMP):
+            successors.append(next_pc)
+        for successor in successors:
+            if successor not in depths:
+                depths[successor] = after
+                pending.append(successor)
+            elif depths[successor] != after:
+                return None
+    return deepest
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def _analyse(code: tuple[int, ...], low: int) -> list:
+    """Return a row for each pc of code, which holds the program from low on.
+
+    A row is (opcode, next pc, jump target, memory cells used), with opcode
+    None where the engines would raise instead of executing. Every pc gets
+    a row, as in threaded.decode, so jumps into the middle of an instruction
+    are counted too.
+    """
+    rows = []
+    for pc, operation in enumerate(code, start=low):
+        try:
+            opcode = Opcode(operation)
+        except ValueError:
+            rows.append((None, pc + 1, None, 0))
+            continue
+        index = pc - low + 1
+        operands = code[index : index + OPERAND_COUNTS.get(opcode, 0)]
+        next_pc = pc + 1 + len(operands)
+        if len(operands) < OPERAND_COUNTS.get(opcode, 0):
+            rows.append((None, next_pc, None, 0))
+            continue
+        target = None
+        if opcode in JUMP_OPERANDS:
+            target = operands[JUMP_OPERANDS[opcode]]
+        cells = len(MEMORY_OPERANDS.get(opcode, ()))
+        cells += sum(operands[count] for _, count in MEMORY_RANGES.get(opcode, ()))
+        rows.append((opcode, next_pc, target, cells))
+    return rows
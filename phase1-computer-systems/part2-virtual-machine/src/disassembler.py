@@ -1,13 +1,38 @@
-from opcodes import Opcode
+from opcodes import JUMP_OPERANDS, OPERAND_COUNTS, Opcode
 
-OPCODES_WITH_OPERANDS = {
-    Opcode.PUSH,
-    Opcode.LOAD,
-    Opcode.STORE,
-    Opcode.JMP,
-    Opcode.JZ,
-    Opcode.JNZ,
-}
+OPCODES_WITH_OPERANDS = set(OPERAND_COUNTS)
+
+Instruction = tuple[int, Opcode, list[int]]
+
+
+def decode_instructions(bytecode: list[int]) -> list[Instruction] | None:
+    """Split bytecode into (pc, opcode, operands) instructions.
+
+    Returns None if the bytecode has an unknown opcode or a missing operand,
+    since such programs cannot be rewritten safely.
+    """
+    instructions = []
+    pc = 0
+    while pc < len(bytecode):
+        try:
+            opcode = Opcode(bytecode[pc])
+        except ValueError:
+            return None
+        count = OPERAND_COUNTS.get(opcode, 0)
+        if pc + 1 + count > len(bytecode):
+            return None
+        instructions.append((pc, opcode, list(bytecode[pc + 1 : pc + 1 + count])))
+        pc += 1 + count
+    return instructions
+
+
+def jump_targets(instructions: list[Instruction]) -> set[int]:
+    """Return every address a jump instruction can land on."""
+    return {
+        operands[JUMP_OPERANDS[opcode]]
+        for _, opcode, operands in instructions
+        if opcode in JUMP_OPERANDS
+    }
 
 
 def disassemble(bytecode: list[int]) -> str:
@@ -19,16 +44,18 @@ def disassemble(bytecode: list[int]) -> str:
         operation = bytecode[pc]
         try:
             opcode = Opcode(operation)
-            if opcode in OPCODES_WITH_OPERANDS:
-                pc += 1
-                if pc < len(bytecode):
-                    operand = bytecode[pc]
-                    output.append(f"{pc-1:04}: {opcode.name} {operand}")
+            count = OPERAND_COUNTS.get(opcode, 0)
+            if count:
+                operands = bytecode[pc + 1 : pc + 1 + count]
+                if len(operands) == count:
+                    text = " ".join(str(operand) for operand in operands)
+                    output.append(f"{pc:04}: {opcode.name} {text}")
                 else:
-                    output.append(f"{pc-1:04}: {opcode.name} <missing operand>")
+                    output.append(f"{pc:04}: {opcode.name} <missing operand>")
+                pc += 1 + len(operands)
             else:
                 output.append(f"{pc:04}: {opcode.name}")
-            pc += 1
+                pc += 1
         except ValueError:
             output.append(f"{pc:04}: UNKNOWN_OPCODE {operation}")
             pc += 1
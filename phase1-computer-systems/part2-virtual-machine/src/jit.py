@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from opcodes import JUMP_OPERANDS, OPERAND_COUNTS, STACK_EFFECTS, Opcode
+from translator import BlockWriter, TranslationError, bulk_imports
+from vm import VirtualMachine
+
+MAX_TRACE_LENGTH = 500
+
+# Condition under which each conditional jump is taken, given the popped value
+# and the opcode's operands.
+TAKEN_CONDITIONS = {
+    Opcode.JZ: lambda value, operands: f"{value} == 0",
+    Opcode.JNZ: lambda value, operands: f"{value} != 0",
+    Opcode.PUSH_GE_JNZ: lambda value, operands: f"{value} >= {operands[0]!r}",
+}
+
+
+@dataclass
+class Trace:
+    """A compiled loop trace.
+
+    `function(memory, items, write, source)` runs the loop on the VM's
+    memory and stack list, sending PRINT values to write and reading INPUT
+    from source, until a guard fails. It returns the pc to resume
+    interpreting at, the iterations completed and the index of the exit
+    taken, which `count_jumps` turns into the VM's jump counts. It may only
+    be entered when the stack holds `entry_depth` values.
+    """
+
+    header: int
+    entry_depth: int
+    source: str
+    function: Callable[[list[int], list[int], Callable], tuple[int, int, int]]
+    # (step index, pc after the jump) for every jump the recorded iteration
+    # took, and (step index, pc after the jump, taken) for each exit.
+    jumps: list[tuple[int, int]]
+    exits: list[tuple[int, int, bool]]
+
+    def count_jumps(self, taken: dict, iterations: int, exit: int) -> None:
+        """Add the jumps taken by a run of the trace to taken."""
+        index, next_pc, exit_taken = self.exits[exit]
+        for step, jump in self.jumps:
+            taken[jump] += iterations + (step < index)
+        if exit_taken:
+            taken[next_pc] += 1
+
+
+class TracingJIT:
+    """Runs bytecode on the table engine and compiles hot loops.
+
+    Only jump handlers are wrapped, so straight-line code runs exactly as it
+    does on the table engine. Each taken backward jump counts its target; a
+    target reaching the threshold has its next iteration recorded and
+    compiled into a closure, which then runs later iterations.
+    """
+
+    def __init__(self, vm: VirtualMachine, threshold=50) -> None:
+        self._vm = vm
+        self._threshold = threshold
+        self.counts = {}
+        self.traces = {}
+        self._blacklist = set()
+
+    def run(self, bytecode: list[int]) -> None:
+        """Run bytecode, switching to compiled traces for hot loops."""
+        table = list(self._vm._dispatch_table)
+        for opcode in JUMP_OPERANDS:
+            table[opcode.value] = self._count_backward(table[opcode.value])
+        self._vm._run_table(bytecode, table)
+
+    def _count_backward(self, handler: Callable) -> Callable:
+        vm = self._vm
+
+        def counted(bytecode: list[int]) -> None:
+            pc = vm._pc
+            handler(bytecode)
+            if vm._pc <= pc:
+                self._on_backward_jump(bytecode, vm._pc)
+
+        return counted
+
+    def _on_backward_jump(self, bytecode: list[int], header: int) -> None:
+        trace = self.traces.get(header)
+        if trace is None:
+            if header in self._blacklist:
+                return
+            count = self.counts.get(header, 0) + 1
+            self.counts[header] = count
+            if count < self._threshold:
+                return
+            trace = self._record(bytecode, header)
+            if trace is None:
+                self._blacklist.add(header)
+                return
+            self.traces[header] = trace
+
+        items = self._vm._stack._items
+        if len(items) == trace.entry_depth:
+            vm = self._vm
+            vm._pc, iterations, exit = trace.function(
+                vm._memory, items, vm._write, vm.input
+            )
+            trace.count_jumps(vm._taken, iterations, exit)
+
+    def _record(self, bytecode: list[int], header: int) -> Trace | None:
+        """Interpret one iteration from header, recording what runs.
+
+        Returns None if the iteration leaves through HALT, hits an opcode the
+        trace compiler does not handle, or runs too long. The instructions
+        executed while recording still count as normal execution.
+        """
+        vm = self._vm
+        table = vm._dispatch_table
+        entry_depth = vm._stack.size()
+        steps = []
+        while len(steps) < MAX_TRACE_LENGTH:
+            pc = vm._pc
+            try:
+                opcode = Opcode(bytecode[pc])
+            except (ValueError, IndexError):
+                return None
+            if opcode == Opcode.HALT or opcode not in STACK_EFFECTS:
+                return None
+            operands = bytecode[pc + 1 : pc + 1 + OPERAND_COUNTS.get(opcode, 0)]
+            depth = vm._stack.size()
+            table[opcode.value](bytecode)
+            steps.append((pc, opcode, operands, depth, vm._pc))
+            if vm._pc == header:
+                if vm._stack.size() != entry_depth:
+                    return None
+                return self._compile(header, entry_depth, steps)
+        return None
+
+    def _compile(self, header: int, entry_depth: int, steps: list) -> Trace | None:
+        # Only the slots the trace pops below its entry depth become locals.
+        lowest = min(
+            depth - STACK_EFFECTS[opcode][0] for _, opcode, _, depth, _ in steps
+        )
+        needed = entry_depth - lowest
+        slots = [f"s{i}" for i in range(needed)]
+
+        writer = BlockWriter(needed)
+        jumps = []
+        exits = []
+        for index, (pc, opcode, operands, _, next_pc) in enumerate(steps):
+            fall_through = pc + 1 + len(operands)
+            if opcode in JUMP_OPERANDS and next_pc != fall_through:
+                jumps.append((index, fall_through))
+            if opcode == Opcode.JMP:
+                continue
+            if opcode not in JUMP_OPERANDS:
+                try:
+                    writer.instruction(pc, opcode, operands)
+                except TranslationError:
+                    return None
+                continue
+
+            value = writer.stack.pop()
+            target = operands[JUMP_OPERANDS[opcode]]
+            condition = TAKEN_CONDITIONS[opcode](value, operands)
+            if next_pc == target:
+                writer.emit(f"if not ({condition}):")
+                exit_pc = fall_through
+            else:
+                writer.emit(f"if {condition}:")
+                exit_pc = target
+            if writer.stack:
+                writer.emit(f"    items.extend([{', '.join(writer.stack)}])")
+            writer.emit(f"    return {exit_pc}, n, {len(exits)}")
+            exits.append((index, fall_through, exit_pc != fall_through))
+        writer.flush()
+        writer.emit("n += 1")
+
+        lines = bulk_imports(opcode for _, opcode, _, _, _ in steps)
+        lines.append(f"def trace_{header}(memory, items, write, source):")
+        if needed:
+            lines.append(f"    {', '.join(slots)}, = items[-{needed}:]")
+            lines.append(f"    del items[-{needed}:]")
+        lines.append("    n = 0")
+        lines.append("    while True:")
+        lines.extend(f"        {line}" for line in writer.lines)
+        source = "\n".join(lines) + "\n"
+
+        namespace = {}
+        exec(compile(source, f"<trace {header}>", "exec"), namespace)
+        function = namespace[f"trace_{header}"]
+        return Trace(header, entry_depth, source, function, jumps, exits)
@@ -0,0 +1,104 @@
+import mmap
+from array import array
+from pathlib import Path
+
+# Alternative memory stores for VirtualMachine(memory=...). The VM only
+# needs len(), integer indexing and item assignment; it checks addresses
+# against len() itself, so every backend keeps the invalid-address errors.
+# A backend may define zero() for a faster VirtualMachine.reset().
+#
+# Typed backends (array, mapped) hold signed 64-bit values and raise
+# OverflowError when a store does not fit. A NumPy int64 array can be used
+# as memoryview(array), which shares its buffer and returns Python ints.
+
+CELL_SIZE = 8
+SPARSE_PAGE_SHIFT = 10
+
+
+def dense(size: int) -> array:
+    """Return zeroed int64 memory in one contiguous array."""
+    return array("q", bytes(size * CELL_SIZE))
+
+
+class MappedMemory:
+    """int64 memory backed by a file through mmap.
+
+    The file is created or extended to `size` cells; existing contents are
+    kept, so memory persists across runs. Pass `cells` to the VM and close
+    the mapping (or use it as a context manager) when done.
+    """
+
+    def __init__(self, path: str | Path, size: int) -> None:
+        with open(path, "a+b") as file:
+            if file.seek(0, 2) < size * CELL_SIZE:
+                file.truncate(size * CELL_SIZE)
+            self._mmap = mmap.mmap(file.fileno(), size * CELL_SIZE)
+        self.cells = memoryview(self._mmap).cast("q")
+
+    def close(self) -> None:
+        """Write changes back to the file and unmap it."""
+        self.cells.release()
+        self._mmap.flush()
+        self._mmap.close()
+
+    def __enter__(self) -> "MappedMemory":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SparseMemory:
+    """Memory that allocates pages of cells only when they are written.
+
+    Unwritten cells read as 0, so a huge, mostly empty address space costs
+    memory in proportion to the pages actually used. Cells hold Python
+    ints like the default list memory.
+    """
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._pages = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, address):
+        if isinstance(address, slice):
+            return [self[i] for i in range(*address.indices(self._size))]
+        if not 0 <= address < self._size:
+            raise IndexError("memory index out of range")
+        page = self._pages.get(address >> SPARSE_PAGE_SHIFT)
+        if page is None:
+            return 0
+        return page[address & ((1 << SPARSE_PAGE_SHIFT) - 1)]
+
+    def __setitem__(self, address, value) -> None:
+        if isinstance(address, slice):
+            indices = range(*address.indices(self._size))
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError("slice assignment cannot change memory size")
+            for index, item in zip(indices, values):
+                self[index] = item
+            return
+        if not 0 <= address < self._size:
+            raise IndexError("memory index out of range")
+        index = address >> SPARSE_PAGE_SHIFT
+        page = self._pages.get(index)
+        if page is None:
+            page = self._pages[index] = [0] * (1 << SPARSE_PAGE_SHIFT)
+        page[address & ((1 << SPARSE_PAGE_SHIFT) - 1)] = value
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, list):
+            return len(other) == self._size and self[:] == other
+        return NotImplemented
+
+    def zero(self) -> None:
+        """Set every cell to 0 by dropping all pages."""
+        self._pages.clear()
+
+    @property
+    def pages_allocated(self) -> int:
+        return len(self._pages)
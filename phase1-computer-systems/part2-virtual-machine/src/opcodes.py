@@ -1,3 +1,4 @@
+import operator
 from enum import Enum
 
 
@@ -23,3 +24,161 @@ class Opcode(Enum):
     JZ = 18
     JNZ = 19
     PRINT = 20
+    # Superinstructions produced by the peephole pass.
+    LOAD_LOAD_MUL = 21
+    LOAD_LOAD_ADD = 22
+    LOAD_ADD = 23
+    PUSH_ADD = 24
+    PUSH_SUB = 25
+    DUP_STORE = 26
+    PUSH_GE_JNZ = 27
+    # Bulk operations over ranges of memory cells.
+    MEMCPY = 28
+    MEMSET = 29
+    SUM = 30
+    MIN = 31
+    MAX = 32
+    VADD = 33
+    VMUL = 34
+    # Streaming input.
+    INPUT = 35
+    EOF = 36
+
+
+# Number of operand words following each opcode. Opcodes not listed take none.
+OPERAND_COUNTS = {
+    Opcode.PUSH: 1,
+    Opcode.LOAD: 1,
+    Opcode.STORE: 1,
+    Opcode.JMP: 1,
+    Opcode.JZ: 1,
+    Opcode.JNZ: 1,
+    Opcode.LOAD_LOAD_MUL: 2,
+    Opcode.LOAD_LOAD_ADD: 2,
+    Opcode.LOAD_ADD: 1,
+    Opcode.PUSH_ADD: 1,
+    Opcode.PUSH_SUB: 1,
+    Opcode.DUP_STORE: 1,
+    Opcode.PUSH_GE_JNZ: 2,
+    Opcode.MEMCPY: 3,
+    Opcode.MEMSET: 2,
+    Opcode.SUM: 2,
+    Opcode.MIN: 2,
+    Opcode.MAX: 2,
+    Opcode.VADD: 4,
+    Opcode.VMUL: 4,
+}
+
+# Index of the jump address among an opcode's operands.
+JUMP_OPERANDS = {
+    Opcode.JMP: 0,
+    Opcode.JZ: 0,
+    Opcode.JNZ: 0,
+    Opcode.PUSH_GE_JNZ: 1,
+}
+
+# (values popped, values pushed) for each opcode.
+STACK_EFFECTS = {
+    Opcode.HALT: (0, 0),
+    Opcode.LOAD: (0, 1),
+    Opcode.STORE: (1, 0),
+    Opcode.PUSH: (0, 1),
+    Opcode.POP: (1, 0),
+    Opcode.DUP: (1, 2),
+    Opcode.SWAP: (2, 2),
+    Opcode.ADD: (2, 1),
+    Opcode.SUB: (2, 1),
+    Opcode.MUL: (2, 1),
+    Opcode.DIV: (2, 1),
+    Opcode.EQ: (2, 1),
+    Opcode.NEQ: (2, 1),
+    Opcode.LT: (2, 1),
+    Opcode.GT: (2, 1),
+    Opcode.LE: (2, 1),
+    Opcode.GE: (2, 1),
+    Opcode.JMP: (0, 0),
+    Opcode.JZ: (1, 0),
+    Opcode.JNZ: (1, 0),
+    Opcode.PRINT: (1, 0),
+    Opcode.LOAD_LOAD_MUL: (0, 1),
+    Opcode.LOAD_LOAD_ADD: (0, 1),
+    Opcode.LOAD_ADD: (1, 1),
+    Opcode.PUSH_ADD: (1, 1),
+    Opcode.PUSH_SUB: (1, 1),
+    Opcode.DUP_STORE: (1, 1),
+    Opcode.PUSH_GE_JNZ: (1, 0),
+    Opcode.MEMCPY: (0, 0),
+    Opcode.MEMSET: (1, 0),
+    Opcode.SUM: (0, 1),
+    Opcode.MIN: (0, 1),
+    Opcode.MAX: (0, 1),
+    Opcode.VADD: (0, 0),
+    Opcode.VMUL: (0, 0),
+    Opcode.INPUT: (0, 1),
+    Opcode.EOF: (0, 1),
+}
+
+# Indexes of operands that are memory addresses.
+MEMORY_OPERANDS = {
+    Opcode.LOAD: (0,),
+    Opcode.STORE: (0,),
+    Opcode.LOAD_LOAD_MUL: (0, 1),
+    Opcode.LOAD_LOAD_ADD: (0, 1),
+    Opcode.LOAD_ADD: (0,),
+    Opcode.DUP_STORE: (0,),
+}
+
+# (start operand, count operand) index pairs for each memory range an opcode
+# reads or writes. MEMCPY dst src count; MEMSET dst count; SUM/MIN/MAX start
+# count; VADD/VMUL dst left right count.
+MEMORY_RANGES = {
+    Opcode.MEMCPY: ((0, 2), (1, 2)),
+    Opcode.MEMSET: ((0, 1),),
+    Opcode.SUM: ((0, 1),),
+    Opcode.MIN: ((0, 1),),
+    Opcode.MAX: ((0, 1),),
+    Opcode.VADD: ((0, 3), (1, 3), (2, 3)),
+    Opcode.VMUL: ((0, 3), (1, 3), (2, 3)),
+}
+
+
+# Comparisons push 1 or 0 rather than a bool.
+def equal(a: int, b: int) -> int:
+    return 1 if a == b else 0
+
+
+def not_equal(a: int, b: int) -> int:
+    return 1 if a != b else 0
+
+
+def less(a: int, b: int) -> int:
+    return 1 if a < b else 0
+
+
+def greater(a: int, b: int) -> int:
+    return 1 if a > b else 0
+
+
+def less_equal(a: int, b: int) -> int:
+    return 1 if a <= b else 0
+
+
+def greater_equal(a: int, b: int) -> int:
+    return 1 if a >= b else 0
+
+
+# The function each arithmetic and comparison opcode applies to the second
+# value from the top and the top, in that order. Every engine that calls a
+# function per operation uses these.
+BINARY_OPERATIONS = {
+    Opcode.ADD: operator.add,
+    Opcode.SUB: operator.sub,
+    Opcode.MUL: operator.mul,
+    Opcode.DIV: operator.floordiv,
+    Opcode.EQ: equal,
+    Opcode.NEQ: not_equal,
+    Opcode.LT: less,
+    Opcode.GT: greater,
+    Opcode.LE: less_equal,
+    Opcode.GE: greater_equal,
+}
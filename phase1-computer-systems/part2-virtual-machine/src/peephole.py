@@ -0,0 +1,124 @@
+import contextlib
+import io
+from collections import Counter
+
+from disassembler import decode_instructions, jump_targets
+from opcodes import JUMP_OPERANDS, Opcode
+from vm import VirtualMachine
+
+# Opcode sequences and the superinstruction that replaces them. Longer
+# patterns come first so they win over their prefixes.
+PATTERNS = [
+    ((Opcode.PUSH, Opcode.GE, Opcode.JNZ), Opcode.PUSH_GE_JNZ),
+    ((Opcode.LOAD, Opcode.LOAD, Opcode.MUL), Opcode.LOAD_LOAD_MUL),
+    ((Opcode.LOAD, Opcode.LOAD, Opcode.ADD), Opcode.LOAD_LOAD_ADD),
+    ((Opcode.LOAD, Opcode.ADD), Opcode.LOAD_ADD),
+    ((Opcode.PUSH, Opcode.ADD), Opcode.PUSH_ADD),
+    ((Opcode.PUSH, Opcode.SUB), Opcode.PUSH_SUB),
+    ((Opcode.DUP, Opcode.STORE), Opcode.DUP_STORE),
+]
+
+
+def fuse(bytecode: list[int], patterns=PATTERNS) -> list[int]:
+    """Rewrite common instruction sequences into superinstructions.
+
+    A sequence is only fused when no jump lands inside it. Jump addresses
+    are remapped to the new layout. Programs that cannot be decoded, or that
+    jump somewhere other than an instruction boundary, are returned as is.
+    """
+    instructions = decode_instructions(bytecode)
+    if instructions is None:
+        return list(bytecode)
+
+    starts = {pc for pc, _, _ in instructions}
+    targets = jump_targets(instructions)
+    if not targets <= starts | {len(bytecode)}:
+        return list(bytecode)
+
+    fused = []
+    new_pcs = {}
+    new_pc = 0
+    i = 0
+    while i < len(instructions):
+        pc, opcode, operands = instructions[i]
+        for sequence, superinstruction in patterns:
+            window = instructions[i : i + len(sequence)]
+            if tuple(op for _, op, _ in window) != sequence:
+                continue
+            if any(inner_pc in targets for inner_pc, _, _ in window[1:]):
+                continue
+            opcode = superinstruction
+            operands = [operand for _, _, ops in window for operand in ops]
+            i += len(sequence) - 1
+            break
+        new_pcs[pc] = new_pc
+        fused.append((opcode, operands))
+        new_pc += 1 + len(operands)
+        i += 1
+    new_pcs[len(bytecode)] = new_pc
+
+    result = []
+    for opcode, operands in fused:
+        if opcode in JUMP_OPERANDS:
+            index = JUMP_OPERANDS[opcode]
+            operands[index] = new_pcs[operands[index]]
+        result.append(opcode.value)
+        result.extend(operands)
+    return result
+
+
+def trace(bytecode: list[int], memory_size=256) -> list[int]:
+    """Run bytecode and return the pc of every instruction executed.
+
+    PRINT output is discarded.
+    """
+    vm = VirtualMachine(memory_size=memory_size, engine="table")
+    pcs = []
+
+    def traced(handler):
+        def wrapper(code):
+            pcs.append(vm._pc)
+            handler(code)
+
+        return wrapper
+
+    vm._dispatch_table = [
+        traced(handler) if handler is not None else None
+        for handler in vm._dispatch_table
+    ]
+    with contextlib.redirect_stdout(io.StringIO()):
+        vm.run(bytecode)
+    pcs.append(vm._pc)
+    return pcs
+
+
+def profile_sequences(
+    programs: list[list[int]], lengths=(2, 3, 4), memory_size=256
+) -> Counter:
+    """Count how often each fusable opcode sequence executes.
+
+    A sequence is fusable when its instructions are adjacent in the bytecode
+    and no jump lands inside it. The most common entries are the best
+    candidates for new superinstructions.
+    """
+    counts = Counter()
+    for bytecode in programs:
+        instructions = decode_instructions(bytecode)
+        if instructions is None:
+            continue
+        by_pc = {pc: (opcode, len(operands)) for pc, opcode, operands in instructions}
+        targets = jump_targets(instructions)
+        pcs = trace(bytecode, memory_size)
+
+        for length in lengths:
+            for start in range(len(pcs) - length + 1):
+                window = pcs[start : start + length]
+                if any(pc in targets for pc in window[1:]):
+                    continue
+                if any(
+                    after != before + 1 + by_pc[before][1]
+                    for before, after in zip(window, window[1:])
+                ):
+                    continue
+                counts[tuple(by_pc[pc][0] for pc in window)] += 1
+    return counts
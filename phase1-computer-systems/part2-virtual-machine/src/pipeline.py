@@ -0,0 +1,53 @@
+from typing import Iterable, Iterator
+
+from scheduler import DEFAULT_QUANTUM
+from sinks import ListSink, OutputSink
+from sources import InputSource
+from vm import VirtualMachine
+
+
+def stream(
+    bytecode: list[int],
+    input: InputSource | Iterable[int],
+    quantum=DEFAULT_QUANTUM,
+    **vm_options,
+) -> Iterator[int]:
+    """Run bytecode as a filter, yielding its PRINT values lazily.
+
+    The program runs `quantum` instructions at a time, so at most that many
+    outputs are held before being yielded and input is only read as the
+    program asks for it. One VM runs the whole stream, so memory and stack
+    carry over from record to record.
+    """
+    sink = ListSink()
+    vm = VirtualMachine(input=input, output=sink, **vm_options)
+    while True:
+        state = vm.run(bytecode, quantum)
+        yield from sink.values
+        sink.values.clear()
+        if state.halted:
+            return
+
+
+def run_pipeline(
+    input: InputSource | Iterable[int],
+    programs: list[list[int]],
+    output: OutputSink,
+    quantum=DEFAULT_QUANTUM,
+    **vm_options,
+) -> VirtualMachine:
+    """Feed input through each program in turn and the last one to output.
+
+    Every program but the last runs as a `stream` stage reading the output
+    of the one before, and the last runs to completion on its engine. With
+    a buffered source and sink, memory stays bounded however long the input
+    is. Returns the last program's VM.
+    """
+    if not programs:
+        raise ValueError("A pipeline needs at least one program.")
+    values = input
+    for bytecode in programs[:-1]:
+        values = stream(bytecode, values, quantum, **vm_options)
+    vm = VirtualMachine(input=values, output=output, **vm_options)
+    vm.run(programs[-1])
+    return vm
@@ -0,0 +1,142 @@
+import json
+import time
+from collections import Counter
+from typing import Callable
+
+from disassembler import disassemble
+from opcodes import Opcode
+
+
+class Profiler:
+    """Counts and times every instruction a VirtualMachine executes.
+
+    Profiling wraps each handler of a copy of the VM's dispatch table and
+    runs it on the table engine, so the unprofiled run loops are untouched.
+    Results accumulate across runs until `reset()` is called. Times are
+    in nanoseconds and include the wrapper's own bookkeeping.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        self.opcode_counts = Counter()
+        self.opcode_times = Counter()
+        self.pc_counts = Counter()
+        self.pc_times = Counter()
+        # (jump pc, target pc) -> times the backward jump was taken.
+        self.loop_iterations = Counter()
+        self.max_stack_depth = 0
+
+    def run(self, vm, bytecode: list[int], budget: int | None = None):
+        """Run bytecode on vm, recording every instruction executed.
+
+        With a budget, runs at most that many instructions and returns the
+        VM's RunState.
+        """
+        table = [
+            self._wrap(vm, Opcode(value), handler) if handler is not None else None
+            for value, handler in enumerate(vm._dispatch_table)
+        ]
+        self.max_stack_depth = max(self.max_stack_depth, vm._stack.size())
+        if budget is not None:
+            state = vm._run_budget(bytecode, budget, table)
+            if state.halted:
+                self._count_halt(vm)
+            return state
+        vm._run_table(bytecode, table)
+        self._count_halt(vm)
+
+    def _count_halt(self, vm) -> None:
+        # HALT has no handler; count it once the loop stops on it.
+        self.opcode_counts[Opcode.HALT] += 1
+        self.pc_counts[vm._pc] += 1
+
+    def _wrap(self, vm, opcode: Opcode, handler: Callable) -> Callable:
+        clock = time.perf_counter_ns
+        stack = vm._stack
+
+        def profiled(bytecode: list[int]) -> None:
+            pc = vm._pc
+            start = clock()
+            handler(bytecode)
+            elapsed = clock() - start
+            self.opcode_counts[opcode] += 1
+            self.opcode_times[opcode] += elapsed
+            self.pc_counts[pc] += 1
+            self.pc_times[pc] += elapsed
+            if vm._pc <= pc:
+                self.loop_iterations[(pc, vm._pc)] += 1
+            depth = stack.size()
+            if depth > self.max_stack_depth:
+                self.max_stack_depth = depth
+
+        return profiled
+
+    def report(self, bytecode: list[int], hot=3) -> str:
+        """Return the disassembly annotated with per-pc counts and times.
+
+        The `hot` lines with the most time are marked with `<<`. Per-opcode
+        totals, loops and the maximum stack depth follow the listing.
+        """
+        total = sum(self.pc_times.values()) or 1
+        hottest = {pc for pc, _ in self.pc_times.most_common(hot)}
+        lines = [f"{'count':>10} {'time us':>10} {'%':>6}  instruction"]
+        for line in disassemble(bytecode).splitlines():
+            pc = int(line.split(":", 1)[0])
+            count = self.pc_counts.get(pc, 0)
+            elapsed = self.pc_times.get(pc, 0)
+            marker = "  <<" if pc in hottest and elapsed else ""
+            lines.append(
+                f"{count:>10} {elapsed / 1000:>10.1f} {100 * elapsed / total:>5.1f}%"
+                f"  {line}{marker}"
+            )
+
+        lines.append("")
+        lines.append(f"{'count':>10} {'time us':>10}  opcode")
+        for opcode, count in self.opcode_counts.most_common():
+            elapsed = self.opcode_times.get(opcode, 0)
+            lines.append(f"{count:>10} {elapsed / 1000:>10.1f}  {opcode.name}")
+
+        if self.loop_iterations:
+            lines.append("")
+            for (pc, target), count in sorted(self.loop_iterations.items()):
+                lines.append(f"loop {pc:04} -> {target:04}: {count} iterations")
+        lines.append("")
+        lines.append(f"max stack depth: {self.max_stack_depth}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        """Return the recorded data as plain JSON-compatible values."""
+        return {
+            "opcodes": {
+                opcode.name: {"count": count, "time_ns": self.opcode_times[opcode]}
+                for opcode, count in self.opcode_counts.items()
+            },
+            "pcs": {
+                str(pc): {"count": count, "time_ns": self.pc_times[pc]}
+                for pc, count in sorted(self.pc_counts.items())
+            },
+            "loops": [
+                {"jump": pc, "target": target, "iterations": count}
+                for (pc, target), count in sorted(self.loop_iterations.items())
+            ],
+            "max_stack_depth": self.max_stack_depth,
+        }
+
+    def to_json(self) -> str:
+        """Return the recorded data as a JSON document."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def collapsed(self, bytecode: list[int], name="program") -> str:
+        """Return the per-pc times in collapsed-stack format.
+
+        Each line is `name;OPCODE@pc time_ns`, which flame graph tools and
+        plain diffs can both consume.
+        """
+        lines = []
+        for pc, elapsed in sorted(self.pc_times.items()):
+            opcode = Opcode(bytecode[pc])
+            lines.append(f"{name};{opcode.name}@{pc:04} {elapsed}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,79 @@
+import threading
+from array import array
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import Callable
+
+
+def program_cache(maxsize: int) -> Callable[[Callable], Callable]:
+    """Cache a function of (code tuple, *args) by the bytecode it came from.
+
+    The wrapped function is called with the bytecode itself. A program seen
+    before is found by identity, without copying or hashing it: tuples and
+    read-only memoryviews (`bytecode_file` images) outright, and lists and
+    arrays after comparing them with a copy taken when they were cached, so
+    a program changed in place is looked up again. Only then is the bytecode
+    copied into a tuple, which keys an lru_cache of maxsize underneath, so
+    equal programs still share one result. Both levels are safe to use from
+    several threads. `cache_info` and `cache_clear` are the lru_cache's,
+    and `cache_clear` forgets identities too.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        by_content = lru_cache(maxsize=maxsize)(function)
+        # (id(bytecode), *args) -> (bytecode, copy, result). Holding the
+        # bytecode keeps its id from being reused while it is cached.
+        by_identity = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(function)
+        def wrapper(bytecode, *args):
+            key = (id(bytecode), *args)
+            with lock:
+                entry = by_identity.get(key)
+                if entry is not None:
+                    by_identity.move_to_end(key)
+            if entry is not None and _unchanged(bytecode, entry[1]):
+                return entry[2]
+            code = tuple(bytecode)
+            result = by_content(code, *args)
+            with lock:
+                by_identity[key] = (bytecode, _copy(bytecode, code), result)
+                by_identity.move_to_end(key)
+                if len(by_identity) > maxsize:
+                    by_identity.popitem(last=False)
+            return result
+
+        def cache_clear() -> None:
+            with lock:
+                by_identity.clear()
+            by_content.cache_clear()
+
+        wrapper.cache_info = by_content.cache_info
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+def _copy(bytecode, code: tuple[int, ...]):
+    """Return what bytecode must still equal to reuse its result.
+
+    None if it cannot change; a tuple of its content if it is neither a
+    list nor an array, and so has no cheap copy to compare with.
+    """
+    if isinstance(bytecode, tuple):
+        return None
+    if isinstance(bytecode, memoryview) and bytecode.readonly:
+        return None
+    if isinstance(bytecode, (list, array)):
+        return bytecode[:]
+    return code
+
+
+def _unchanged(bytecode, copy) -> bool:
+    if copy is None:
+        return True
+    if isinstance(copy, tuple):
+        return tuple(bytecode) == copy
+    return bytecode == copy
@@ -0,0 +1,399 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from disassembler import decode_instructions, jump_targets
+from opcodes import BINARY_OPERATIONS, JUMP_OPERANDS, Opcode
+from program_cache import program_cache
+from sources import as_source
+from translator import TranslationError, stack_depths
+from vm import VirtualMachine
+
+# Register programs address a single list of cells laid out as
+# [memory..., registers..., constants...], so every operand is a plain index.
+# RegisterVM's memory list is that list: registers and constants are appended
+# for a run and removed after it.
+
+BINARY_FUNCTIONS = {
+    opcode.name: operation for opcode, operation in BINARY_OPERATIONS.items()
+}
+
+# Branch taken when a comparison is true (for JNZ) or false (for JZ).
+BRANCH_IF_TRUE = {
+    Opcode.EQ: "BEQ",
+    Opcode.NEQ: "BNE",
+    Opcode.LT: "BLT",
+    Opcode.GT: "BGT",
+    Opcode.LE: "BLE",
+    Opcode.GE: "BGE",
+}
+BRANCH_IF_FALSE = {
+    Opcode.EQ: "BNE",
+    Opcode.NEQ: "BEQ",
+    Opcode.LT: "BGE",
+    Opcode.GT: "BLE",
+    Opcode.LE: "BGT",
+    Opcode.GE: "BLT",
+}
+
+# Each branch is taken when its comparison returns 1.
+BRANCH_FUNCTIONS = {
+    branch: BINARY_OPERATIONS[opcode] for opcode, branch in BRANCH_IF_TRUE.items()
+}
+
+# Instruction kinds used by the interpreter loop.
+BINARY, MOVE, BRANCH, JUMP, PRINT, HALT = range(6)
+
+
+class RegisterInstruction(NamedTuple):
+    """One register instruction. Operands are cell indexes; for branches and
+    JMP `dest` is an instruction index, and for HALT `a` is the stack depth.
+    """
+
+    op: str
+    a: int | None = None
+    b: int | None = None
+    dest: int | None = None
+
+
+@dataclass
+class RegisterProgram:
+    instructions: list[RegisterInstruction]
+    memory_size: int
+    register_count: int
+    constants: list[int] = field(default_factory=list)
+
+    def describe(self, cell: int) -> str:
+        """Return a readable name for a cell index."""
+        if cell < self.memory_size:
+            return f"m[{cell}]"
+        if cell < self.memory_size + self.register_count:
+            return f"r{cell - self.memory_size}"
+        return f"#{self.constants[cell - self.memory_size - self.register_count]}"
+
+
+def format_registers(program: RegisterProgram) -> str:
+    """Render a register program as e.g. `0003: ADD r0, #1 -> r0`."""
+    lines = []
+    for index, (op, a, b, dest) in enumerate(program.instructions):
+        if op in BINARY_FUNCTIONS:
+            text = f"{op} {program.describe(a)}, {program.describe(b)}"
+            text += f" -> {program.describe(dest)}"
+        elif op == "MOVE":
+            text = f"MOVE {program.describe(a)} -> {program.describe(dest)}"
+        elif op in BRANCH_FUNCTIONS:
+            text = f"{op} {program.describe(a)}, {program.describe(b)} -> {dest:04}"
+        elif op == "JMP":
+            text = f"JMP {dest:04}"
+        elif op == "PRINT":
+            text = f"PRINT {program.describe(a)}"
+        else:
+            text = f"HALT {a}"
+        lines.append(f"{index:04}: {text}")
+    return "\n".join(lines) + "\n"
+
+
+class _RegisterWriter:
+    """Turns stack instructions into register instructions.
+
+    Stack slot i lives in register i. Constants, memory cells and copies of
+    lower slots stay symbolic as operands until they have to be stored, so
+    `LOAD x, PUSH 1, ADD` becomes a single `ADD m[x], #1 -> r0`.
+    """
+
+    def __init__(self) -> None:
+        self.code = []
+        self.stack = []
+        self.register_count = 0
+
+    def set_depth(self, depth: int) -> None:
+        self.stack = [("r", i) for i in range(depth)]
+
+    def emit(self, op: str, a=None, b=None, dest=None) -> None:
+        self.code.append((op, a, b, dest))
+
+    def result(self, op: str, a, b) -> None:
+        slot = len(self.stack)
+        self.emit(op, a, b, ("r", slot))
+        self.stack.append(("r", slot))
+        self.register_count = max(self.register_count, slot + 1)
+
+    def write_memory(self, address: int, value) -> None:
+        # Symbolic reads of this cell must happen before it changes.
+        for i, entry in enumerate(self.stack):
+            if entry == ("m", address):
+                self._materialize(i)
+        if value == ("m", address):
+            return
+        self.emit("MOVE", value, None, ("m", address))
+
+    def _materialize(self, i: int) -> None:
+        self.emit("MOVE", self.stack[i], None, ("r", i))
+        self.stack[i] = ("r", i)
+        self.register_count = max(self.register_count, i + 1)
+
+    def flush(self) -> None:
+        for i, entry in enumerate(self.stack):
+            if entry != ("r", i):
+                self._materialize(i)
+
+    def swap(self) -> None:
+        # A slot may only refer to a lower register whose slot holds it, so
+        # registers that would end up referred to from below are moved.
+        first = self.stack.pop()
+        second = self.stack.pop()
+        depth = len(self.stack)
+        low, high = ("r", depth), ("r", depth + 1)
+        self.register_count = max(self.register_count, depth + 2)
+        if second == low and first == high:
+            scratch = ("r", depth + 2)
+            self.register_count = max(self.register_count, depth + 3)
+            self.emit("MOVE", low, None, scratch)
+            self.emit("MOVE", high, None, low)
+            self.emit("MOVE", scratch, None, high)
+            first, second = low, high
+        elif second == low:
+            self.emit("MOVE", low, None, high)
+            second = high
+        elif first == high:
+            self.emit("MOVE", high, None, low)
+            first = low
+        self.stack.extend([first, second])
+
+
+def to_registers(bytecode: list[int], memory_size=256) -> RegisterProgram:
+    """Translate stack bytecode into a register program.
+
+    Raises TranslationError for programs whose stack depth is not the same on
+    every path, like the ahead-of-time translator.
+    """
+    depths = stack_depths(bytecode, memory_size)
+    instructions = [
+        instruction
+        for instruction in decode_instructions(bytecode)
+        if instruction[0] in depths
+    ]
+    leaders = {0} | (jump_targets(instructions) & depths.keys())
+    for pc, opcode, operands in instructions:
+        if opcode in JUMP_OPERANDS:
+            leaders.add(pc + 1 + len(operands))
+
+    writer = _RegisterWriter()
+    starts = {}
+    skip_next = False
+    for index, (pc, opcode, operands) in enumerate(instructions):
+        if pc in leaders:
+            writer.flush()
+            writer.set_depth(depths[pc])
+            starts[pc] = len(writer.code)
+        if skip_next:
+            skip_next = False
+            continue
+        stack = writer.stack
+        following = instructions[index + 1] if index + 1 < len(instructions) else None
+
+        if opcode in BRANCH_IF_TRUE and following and following[0] not in leaders:
+            _, next_opcode, next_operands = following
+            if next_opcode in (Opcode.JZ, Opcode.JNZ):
+                right = stack.pop()
+                left = stack.pop()
+                writer.flush()
+                table = BRANCH_IF_TRUE if next_opcode == Opcode.JNZ else BRANCH_IF_FALSE
+                writer.emit(table[opcode], left, right, next_operands[0])
+                skip_next = True
+                continue
+
+        if opcode.name in BINARY_FUNCTIONS:
+            right = stack.pop()
+            left = stack.pop()
+            writer.result(opcode.name, left, right)
+        elif opcode == Opcode.PUSH:
+            stack.append(("k", operands[0]))
+        elif opcode == Opcode.LOAD:
+            stack.append(("m", operands[0]))
+        elif opcode == Opcode.STORE:
+            writer.write_memory(operands[0], stack.pop())
+        elif opcode == Opcode.POP:
+            stack.pop()
+        elif opcode == Opcode.DUP:
+            stack.append(stack[-1])
+        elif opcode == Opcode.SWAP:
+            writer.swap()
+        elif opcode == Opcode.PRINT:
+            writer.emit("PRINT", stack.pop())
+        elif opcode == Opcode.LOAD_LOAD_MUL:
+            writer.result("MUL", ("m", operands[0]), ("m", operands[1]))
+        elif opcode == Opcode.LOAD_LOAD_ADD:
+            writer.result("ADD", ("m", operands[0]), ("m", operands[1]))
+        elif opcode == Opcode.LOAD_ADD:
+            writer.result("ADD", stack.pop(), ("m", operands[0]))
+        elif opcode == Opcode.PUSH_ADD:
+            writer.result("ADD", stack.pop(), ("k", operands[0]))
+        elif opcode == Opcode.PUSH_SUB:
+            writer.result("SUB", stack.pop(), ("k", operands[0]))
+        elif opcode == Opcode.DUP_STORE:
+            writer.write_memory(operands[0], stack[-1])
+        elif opcode == Opcode.JMP:
+            writer.flush()
+            writer.emit("JMP", dest=operands[0])
+        elif opcode in (Opcode.JZ, Opcode.JNZ, Opcode.PUSH_GE_JNZ):
+            value = stack.pop()
+            writer.flush()
+            if opcode == Opcode.PUSH_GE_JNZ:
+                writer.emit("BGE", value, ("k", operands[0]), operands[1])
+            else:
+                branch = "BEQ" if opcode == Opcode.JZ else "BNE"
+                writer.emit(branch, value, ("k", 0), operands[0])
+        elif opcode == Opcode.HALT:
+            writer.flush()
+            writer.emit("HALT", len(stack))
+        else:
+            raise TranslationError(f"Unsupported opcode at pc {pc}: {opcode.name}")
+
+    return _resolve(writer, starts, memory_size)
+
+
+def _resolve(
+    writer: _RegisterWriter, starts: dict, memory_size: int
+) -> RegisterProgram:
+    """Replace symbolic operands with cell indexes and pcs with positions."""
+    registers = writer.register_count
+    constants = []
+    constant_cells = {}
+
+    def cell(operand) -> int:
+        kind, value = operand
+        if kind == "m":
+            return value
+        if kind == "r":
+            return memory_size + value
+        if value not in constant_cells:
+            constant_cells[value] = memory_size + registers + len(constants)
+            constants.append(value)
+        return constant_cells[value]
+
+    instructions = []
+    for op, a, b, dest in writer.code:
+        if op == "HALT":
+            instructions.append(RegisterInstruction(op, a))
+        elif op == "JMP":
+            instructions.append(RegisterInstruction(op, dest=starts[dest]))
+        elif op in BRANCH_FUNCTIONS:
+            instructions.append(RegisterInstruction(op, cell(a), cell(b), starts[dest]))
+        elif op == "PRINT":
+            instructions.append(RegisterInstruction(op, cell(a)))
+        elif op == "MOVE":
+            instructions.append(RegisterInstruction(op, cell(a), dest=cell(dest)))
+        else:
+            instructions.append(RegisterInstruction(op, cell(a), cell(b), cell(dest)))
+    return RegisterProgram(instructions, memory_size, registers, constants)
+
+
+@program_cache(maxsize=128)
+def _cached_program(code: tuple[int, ...], memory_size: int) -> RegisterProgram:
+    return to_registers(list(code), memory_size)
+
+
+def _executable(program: RegisterProgram) -> list[tuple]:
+    """Pair each instruction with its kind and Python function for the loop."""
+    code = []
+    for op, a, b, dest in program.instructions:
+        if op in BINARY_FUNCTIONS:
+            code.append((BINARY, BINARY_FUNCTIONS[op], a, b, dest))
+        elif op in BRANCH_FUNCTIONS:
+            code.append((BRANCH, BRANCH_FUNCTIONS[op], a, b, dest))
+        elif op == "MOVE":
+            code.append((MOVE, None, a, b, dest))
+        elif op == "JMP":
+            code.append((JUMP, None, a, b, dest))
+        elif op == "PRINT":
+            code.append((PRINT, None, a, b, dest))
+        else:
+            code.append((HALT, None, a, b, dest))
+    return code
+
+
+class RegisterVM:
+    """Runs stack bytecode by translating it to register form first.
+
+    Programs that cannot be translated run on a VirtualMachine over the
+    same memory, output and input instead, like `translator.run`.
+    """
+
+    def __init__(self, memory_size=256, output=None, input=None) -> None:
+        self._memory = [0] * memory_size
+        self._stack = []
+        self.dispatches = 0
+        self.output = output
+        self.input = as_source(input)
+        self._write = print if output is None else output.write
+        self._fallback = None
+
+    def run(self, bytecode: list[int]) -> bool:
+        """Translate (cached, see program_cache) and execute the bytecode.
+
+        Falls back to the stack VM when translation raises TranslationError,
+        for bulk memory opcodes, INPUT and EOF, inconsistent stack depths
+        and the like. Returns True if the register form ran.
+        """
+        try:
+            program = _cached_program(bytecode, len(self._memory))
+        except TranslationError:
+            self._run_stack_vm(bytecode)
+            return False
+        self.execute(program)
+        return True
+
+    def _run_stack_vm(self, bytecode: list[int]) -> None:
+        if self._fallback is None:
+            self._fallback = VirtualMachine(
+                memory=self._memory, output=self.output, input=self.input
+            )
+        vm = self._fallback
+        vm._pc = 0
+        vm._stack.clear()
+        before = vm.stats().instructions
+        try:
+            vm.run(bytecode)
+        finally:
+            self._stack = list(vm._stack)
+            self.dispatches += vm.stats().instructions - before
+
+    def execute(self, program: RegisterProgram) -> None:
+        """Execute a register program against this VM's memory."""
+        memory_size = len(self._memory)
+        if program.memory_size != memory_size:
+            raise ValueError(
+                f"Program is for {program.memory_size} memory cells, "
+                f"not {memory_size}."
+            )
+        cells = self._memory
+        cells += [0] * program.register_count
+        cells += program.constants
+        code = _executable(program)
+        write = self._write
+        pc = 0
+        steps = 0
+        try:
+            while True:
+                kind, function, a, b, dest = code[pc]
+                pc += 1
+                steps += 1
+                if kind == BINARY:
+                    cells[dest] = function(cells[a], cells[b])
+                elif kind == MOVE:
+                    cells[dest] = cells[a]
+                elif kind == BRANCH:
+                    if function(cells[a], cells[b]):
+                        pc = dest
+                elif kind == JUMP:
+                    pc = dest
+                elif kind == PRINT:
+                    write(cells[a])
+                else:
+                    self._stack = cells[memory_size : memory_size + a]
+                    break
+        finally:
+            del cells[memory_size:]
+            self.dispatches += steps
+            if self.output is not None:
+                self.output.flush()
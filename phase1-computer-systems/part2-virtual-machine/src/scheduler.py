@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+
+from vm import VirtualMachine
+
+DEFAULT_QUANTUM = 1000
+
+
+@dataclass(eq=False)
+class ProgramTask:
+    """A program scheduled on a Scheduler, with its CPU accounting.
+
+    `status` is "ready" until the program halts ("halted") or raises
+    ("failed", with the exception in `error`). `cpu_time` is the thread
+    CPU time spent in its slices, in seconds.
+    """
+
+    name: str
+    vm: VirtualMachine
+    bytecode: list[int]
+    priority: int = 1
+    status: str = "ready"
+    error: Exception | None = None
+    steps: int = 0
+    slices: int = 0
+    cpu_time: float = 0.0
+    _done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    async def wait(self) -> VirtualMachine:
+        """Wait for the program to finish and return its VM.
+
+        Re-raises the exception if the program failed.
+        """
+        await self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.vm
+
+
+class Scheduler:
+    """Time-slices many VMs cooperatively on one asyncio event loop.
+
+    Each slice runs one program for `quantum` instructions and then yields
+    to the event loop. The next program is the one with the least virtual
+    time, which grows by steps / priority per slice, so a program with
+    priority 2 gets twice the instructions of one with priority 1 and no
+    ready program is starved. New programs start at the current virtual
+    time rather than zero, so they cannot monopolise the loop either.
+    """
+
+    def __init__(self, quantum=DEFAULT_QUANTUM) -> None:
+        if quantum < 1:
+            raise ValueError("quantum must be at least 1")
+        self._quantum = quantum
+        self._ready = []
+        self._order = itertools.count()
+        self._clock = 0.0
+        self.tasks = []
+
+    def spawn(
+        self, bytecode: list[int], priority=1, name=None, **vm_options
+    ) -> ProgramTask:
+        """Schedule bytecode on a new VM built with vm_options."""
+        if priority < 1:
+            raise ValueError("priority must be at least 1")
+        vm = VirtualMachine(**vm_options)
+        task = ProgramTask(name or f"program-{len(self.tasks)}", vm, bytecode, priority)
+        self.tasks.append(task)
+        start = self._ready[0][0] if self._ready else self._clock
+        heapq.heappush(self._ready, (start, next(self._order), task))
+        return task
+
+    async def run(self) -> None:
+        """Run slices until every scheduled program has finished.
+
+        Programs spawned while this runs, from this or other coroutines,
+        are picked up too.
+        """
+        while self._ready:
+            vruntime, _, task = heapq.heappop(self._ready)
+            self._clock = vruntime
+            start = time.thread_time()
+            try:
+                state = task.vm.run(task.bytecode, self._quantum)
+            except Exception as error:
+                task.status, task.error = "failed", error
+                task._done.set()
+                state = None
+            task.cpu_time += time.thread_time() - start
+            task.slices += 1
+
+            if state is not None:
+                task.steps += state.steps
+                if state.halted:
+                    task.status = "halted"
+                    task._done.set()
+                else:
+                    vruntime += state.steps / task.priority
+                    heapq.heappush(self._ready, (vruntime, next(self._order), task))
+            await asyncio.sleep(0)
+
+    def report(self) -> str:
+        """Return one line of accounting per program."""
+        lines = [
+            f"{'name':<16} {'status':<8} {'prio':>4} {'steps':>10} "
+            f"{'slices':>7} {'cpu ms':>9}"
+        ]
+        for task in self.tasks:
+            lines.append(
+                f"{task.name:<16} {task.status:<8} {task.priority:>4} "
+                f"{task.steps:>10} {task.slices:>7} {task.cpu_time * 1000:>9.3f}"
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,91 @@
+import sys
+from array import array
+from typing import BinaryIO, Protocol, TextIO
+
+DEFAULT_BUFFER_SIZE = 4096
+
+
+class OutputSink(Protocol):
+    """Where PRINT sends values. `flush` is called when a run ends."""
+
+    def write(self, value: int) -> None: ...
+
+    def flush(self) -> None: ...
+
+
+class ListSink:
+    """Collects printed values in a list, for tests and embedding."""
+
+    def __init__(self) -> None:
+        self.values = []
+
+    def write(self, value: int) -> None:
+        self.values.append(value)
+
+    def flush(self) -> None:
+        pass
+
+
+class BufferedTextSink:
+    """Writes one value per line, like print(), in large batches.
+
+    Values are held until `buffer_size` accumulate or the run ends, then
+    written with a single call. With no stream, sys.stdout is looked up at
+    flush time so redirection still works.
+    """
+
+    def __init__(self, stream: TextIO | None = None, buffer_size=DEFAULT_BUFFER_SIZE):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._values = []
+
+    def write(self, value: int) -> None:
+        values = self._values
+        values.append(value)
+        if len(values) >= self._buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._values:
+            return
+        stream = self._stream or sys.stdout
+        stream.write("\n".join(map(str, self._values)) + "\n")
+        stream.flush()
+        self._values.clear()
+
+
+class BinaryIntSink:
+    """Writes values as packed signed 64-bit integers in native byte order.
+
+    Values outside the int64 range raise OverflowError. Use `read_ints` to
+    decode the stream.
+    """
+
+    def __init__(self, stream: BinaryIO, buffer_size=DEFAULT_BUFFER_SIZE):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._values = array("q")
+
+    def write(self, value: int) -> None:
+        values = self._values
+        values.append(value)
+        if len(values) >= self._buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._values:
+            return
+        self._stream.write(self._values.tobytes())
+        self._stream.flush()
+        del self._values[:]
+
+
+def read_ints(data: bytes) -> list[int]:
+    """Decode the output of a BinaryIntSink."""
+    values = array("q")
+    values.frombytes(data)
+    return values.tolist()
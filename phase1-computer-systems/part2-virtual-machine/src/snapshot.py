@@ -0,0 +1,287 @@
+import itertools
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+
+from bytecode_file import BytecodeFileError, dump
+from bytecode_file import load as load_image
+from memory import SPARSE_PAGE_SHIFT, SparseMemory
+from vm import VirtualMachine
+
+# The same page size as SparseMemory, so its page dict can be paged as is.
+PAGE_SHIFT = SPARSE_PAGE_SHIFT
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+# The symbols `save` writes and `load` requires.
+SYMBOLS = ("pc", "stack_size", "memory_size", "pages", "typecode")
+
+
+class CowMemory:
+    """VM memory split into pages that are shared until written.
+
+    A page is copied the first time this memory writes to it, so forking
+    only copies the page table. Pages missing from the table read as 0 and
+    are allocated on first write. Pages are lists of Python ints, or arrays
+    of `typecode`, which keep the array's OverflowError on stores that do
+    not fit. Supports the indexing and len() the VM handlers use; addresses
+    are bounds-checked by the handlers themselves.
+    """
+
+    def __init__(
+        self, pages: dict[int, list[int] | array], size: int, typecode=None
+    ) -> None:
+        self._pages = dict(pages)
+        self._owned = set()
+        self._size = size
+        self._typecode = typecode
+
+    @classmethod
+    def from_list(cls, values: list[int] | array) -> "CowMemory":
+        """Page a copy of values, a list or an array."""
+        pages = {
+            start >> PAGE_SHIFT: values[start : start + PAGE_SIZE]
+            for start in range(0, len(values), PAGE_SIZE)
+        }
+        return cls(pages, len(values), getattr(values, "typecode", None))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, address):
+        if isinstance(address, slice):
+            return [self[i] for i in range(*address.indices(self._size))]
+        if not 0 <= address < self._size:
+            raise IndexError("memory index out of range")
+        page = self._pages.get(address >> PAGE_SHIFT)
+        if page is None:
+            return 0
+        return page[address & (PAGE_SIZE - 1)]
+
+    def __setitem__(self, address, value) -> None:
+        if isinstance(address, slice):
+            indices = range(*address.indices(self._size))
+            values = list(value)
+            if len(values) != len(indices):
+                raise ValueError("slice assignment cannot change memory size")
+            for index, item in zip(indices, values):
+                self[index] = item
+            return
+        if not 0 <= address < self._size:
+            raise IndexError("memory index out of range")
+        index = address >> PAGE_SHIFT
+        if index not in self._owned:
+            page = self._pages.get(index)
+            self._pages[index] = self._new_page() if page is None else page[:]
+            self._owned.add(index)
+        self._pages[index][address & (PAGE_SIZE - 1)] = value
+
+    def _new_page(self) -> list[int] | array:
+        if self._typecode is None:
+            return [0] * PAGE_SIZE
+        return array(self._typecode, [0]) * PAGE_SIZE
+
+    def __iter__(self):
+        for start in range(0, self._size, PAGE_SIZE):
+            count = min(PAGE_SIZE, self._size - start)
+            page = self._pages.get(start >> PAGE_SHIFT)
+            if page is None:
+                yield from itertools.repeat(0, count)
+            else:
+                yield from itertools.islice(page, count)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, CowMemory)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def zero(self) -> None:
+        """Set every cell to 0 by dropping all pages."""
+        self._pages.clear()
+        self._owned.clear()
+
+    def freeze(self) -> dict[int, list[int] | array]:
+        """Return the current pages for sharing.
+
+        This memory stops owning them, so it copies a page again before
+        its next write and the returned pages never change.
+        """
+        self._owned.clear()
+        return dict(self._pages)
+
+    def copied_pages(self) -> int:
+        """Return how many pages this memory has copied since it was made."""
+        return len(self._owned)
+
+    def tolist(self) -> list[int]:
+        return list(self)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A VM's pc, stack and memory at one point. Its pages are never written.
+
+    `pages` maps page index to page; missing pages are all 0. `typecode`
+    is the array typecode of the pages, or None for lists of Python ints.
+    """
+
+    pc: int
+    stack: tuple[int, ...]
+    pages: dict[int, list[int] | array]
+    memory_size: int
+    typecode: str | None = None
+
+    def memory(self) -> CowMemory:
+        """Return a copy-on-write view of the snapshot's memory."""
+        return CowMemory(self.pages, self.memory_size, self.typecode)
+
+
+def take(vm: VirtualMachine) -> Snapshot:
+    """Capture the VM's state.
+
+    Memory the VM made itself becomes copy-on-write over the snapshot's
+    pages, so later snapshots and forks only copy the page table. A store
+    passed as `memory=` keeps receiving the VM's writes, so its cells are
+    copied into the snapshot instead: pages of the array's or memoryview's
+    typecode, or of Python ints for lists and SparseMemory. Only nonzero
+    pages are kept, and SparseMemory is only read where it has allocated.
+    Other stores raise TypeError.
+    """
+    memory = vm._memory
+    if isinstance(memory, CowMemory):
+        pages = memory.freeze()
+    elif vm._owns_memory:
+        vm._memory = CowMemory.from_list(memory)
+        pages = vm._memory.freeze()
+    else:
+        pages = _copy_pages(memory)
+    return Snapshot(vm._pc, tuple(vm._stack), pages, len(memory), _typecode(memory))
+
+
+def _typecode(memory) -> str | None:
+    if isinstance(memory, CowMemory):
+        return memory._typecode
+    if isinstance(memory, memoryview):
+        return memory.format
+    return getattr(memory, "typecode", None)
+
+
+def _copy_pages(memory) -> dict[int, list[int] | array]:
+    """Return copies of the nonzero pages of a store the VM does not own."""
+    if isinstance(memory, SparseMemory):
+        return {index: page[:] for index, page in memory._pages.items() if any(page)}
+    if not isinstance(memory, (list, array, memoryview)):
+        raise TypeError(
+            f"Cannot snapshot {type(memory).__name__} memory; snapshots "
+            "support list, array, memoryview and SparseMemory memory."
+        )
+    pages = {}
+    for start in range(0, len(memory), PAGE_SIZE):
+        # List and array slices are copies; memoryview slices are not.
+        page = memory[start : start + PAGE_SIZE]
+        if isinstance(page, memoryview):
+            page = array(page.format, page)
+        if any(page):
+            pages[start >> PAGE_SHIFT] = page
+    return pages
+
+
+def restore(vm: VirtualMachine, snapshot: Snapshot) -> None:
+    """Put the VM back into the snapshot's state.
+
+    Memory the VM made itself is replaced by a copy-on-write view of the
+    snapshot. A store passed as `memory=` is written in place instead, and
+    must be the snapshot's size.
+    """
+    if vm._owns_memory:
+        vm._memory = snapshot.memory()
+    elif len(vm._memory) != snapshot.memory_size:
+        raise ValueError(
+            f"Cannot restore {snapshot.memory_size} cells of memory into "
+            f"{len(vm._memory)}."
+        )
+    else:
+        vm.reset()
+        memory = vm._memory
+        for index, page in snapshot.pages.items():
+            start = index << PAGE_SHIFT
+            count = min(PAGE_SIZE, snapshot.memory_size - start)
+            for address, value in enumerate(page[:count], start):
+                if value:
+                    memory[address] = value
+    vm._pc = snapshot.pc
+    vm._stack.clear()
+    vm._stack.extend(snapshot.stack)
+
+
+def spawn(snapshot: Snapshot, **options) -> VirtualMachine:
+    """Build a new VM (with constructor options) in the snapshot's state."""
+    vm = VirtualMachine(memory_size=0, **options)
+    restore(vm, snapshot)
+    return vm
+
+
+def fork(vm: VirtualMachine, **options) -> VirtualMachine:
+    """Return a child VM in vm's current state, sharing memory pages.
+
+    The child uses vm's engine, settings and output sink unless overridden
+    by options.
+    """
+    settings = {
+        "engine": vm._engine,
+        "jit_threshold": vm._jit_threshold,
+        "verify": vm._verify,
+        "output": vm.output,
+        "stack_capacity": getattr(vm._stack, "capacity", None),
+    }
+    return spawn(take(vm), **(settings | options))
+
+
+def save(snapshot: Snapshot, path: str | Path) -> None:
+    """Write a snapshot to disk in the binary bytecode file format.
+
+    The words are the stack, then each nonzero page as its index followed
+    by its cells, so sparse memory stays small on disk. pc, stack size,
+    memory size, page count and typecode (as a character code, 0 for
+    Python ints) are stored as symbols.
+    """
+    words = list(snapshot.stack)
+    pages = 0
+    for index, page in sorted(snapshot.pages.items()):
+        start = index << PAGE_SHIFT
+        cells = list(page[: min(PAGE_SIZE, snapshot.memory_size - start)])
+        if any(cells):
+            words += [index, *cells]
+            pages += 1
+    symbols = {
+        "pc": snapshot.pc,
+        "stack_size": len(snapshot.stack),
+        "memory_size": snapshot.memory_size,
+        "pages": pages,
+        "typecode": ord(snapshot.typecode) if snapshot.typecode else 0,
+    }
+    try:
+        dump(words, path, symbols)
+    except BytecodeFileError:
+        dump(words, path, symbols, encoding="varint")
+
+
+def load(path: str | Path) -> Snapshot:
+    """Read a snapshot written by `save`."""
+    with load_image(path) as image:
+        words = list(image.code)
+        symbols = image.symbols
+    if not set(SYMBOLS) <= symbols.keys():
+        raise BytecodeFileError("File is not a VM snapshot.")
+    stack_size, size = symbols["stack_size"], symbols["memory_size"]
+    typecode = chr(symbols["typecode"]) if symbols["typecode"] else None
+    pages = {}
+    position = stack_size
+    for _ in range(symbols["pages"]):
+        index = words[position]
+        count = min(PAGE_SIZE, size - (index << PAGE_SHIFT))
+        page = words[position + 1 : position + 1 + count]
+        pages[index] = page if typecode is None else array(typecode, page)
+        position += 1 + count
+    if position != len(words):
+        raise BytecodeFileError("Snapshot memory pages do not match the file.")
+    return Snapshot(symbols["pc"], tuple(words[:stack_size]), pages, size, typecode)
@@ -0,0 +1,94 @@
+from array import array
+from typing import BinaryIO, Iterable, Protocol
+
+DEFAULT_BUFFER_SIZE = 4096
+RECORD_SIZE = 8
+
+_MISSING = object()
+
+
+class InputSource(Protocol):
+    """Where INPUT reads values. `read` raises EOFError past the end."""
+
+    def read(self) -> int: ...
+
+    def at_end(self) -> bool: ...
+
+
+class IteratorSource:
+    """Reads values lazily from any iterable of ints.
+
+    `at_end` looks one value ahead, so the iterable is consumed only as
+    fast as the program reads it. Text files work through a generator,
+    e.g. IteratorSource(int(line) for line in file).
+    """
+
+    def __init__(self, values: Iterable[int]) -> None:
+        self._values = iter(values)
+        self._next = _MISSING
+
+    def read(self) -> int:
+        value = self._next
+        if value is not _MISSING:
+            self._next = _MISSING
+            return value
+        try:
+            return next(self._values)
+        except StopIteration:
+            raise EOFError("Input exhausted.") from None
+
+    def at_end(self) -> bool:
+        if self._next is _MISSING:
+            self._next = next(self._values, _MISSING)
+        return self._next is _MISSING
+
+
+class BinaryIntSource:
+    """Reads packed signed 64-bit integers in native byte order.
+
+    The format written by sinks.BinaryIntSink. Records are read
+    `buffer_size` at a time, so memory use does not grow with the stream.
+    """
+
+    def __init__(self, stream: BinaryIO, buffer_size=DEFAULT_BUFFER_SIZE) -> None:
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._values = array("q")
+        self._index = 0
+
+    def read(self) -> int:
+        if self._index >= len(self._values) and not self._fill():
+            raise EOFError("Input exhausted.")
+        value = self._values[self._index]
+        self._index += 1
+        return value
+
+    def at_end(self) -> bool:
+        return self._index >= len(self._values) and not self._fill()
+
+    def _fill(self) -> bool:
+        """Read the next buffer of records. Returns False at end of stream."""
+        data = self._stream.read(self._buffer_size * RECORD_SIZE)
+        while data and len(data) % RECORD_SIZE:
+            more = self._stream.read(RECORD_SIZE - len(data) % RECORD_SIZE)
+            if not more:
+                raise ValueError("Input ends with a partial record.")
+            data += more
+        self._values = array("q")
+        self._values.frombytes(data)
+        self._index = 0
+        return bool(self._values)
+
+
+def as_source(input) -> InputSource:
+    """Return input as an InputSource, wrapping plain iterables.
+
+    None gives an empty source.
+    """
+    if input is None:
+        return IteratorSource(())
+    if hasattr(input, "read") and hasattr(input, "at_end"):
+        return input
+    return IteratorSource(input)
@@ -1,4 +1,9 @@
-from typing import Any
+from array import array
+from typing import Any, Callable, Iterable, Iterator
+
+DEFAULT_CAPACITY = 1024
+# Item type of ArrayStack: signed 64-bit ints, matching VM memory backends.
+DEFAULT_TYPECODE = "q"
 
 
 class EmptyStackError(Exception):
@@ -7,6 +12,12 @@ class EmptyStackError(Exception):
     pass
 
 
+class StackOverflowError(Exception):
+    """Raised when pushing onto a full ArrayStack."""
+
+    pass
+
+
 class Stack:
     """A simple stack implementation using a Python list."""
 
@@ -29,6 +40,45 @@ class Stack:
             raise EmptyStackError("Cannot pop from an empty stack.")
         return self._items.pop()
 
+    def pop2(self) -> tuple[Any, Any]:
+        """Remove the top two items and return them as (second, top)."""
+        items = self._items
+        if len(items) < 2:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        top = items.pop()
+        return items.pop(), top
+
+    def popn(self, k: int) -> list[Any]:
+        """Remove the top k items and return them, bottom first."""
+        items = self._items
+        if k > len(items):
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        if k <= 0:
+            return []
+        values = items[-k:]
+        del items[-k:]
+        return values
+
+    def binop(self, fn: Callable[[Any, Any], Any]) -> None:
+        """Replace the top two items a, b (b on top) with fn(a, b).
+
+        The stack is unchanged if fn raises.
+        """
+        items = self._items
+        if len(items) < 2:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        value = fn(items[-2], items[-1])
+        items.pop()
+        items[-1] = value
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """Push every value in order."""
+        self._items.extend(values)
+
+    def clear(self) -> None:
+        """Remove every item, keeping the same stack object."""
+        self._items.clear()
+
     def size(self) -> int:
         """Return the number of items in the stack."""
         return len(self._items)
@@ -37,5 +87,103 @@ class Stack:
         """Return True if the stack is empty, False otherwise."""
         return not self._items
 
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items)
+
     def __repr__(self) -> str:
         return f"Stack({self._items})"
+
+
+class ArrayStack:
+    """A fixed-capacity stack in a preallocated typed array.
+
+    Same interface as Stack, but items live unboxed in an `array` of
+    `typecode` allocated once, and pushing past `capacity` raises
+    StackOverflowError. Values the type cannot hold raise TypeError or
+    OverflowError from the array.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, typecode=DEFAULT_TYPECODE) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._data = array(typecode, bytes(capacity * array(typecode).itemsize))
+        self._capacity = capacity
+        self._top = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def push(self, item: Any) -> None:
+        """Push an item onto the stack."""
+        top = self._top
+        if top == self._capacity:
+            raise StackOverflowError(f"Stack capacity of {top} exceeded.")
+        self._data[top] = item
+        self._top = top + 1
+
+    def peek(self) -> Any:
+        """Return the top item of the stack without removing it."""
+        if not self._top:
+            raise EmptyStackError("Cannot peek from an empty stack.")
+        return self._data[self._top - 1]
+
+    def pop(self) -> Any:
+        """Remove and return the top item of the stack."""
+        if not self._top:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        self._top -= 1
+        return self._data[self._top]
+
+    def pop2(self) -> tuple[Any, Any]:
+        """Remove the top two items and return them as (second, top)."""
+        top = self._top
+        if top < 2:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        self._top = top - 2
+        return self._data[top - 2], self._data[top - 1]
+
+    def popn(self, k: int) -> list[Any]:
+        """Remove the top k items and return them, bottom first."""
+        top = self._top
+        if k > top:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        if k <= 0:
+            return []
+        self._top = top - k
+        return self._data[top - k : top].tolist()
+
+    def binop(self, fn: Callable[[Any, Any], Any]) -> None:
+        """Replace the top two items a, b (b on top) with fn(a, b).
+
+        The stack is unchanged if fn raises.
+        """
+        top = self._top
+        if top < 2:
+            raise EmptyStackError("Cannot pop from an empty stack.")
+        data = self._data
+        data[top - 2] = fn(data[top - 2], data[top - 1])
+        self._top = top - 1
+
+    def extend(self, values: Iterable[Any]) -> None:
+        """Push every value in order."""
+        for value in values:
+            self.push(value)
+
+    def clear(self) -> None:
+        """Remove every item. The storage is kept for reuse."""
+        self._top = 0
+
+    def size(self) -> int:
+        """Return the number of items in the stack."""
+        return self._top
+
+    def is_empty(self) -> bool:
+        """Return True if the stack is empty, False otherwise."""
+        return not self._top
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data[: self._top].tolist())
+
+    def __repr__(self) -> str:
+        return f"ArrayStack({self._data[: self._top].tolist()})"
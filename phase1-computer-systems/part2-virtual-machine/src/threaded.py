@@ -0,0 +1,262 @@
+from typing import Callable
+
+from bulk import memcpy, memset, vadd, vmul
+from opcodes import BINARY_OPERATIONS, OPERAND_COUNTS, Opcode
+from program_cache import program_cache
+from vm import VirtualMachine, VirtualMachineError
+
+DECODE_CACHE_SIZE = 256
+
+# A slot holds the handler for the instruction starting at that pc, its
+# operand (None, an int, or a tuple for multi-operand opcodes) and the pc of
+# the following instruction. Handlers take (vm, operand, next_pc) and return
+# the pc to continue from. Jump handlers count each jump they take in
+# vm._taken, keyed by next_pc; see counters.py.
+Operand = int | tuple[int, ...] | None
+Slot = tuple[Callable[[VirtualMachine, Operand, int], int] | None, Operand, int]
+
+
+def _load(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    if not (0 <= address < len(vm._memory)):
+        raise VirtualMachineError(f"Invalid memory address: {address}")
+    vm._stack.push(vm._memory[address])
+    return next_pc
+
+
+def _store(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    value = vm._stack.pop()
+    if not (0 <= address < len(vm._memory)):
+        raise VirtualMachineError(f"Invalid memory address: {address}")
+    vm._memory[address] = value
+    return next_pc
+
+
+def _push(vm: VirtualMachine, value: int, next_pc: int) -> int:
+    vm._stack.push(value)
+    return next_pc
+
+
+def _pop(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    vm._stack.pop()
+    return next_pc
+
+
+def _dup(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    vm._stack.push(vm._stack.peek())
+    return next_pc
+
+
+def _swap(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    second, first = vm._stack.pop2()
+    vm._stack.extend((first, second))
+    return next_pc
+
+
+def _print(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    vm._write(vm._stack.pop())
+    return next_pc
+
+
+def _input(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    vm._stack.push(vm._read())
+    return next_pc
+
+
+def _eof(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    vm._stack.push(1 if vm._at_end() else 0)
+    return next_pc
+
+
+def _jmp(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    vm._taken[next_pc] += 1
+    return address
+
+
+def _jz(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    if vm._stack.pop() == 0:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _jnz(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    if vm._stack.pop() != 0:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _read(vm: VirtualMachine, address: int) -> int:
+    if not (0 <= address < len(vm._memory)):
+        raise VirtualMachineError(f"Invalid memory address: {address}")
+    return vm._memory[address]
+
+
+def _load_load_mul(vm: VirtualMachine, addresses: tuple, next_pc: int) -> int:
+    vm._stack.push(_read(vm, addresses[0]) * _read(vm, addresses[1]))
+    return next_pc
+
+
+def _load_load_add(vm: VirtualMachine, addresses: tuple, next_pc: int) -> int:
+    vm._stack.push(_read(vm, addresses[0]) + _read(vm, addresses[1]))
+    return next_pc
+
+
+def _load_add(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    right = _read(vm, address)
+    vm._stack.push(vm._stack.pop() + right)
+    return next_pc
+
+
+def _push_add(vm: VirtualMachine, value: int, next_pc: int) -> int:
+    vm._stack.push(vm._stack.pop() + value)
+    return next_pc
+
+
+def _push_sub(vm: VirtualMachine, value: int, next_pc: int) -> int:
+    vm._stack.push(vm._stack.pop() - value)
+    return next_pc
+
+
+def _dup_store(vm: VirtualMachine, address: int, next_pc: int) -> int:
+    value = vm._stack.peek()
+    if not (0 <= address < len(vm._memory)):
+        raise VirtualMachineError(f"Invalid memory address: {address}")
+    vm._memory[address] = value
+    return next_pc
+
+
+def _push_ge_jnz(vm: VirtualMachine, operands: tuple, next_pc: int) -> int:
+    value, address = operands
+    if vm._stack.pop() >= value:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _memcpy(vm: VirtualMachine, operands: tuple, next_pc: int) -> int:
+    dst, src, count = operands
+    vm._check_range(dst, count)
+    vm._check_range(src, count)
+    memcpy(vm._memory, dst, src, count)
+    return next_pc
+
+
+def _memset(vm: VirtualMachine, operands: tuple, next_pc: int) -> int:
+    dst, count = operands
+    value = vm._stack.pop()
+    vm._check_range(dst, count)
+    memset(vm._memory, dst, count, value)
+    return next_pc
+
+
+def _reduce(operation: Callable) -> Callable:
+    """Build a handler that pushes operation(memory range), e.g. sum."""
+
+    def handler(vm: VirtualMachine, operands: tuple, next_pc: int) -> int:
+        start, count = operands
+        vm._check_range(start, count)
+        vm._stack.push(operation(vm._memory[start : start + count]))
+        return next_pc
+
+    return handler
+
+
+def _vector(operation: Callable) -> Callable:
+    """Build a handler for an elementwise operation such as bulk.vadd."""
+
+    def handler(vm: VirtualMachine, operands: tuple, next_pc: int) -> int:
+        dst, left, right, count = operands
+        for start in (dst, left, right):
+            vm._check_range(start, count)
+        operation(vm._memory, dst, left, right, count)
+        return next_pc
+
+    return handler
+
+
+def _binary(operation: Callable[[int, int], int]) -> Callable:
+    """Build a handler that pops two values and pushes operation(left, right)."""
+
+    def handler(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+        vm._stack.binop(operation)
+        return next_pc
+
+    return handler
+
+
+def _invalid(vm: VirtualMachine, operation: int, next_pc: int) -> int:
+    raise VirtualMachineError(f"Invalid opcode at pc {next_pc - 1}: {operation}")
+
+
+def _missing_operand(vm: VirtualMachine, operand: None, next_pc: int) -> int:
+    # The decoding loops read past the end of the bytecode here.
+    raise IndexError("list index out of range")
+
+
+HANDLERS = {
+    Opcode.HALT: None,
+    Opcode.LOAD: _load,
+    Opcode.STORE: _store,
+    Opcode.PUSH: _push,
+    Opcode.POP: _pop,
+    Opcode.DUP: _dup,
+    Opcode.SWAP: _swap,
+    **{opcode: _binary(operation) for opcode, operation in BINARY_OPERATIONS.items()},
+    Opcode.JMP: _jmp,
+    Opcode.JZ: _jz,
+    Opcode.JNZ: _jnz,
+    Opcode.PRINT: _print,
+    Opcode.LOAD_LOAD_MUL: _load_load_mul,
+    Opcode.LOAD_LOAD_ADD: _load_load_add,
+    Opcode.LOAD_ADD: _load_add,
+    Opcode.PUSH_ADD: _push_add,
+    Opcode.PUSH_SUB: _push_sub,
+    Opcode.DUP_STORE: _dup_store,
+    Opcode.PUSH_GE_JNZ: _push_ge_jnz,
+    Opcode.MEMCPY: _memcpy,
+    Opcode.MEMSET: _memset,
+    Opcode.SUM: _reduce(sum),
+    Opcode.MIN: _reduce(min),
+    Opcode.MAX: _reduce(max),
+    Opcode.VADD: _vector(vadd),
+    Opcode.VMUL: _vector(vmul),
+    Opcode.INPUT: _input,
+    Opcode.EOF: _eof,
+}
+
+
+def decode(bytecode: list[int]) -> tuple[Slot, ...]:
+    """Translate bytecode into one pre-decoded slot per pc.
+
+    Results are cached by the program and its content (see program_cache),
+    so running the same program many times only decodes it once per process
+    and never copies it again.
+    """
+    return _decode(bytecode)
+
+
+@program_cache(maxsize=DECODE_CACHE_SIZE)
+def _decode(code: tuple[int, ...]) -> tuple[Slot, ...]:
+    # Every pc gets a slot, not just instruction starts, so a jump into the
+    # middle of an instruction behaves exactly as it does in the run loop.
+    program = []
+    for pc, operation in enumerate(code):
+        try:
+            opcode = Opcode(operation)
+        except ValueError:
+            program.append((_invalid, operation, pc + 1))
+            continue
+
+        handler = HANDLERS[opcode]
+        count = OPERAND_COUNTS.get(opcode, 0)
+        next_pc = pc + 1 + count
+        if next_pc > len(code):
+            program.append((_missing_operand, None, pc + 1))
+        elif count == 0:
+            program.append((handler, None, next_pc))
+        elif count == 1:
+            program.append((handler, code[pc + 1], next_pc))
+        else:
+            program.append((handler, code[pc + 1 : next_pc], next_pc))
+    return tuple(program)
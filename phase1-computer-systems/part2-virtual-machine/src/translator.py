@@ -0,0 +1,272 @@
+from pathlib import Path
+from typing import Callable
+
+from disassembler import decode_instructions, jump_targets
+from opcodes import JUMP_OPERANDS, Opcode
+from program_cache import program_cache
+from verifier import VerificationError, verify
+from vm import VirtualMachine
+
+BINARY_OPERATORS = {
+    Opcode.ADD: "{} + {}",
+    Opcode.SUB: "{} - {}",
+    Opcode.MUL: "{} * {}",
+    Opcode.DIV: "{} // {}",
+    Opcode.EQ: "1 if {} == {} else 0",
+    Opcode.NEQ: "1 if {} != {} else 0",
+    Opcode.LT: "1 if {} < {} else 0",
+    Opcode.GT: "1 if {} > {} else 0",
+    Opcode.LE: "1 if {} <= {} else 0",
+    Opcode.GE: "1 if {} >= {} else 0",
+}
+
+CONDITIONAL_JUMPS = {
+    Opcode.JZ: "{} == 0",
+    Opcode.JNZ: "{} != 0",
+}
+
+REDUCTIONS = {
+    Opcode.SUM: "sum",
+    Opcode.MIN: "min",
+    Opcode.MAX: "max",
+}
+
+# Bulk opcodes that translate to a call of the bulk.py function of this name.
+BULK_FUNCTIONS = {
+    Opcode.MEMCPY: "memcpy",
+    Opcode.MEMSET: "memset",
+    Opcode.VADD: "vadd",
+    Opcode.VMUL: "vmul",
+}
+
+# A compiled program takes the memory list, a function PRINT calls (print by
+# default) and the input source INPUT and EOF use, updates memory in place
+# and returns the pc of the HALT it stopped on and the values left on the
+# stack.
+CompiledProgram = Callable[..., tuple[int, list[int]]]
+
+
+class TranslationError(Exception):
+    """Raised when bytecode cannot be translated to a Python function."""
+
+    pass
+
+
+def stack_depths(bytecode: list[int], memory_size=256) -> dict[int, int]:
+    """Return the stack depth before each reachable instruction.
+
+    Raises TranslationError unless the bytecode passes `verifier.verify`.
+    """
+    try:
+        return verify(bytecode, memory_size)
+    except VerificationError as error:
+        raise TranslationError(str(error)) from error
+
+
+class BlockWriter:
+    """Emits the Python statements for one basic block.
+
+    Stack slot i lives in the local s{i}. Constants and copies of lower slots
+    are kept symbolic until something needs them, so `PUSH 1, SUB` becomes
+    `s0 = s0 - 1` rather than two statements.
+    """
+
+    def __init__(self, depth: int) -> None:
+        self.lines = []
+        self.stack = [f"s{i}" for i in range(depth)]
+
+    def emit(self, line: str) -> None:
+        self.lines.append(line)
+
+    def assign(self, expression: str) -> None:
+        """Compute expression into the next free slot."""
+        slot = f"s{len(self.stack)}"
+        self.emit(f"{slot} = {expression}")
+        self.stack.append(slot)
+
+    def flush(self) -> None:
+        """Store every symbolic slot in its local before leaving the block."""
+        for i, entry in enumerate(self.stack):
+            if entry != f"s{i}":
+                self.emit(f"s{i} = {entry}")
+                self.stack[i] = f"s{i}"
+
+    def goto(self, target: int) -> None:
+        self.emit(f"block = {target}")
+        self.emit("continue")
+
+    def instruction(self, pc: int, opcode: Opcode, operands: list[int]) -> None:
+        stack = self.stack
+        next_pc = pc + 1 + len(operands)
+        if opcode in BINARY_OPERATORS:
+            right = stack.pop()
+            left = stack.pop()
+            self.assign(BINARY_OPERATORS[opcode].format(left, right))
+        elif opcode == Opcode.PUSH:
+            stack.append(repr(operands[0]))
+        elif opcode == Opcode.LOAD:
+            self.assign(f"memory[{operands[0]}]")
+        elif opcode == Opcode.STORE:
+            self.emit(f"memory[{operands[0]}] = {stack.pop()}")
+        elif opcode == Opcode.POP:
+            stack.pop()
+        elif opcode == Opcode.DUP:
+            stack.append(stack[-1])
+        elif opcode == Opcode.SWAP:
+            first = stack.pop()
+            second = stack.pop()
+            depth = len(stack)
+            self.emit(f"s{depth}, s{depth + 1} = {first}, {second}")
+            stack.extend([f"s{depth}", f"s{depth + 1}"])
+        elif opcode == Opcode.PRINT:
+            self.emit(f"write({stack.pop()})")
+        elif opcode == Opcode.LOAD_LOAD_MUL:
+            self.assign(f"memory[{operands[0]}] * memory[{operands[1]}]")
+        elif opcode == Opcode.LOAD_LOAD_ADD:
+            self.assign(f"memory[{operands[0]}] + memory[{operands[1]}]")
+        elif opcode == Opcode.LOAD_ADD:
+            self.assign(f"{stack.pop()} + memory[{operands[0]}]")
+        elif opcode == Opcode.PUSH_ADD:
+            self.assign(f"{stack.pop()} + {operands[0]!r}")
+        elif opcode == Opcode.PUSH_SUB:
+            self.assign(f"{stack.pop()} - {operands[0]!r}")
+        elif opcode == Opcode.DUP_STORE:
+            self.emit(f"memory[{operands[0]}] = {stack[-1]}")
+        elif opcode in REDUCTIONS:
+            start, count = operands
+            self.assign(f"{REDUCTIONS[opcode]}(memory[{start}:{start + count}])")
+        elif opcode == Opcode.MEMSET:
+            self.emit(f"memset(memory, {operands[0]}, {operands[1]}, {stack.pop()})")
+        elif opcode in BULK_FUNCTIONS:
+            arguments = ", ".join(str(operand) for operand in operands)
+            self.emit(f"{BULK_FUNCTIONS[opcode]}(memory, {arguments})")
+        elif opcode == Opcode.INPUT:
+            self.assign("source.read()")
+        elif opcode == Opcode.EOF:
+            self.assign("1 if source.at_end() else 0")
+        elif opcode == Opcode.HALT:
+            self.flush()
+            self.emit(f"return {pc}, [{', '.join(stack)}]")
+        elif opcode == Opcode.JMP:
+            self.flush()
+            self.goto(operands[0])
+        elif opcode in CONDITIONAL_JUMPS or opcode == Opcode.PUSH_GE_JNZ:
+            value = stack.pop()
+            if opcode == Opcode.PUSH_GE_JNZ:
+                condition = f"{value} >= {operands[0]!r}"
+            else:
+                condition = CONDITIONAL_JUMPS[opcode].format(value)
+            self.flush()
+            self.emit(f"if {condition}:")
+            self.emit(f"    block = {operands[JUMP_OPERANDS[opcode]]}")
+            self.emit("    continue")
+            self.goto(next_pc)
+        else:
+            raise TranslationError(f"Unsupported opcode at pc {pc}: {opcode.name}")
+
+
+def translate(bytecode: list[int], memory_size=256, name="program") -> str:
+    """Translate bytecode into the source of an equivalent Python function.
+
+    Basic blocks start at pc 0, at every jump target and after every
+    conditional jump. Each block becomes one arm of a `while True` loop
+    keyed on the local `block`.
+    """
+    depths = stack_depths(bytecode, memory_size)
+    instructions = [
+        (pc, opcode, operands)
+        for pc, opcode, operands in decode_instructions(bytecode)
+        if pc in depths
+    ]
+    leaders = {0} | (jump_targets(instructions) & depths.keys())
+    for pc, opcode, operands in instructions:
+        if opcode in JUMP_OPERANDS and opcode != Opcode.JMP:
+            leaders.add(pc + 1 + len(operands))
+
+    lines = bulk_imports(opcode for _, opcode, _ in instructions) + [
+        f"def {name}(memory, write=print, source=None):",
+        "    block = 0",
+        "    while True:",
+    ]
+    writer = None
+    for pc, opcode, operands in instructions:
+        if pc in leaders:
+            if writer is not None:
+                writer.flush()
+                writer.goto(pc)
+                _append_block(lines, start, writer)
+            start = pc
+            writer = BlockWriter(depths[pc])
+        elif writer is None:
+            continue
+        writer.instruction(pc, opcode, operands)
+        if opcode == Opcode.HALT or opcode in JUMP_OPERANDS:
+            _append_block(lines, start, writer)
+            writer = None
+    return "\n".join(lines) + "\n"
+
+
+def bulk_imports(opcodes) -> list[str]:
+    """Return the import lines for the bulk.py functions opcodes translate to."""
+    names = sorted({BULK_FUNCTIONS[op] for op in opcodes if op in BULK_FUNCTIONS})
+    if not names:
+        return []
+    return [f"from bulk import {', '.join(names)}", "", ""]
+
+
+def _append_block(lines: list[str], start: int, writer: BlockWriter) -> None:
+    # Every block ends in continue or return, so plain ifs are enough.
+    lines.append(f"        if block == {start}:")
+    lines.extend(f"            {line}" for line in writer.lines)
+
+
+def compile_program(bytecode: list[int], memory_size=256) -> CompiledProgram:
+    """Translate bytecode and compile it into a callable Python function.
+
+    Cached by program and memory size; see program_cache.
+    """
+    return _compile(bytecode, memory_size)
+
+
+@program_cache(maxsize=128)
+def _compile(code: tuple[int, ...], memory_size: int) -> CompiledProgram:
+    source = translate(list(code), memory_size)
+    namespace = {}
+    exec(compile(source, "<translated bytecode>", "exec"), namespace)
+    return namespace["program"]
+
+
+def write_module(bytecode: list[int], path: str | Path, memory_size=256) -> None:
+    """Write the translated program to a Python module on disk.
+
+    The module defines `program(memory, write=print, source=None)`, which
+    returns the pc of the HALT reached and the values left on the stack.
+    """
+    source = translate(bytecode, memory_size)
+    header = f'"""Translated from VM bytecode (memory_size={memory_size})."""\n\n\n'
+    Path(path).write_text(header + source)
+
+
+def run(vm: VirtualMachine, bytecode: list[int]) -> bool:
+    """Run bytecode on the VM through its translation when possible.
+
+    Falls back to `vm.run` when the program cannot be translated or the VM
+    is not in a fresh state. Returns True if the translated code ran.
+    """
+    if vm._pc != 0 or not vm._stack.is_empty():
+        vm.run(bytecode)
+        return False
+    try:
+        program = compile_program(bytecode, len(vm._memory))
+    except TranslationError:
+        vm.run(bytecode)
+        return False
+
+    try:
+        vm._pc, stack = program(vm._memory, vm._write, vm.input)
+    finally:
+        if vm.output is not None:
+            vm.output.flush()
+    for value in stack:
+        vm._stack.push(value)
+    return True
@@ -0,0 +1,276 @@
+from typing import Callable
+
+from bulk import memcpy, memset, vadd, vmul
+from opcodes import BINARY_OPERATIONS, OPERAND_COUNTS, Opcode
+from program_cache import program_cache
+from verifier import VerificationError, verify
+from vm import VirtualMachine
+
+DECODE_CACHE_SIZE = 256
+
+# Handlers for programs that passed `verifier.verify`. They work directly on
+# the stack's item list and the memory list and take
+# (vm, items, memory, operand, next_pc), returning the pc to continue from.
+# Verification rules out stack underflow, bad addresses and bad jumps, so
+# none of them check; only runtime errors such as division by zero remain.
+# Jump handlers count taken jumps in vm._taken as in threaded.py.
+Operand = int | tuple[int, ...] | None
+Handler = Callable[[VirtualMachine, list[int], list[int], Operand, int], int]
+Slot = tuple[Handler | None, Operand, int]
+
+
+def _load(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    items.append(memory[address])
+    return next_pc
+
+
+def _store(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    memory[address] = items.pop()
+    return next_pc
+
+
+def _push(
+    vm: VirtualMachine, items: list, memory: list, value: int, next_pc: int
+) -> int:
+    items.append(value)
+    return next_pc
+
+
+def _pop(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    items.pop()
+    return next_pc
+
+
+def _dup(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    items.append(items[-1])
+    return next_pc
+
+
+def _swap(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    items[-1], items[-2] = items[-2], items[-1]
+    return next_pc
+
+
+def _print(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    vm._write(items.pop())
+    return next_pc
+
+
+def _input(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    items.append(vm._read())
+    return next_pc
+
+
+def _eof(
+    vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+) -> int:
+    items.append(1 if vm._at_end() else 0)
+    return next_pc
+
+
+def _jmp(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    vm._taken[next_pc] += 1
+    return address
+
+
+def _jz(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    if items.pop() == 0:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _jnz(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    if items.pop() != 0:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _load_load_mul(
+    vm: VirtualMachine, items: list, memory: list, addresses: tuple, next_pc: int
+) -> int:
+    items.append(memory[addresses[0]] * memory[addresses[1]])
+    return next_pc
+
+
+def _load_load_add(
+    vm: VirtualMachine, items: list, memory: list, addresses: tuple, next_pc: int
+) -> int:
+    items.append(memory[addresses[0]] + memory[addresses[1]])
+    return next_pc
+
+
+def _load_add(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    items[-1] = items[-1] + memory[address]
+    return next_pc
+
+
+def _push_add(
+    vm: VirtualMachine, items: list, memory: list, value: int, next_pc: int
+) -> int:
+    items[-1] = items[-1] + value
+    return next_pc
+
+
+def _push_sub(
+    vm: VirtualMachine, items: list, memory: list, value: int, next_pc: int
+) -> int:
+    items[-1] = items[-1] - value
+    return next_pc
+
+
+def _dup_store(
+    vm: VirtualMachine, items: list, memory: list, address: int, next_pc: int
+) -> int:
+    memory[address] = items[-1]
+    return next_pc
+
+
+def _push_ge_jnz(
+    vm: VirtualMachine, items: list, memory: list, operands: tuple, next_pc: int
+) -> int:
+    value, address = operands
+    if items.pop() >= value:
+        vm._taken[next_pc] += 1
+        return address
+    return next_pc
+
+
+def _memcpy(
+    vm: VirtualMachine, items: list, memory: list, operands: tuple, next_pc: int
+) -> int:
+    memcpy(memory, *operands)
+    return next_pc
+
+
+def _memset(
+    vm: VirtualMachine, items: list, memory: list, operands: tuple, next_pc: int
+) -> int:
+    memset(memory, *operands, items.pop())
+    return next_pc
+
+
+def _reduce(operation: Callable) -> Handler:
+    """Build a handler that pushes operation(memory range), e.g. sum."""
+
+    def handler(
+        vm: VirtualMachine, items: list, memory: list, operands: tuple, next_pc: int
+    ) -> int:
+        start, count = operands
+        items.append(operation(memory[start : start + count]))
+        return next_pc
+
+    return handler
+
+
+def _vector(operation: Callable) -> Handler:
+    """Build a handler for an elementwise operation such as bulk.vadd."""
+
+    def handler(
+        vm: VirtualMachine, items: list, memory: list, operands: tuple, next_pc: int
+    ) -> int:
+        operation(memory, *operands)
+        return next_pc
+
+    return handler
+
+
+def _binary(operation: Callable[[int, int], int]) -> Handler:
+    """Build a handler that replaces the top two values with operation(a, b)."""
+
+    def handler(
+        vm: VirtualMachine, items: list, memory: list, operand: None, next_pc: int
+    ) -> int:
+        right = items.pop()
+        items[-1] = operation(items[-1], right)
+        return next_pc
+
+    return handler
+
+
+HANDLERS = {
+    Opcode.HALT: None,
+    Opcode.LOAD: _load,
+    Opcode.STORE: _store,
+    Opcode.PUSH: _push,
+    Opcode.POP: _pop,
+    Opcode.DUP: _dup,
+    Opcode.SWAP: _swap,
+    **{opcode: _binary(operation) for opcode, operation in BINARY_OPERATIONS.items()},
+    Opcode.JMP: _jmp,
+    Opcode.JZ: _jz,
+    Opcode.JNZ: _jnz,
+    Opcode.PRINT: _print,
+    Opcode.LOAD_LOAD_MUL: _load_load_mul,
+    Opcode.LOAD_LOAD_ADD: _load_load_add,
+    Opcode.LOAD_ADD: _load_add,
+    Opcode.PUSH_ADD: _push_add,
+    Opcode.PUSH_SUB: _push_sub,
+    Opcode.DUP_STORE: _dup_store,
+    Opcode.PUSH_GE_JNZ: _push_ge_jnz,
+    Opcode.MEMCPY: _memcpy,
+    Opcode.MEMSET: _memset,
+    Opcode.SUM: _reduce(sum),
+    Opcode.MIN: _reduce(min),
+    Opcode.MAX: _reduce(max),
+    Opcode.VADD: _vector(vadd),
+    Opcode.VMUL: _vector(vmul),
+    Opcode.INPUT: _input,
+    Opcode.EOF: _eof,
+}
+
+
+def decode(bytecode: list[int], memory_size=256) -> tuple[Slot, ...] | None:
+    """Verify bytecode and translate it into unchecked slots.
+
+    Returns None if verification fails. Results are cached by program and
+    memory size (see program_cache), so each program is verified once per
+    process.
+    """
+    return _decode(bytecode, memory_size)
+
+
+@program_cache(maxsize=DECODE_CACHE_SIZE)
+def _decode(code: tuple[int, ...], memory_size: int) -> tuple[Slot, ...] | None:
+    try:
+        depths = verify(code, memory_size)
+    except VerificationError:
+        return None
+    # Only reachable instructions get real slots; verification guarantees
+    # execution never lands anywhere else.
+    program = [(None, None, pc) for pc in range(len(code))]
+    for pc in depths:
+        opcode = Opcode(code[pc])
+        count = OPERAND_COUNTS.get(opcode, 0)
+        next_pc = pc + 1 + count
+        if count == 0:
+            operand = None
+        elif count == 1:
+            operand = code[pc + 1]
+        else:
+            operand = code[pc + 1 : next_pc]
+        program[pc] = (HANDLERS[opcode], operand, next_pc)
+    return tuple(program)
@@ -0,0 +1,80 @@
+from disassembler import decode_instructions, jump_targets
+from opcodes import (
+    JUMP_OPERANDS,
+    MEMORY_OPERANDS,
+    MEMORY_RANGES,
+    STACK_EFFECTS,
+    Opcode,
+)
+
+
+class VerificationError(Exception):
+    """Raised when bytecode fails static verification."""
+
+    pass
+
+
+def verify(bytecode: list[int], memory_size=256) -> dict[int, int]:
+    """Prove bytecode safe to run without runtime checks.
+
+    Checks that every opcode is known and has its operands, that every jump
+    target is the start of an instruction, and that along every reachable
+    path the stack depth never goes negative, agrees where paths meet, and
+    constant memory addresses are below memory_size. Bulk memory ranges
+    must be non-empty and fit in memory. Execution must end on
+    HALT rather than run off the end.
+
+    Returns the stack depth before each reachable instruction, or raises
+    VerificationError describing the first problem found.
+    """
+    instructions = decode_instructions(bytecode)
+    if instructions is None:
+        raise VerificationError("Bytecode has an unknown opcode or missing operand.")
+    by_pc = {pc: (opcode, operands) for pc, opcode, operands in instructions}
+    for target in sorted(jump_targets(instructions)):
+        if target not in by_pc:
+            raise VerificationError(f"Jump target {target} is not an instruction.")
+
+    depths = {0: 0}
+    pending = [0]
+    while pending:
+        pc = pending.pop()
+        if pc not in by_pc:
+            raise VerificationError(f"Execution reaches pc {pc}, not an instruction.")
+        opcode, operands = by_pc[pc]
+        if opcode not in STACK_EFFECTS:
+            raise VerificationError(f"Unsupported opcode at pc {pc}: {opcode.name}")
+        pops, pushes = STACK_EFFECTS[opcode]
+        if depths[pc] < pops:
+            raise VerificationError(f"Stack underflow at pc {pc}: {opcode.name}")
+        for index in MEMORY_OPERANDS.get(opcode, ()):
+            if not (0 <= operands[index] < memory_size):
+                raise VerificationError(f"Invalid memory address at pc {pc}")
+        for start, count in MEMORY_RANGES.get(opcode, ()):
+            start, count = operands[start], operands[count]
+            if not (count >= 1 and 0 <= start and start + count <= memory_size):
+                raise VerificationError(f"Invalid memory range at pc {pc}")
+
+        after = depths[pc] - pops + pushes
+        for successor in successors(pc, opcode, operands):
+            if successor not in depths:
+                depths[successor] = after
+                pending.append(successor)
+            elif depths[successor] != after:
+                raise VerificationError(
+                    f"Inconsistent stack depth at pc {successor}: "
+                    f"{depths[successor]} vs {after}"
+                )
+    return depths
+
+
+def successors(pc: int, opcode: Opcode, operands: list[int]) -> list[int]:
+    """Return the pcs that can run after the instruction at pc."""
+    next_pc = pc + 1 + len(operands)
+    if opcode == Opcode.HALT:
+        return []
+    if opcode == Opcode.JMP:
+        return [operands[0]]
+    if opcode in JUMP_OPERANDS:
+        return [next_pc, operands[JUMP_OPERANDS[opcode]]]
+    return [next_pc]
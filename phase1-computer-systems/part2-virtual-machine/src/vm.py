@@ -1,5 +1,22 @@
-from opcodes import Opcode
-from stack import Stack
+import operator
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from bulk import memcpy, memset, vadd, vmul
+from counters import Counters, VMStats
+from opcodes import (
+    OPERAND_COUNTS,
+    Opcode,
+    equal,
+    greater,
+    greater_equal,
+    less,
+    less_equal,
+    not_equal,
+)
+from sources import as_source
+from stack import ArrayStack, Stack
 
 
 class VirtualMachineError(Exception):
@@ -8,14 +25,321 @@ class VirtualMachineError(Exception):
     pass
 
 
+ENGINES = ("match", "table", "threaded", "jit")
+
+
+@dataclass
+class RunState:
+    """Where a budgeted run stopped.
+
+    `steps` is the number of instructions executed by that run. Unless
+    `halted`, the VM is paused at `vm._pc` and `resume` continues it.
+    """
+
+    vm: "VirtualMachine"
+    bytecode: list[int]
+    halted: bool
+    steps: int
+
+    def resume(self, budget: int) -> "RunState":
+        """Run up to `budget` more instructions."""
+        return self.vm.run(self.bytecode, budget)
+
+
 class VirtualMachine:
-    def __init__(self, memory_size=256) -> None:
-        self._stack = Stack()
-        self._memory = [0] * memory_size
+    def __init__(
+        self,
+        memory_size=256,
+        engine="match",
+        jit_threshold=50,
+        profile=False,
+        verify=False,
+        output=None,
+        memory=None,
+        input=None,
+        stack_capacity=None,
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        if jit_threshold < 1:
+            raise ValueError("jit_threshold must be at least 1")
+        if engine == "jit" and stack_capacity is not None:
+            raise ValueError("The jit engine needs the list-backed stack.")
+        # With a capacity, the stack is a preallocated int64 ArrayStack that
+        # raises StackOverflowError when full and OverflowError for values
+        # outside int64.
+        if stack_capacity is None:
+            self._stack = Stack()
+        else:
+            self._stack = ArrayStack(stack_capacity)
+        # Any store with len(), indexing and item assignment can replace the
+        # default list; see memory.py. memory_size is then ignored. Only
+        # memory the VM made itself may be swapped for copy-on-write pages
+        # by snapshots; a store passed in stays the one the VM writes to.
+        self._memory = [0] * memory_size if memory is None else memory
+        self._owns_memory = memory is None
+        self._pc = 0
+        self._engine = engine
+        self._jit_threshold = jit_threshold
+        self._dispatch_table = self._build_dispatch_table()
+        self._verify = verify
+        # PRINT calls _write; print() unless an output sink is given.
+        self.output = output
+        self._write = print if output is None else output.write
+        # INPUT and EOF read from an InputSource; iterables are wrapped.
+        self.input = as_source(input)
+        self._read = self.input.read
+        self._at_end = self.input.at_end
+        # Always on. Jump handlers count the jumps they take in _taken,
+        # which run() points at the counts for the program being run.
+        self.counters = Counters()
+        self._scratch_taken = defaultdict(int)
+        self._taken = self._scratch_taken
+        self.profiler = None
+        if profile:
+            from profiler import Profiler
+
+            self.profiler = Profiler()
+
+    def run(self, bytecode: list[int], budget: int | None = None) -> RunState | None:
+        """Run the provided bytecode.
+
+        With profiling on, every engine runs on a profiled dispatch table.
+        With verify on, a program that passes static verification from a
+        fresh state runs on the unchecked fast path. Otherwise the chosen
+        engine runs unchanged. The output sink, if any, is flushed when the
+        run stops, and the counters behind `stats()` are updated.
+
+        With a budget, at most that many instructions run, on the dispatch
+        table whatever the engine, and the returned RunState says whether
+        the program halted. Runs always continue from the current pc.
+        """
+        if budget is not None and budget < 1:
+            raise ValueError("budget must be at least 1")
+        self._taken = self.counters.begin(bytecode)
+        entry = (self._pc, self._stack.size())
+        start = time.perf_counter_ns()
+        stopped = None
+        try:
+            if budget is not None:
+                state = self._execute_budget(bytecode, budget)
+                stopped = self._pc
+                return state
+            self._execute(bytecode)
+            stopped = self._pc
+        finally:
+            if self.output is not None:
+                self.output.flush()
+            if stopped is None:
+                stopped = self._instruction_at(bytecode, self._pc)
+            elapsed = time.perf_counter_ns() - start
+            self.counters.end(entry, (stopped, self._stack.size()), elapsed)
+            # Engines run outside run() count into a scratch dict instead.
+            self._taken = self._scratch_taken
+
+    def stats(self) -> VMStats:
+        """Return the counters totalled over every run; see counters.py."""
+        return self.counters.stats()
+
+    def reset(self) -> None:
+        """Clear pc, stack and memory in place, ready for another program.
+
+        The stack and memory objects are kept, so a reset VM has the same
+        memory backend and size. Input, output and settings are unchanged.
+        """
         self._pc = 0
+        self._stack.clear()
+        memory = self._memory
+        if hasattr(memory, "zero"):
+            memory.zero()
+        else:
+            memset(memory, 0, len(memory), 0)
+
+    def snapshot(self) -> "Snapshot":
+        """Capture pc, stack and memory; see `snapshot.take`."""
+        from snapshot import take
+
+        return take(self)
+
+    def restore(self, snapshot: "Snapshot") -> None:
+        """Return to a captured state; see `snapshot.restore`."""
+        from snapshot import restore
+
+        restore(self, snapshot)
+
+    def fork(self, **options) -> "VirtualMachine":
+        """Return a child VM in this VM's current state; see `snapshot.fork`."""
+        from snapshot import fork
+
+        return fork(self, **options)
+
+    def _execute_budget(self, bytecode: list[int], budget: int) -> RunState:
+        if self.profiler is not None:
+            return self.profiler.run(self, bytecode, budget)
+        return self._run_budget(bytecode, budget)
+
+    def _execute(self, bytecode: list[int]) -> None:
+        if self.profiler is not None:
+            self.profiler.run(self, bytecode)
+            return
+        if self._verify and self._run_verified(bytecode):
+            return
 
-    def run(self, bytecode: list[int]) -> None:
-        """Run the provided bytecode."""
+        if self._engine == "table":
+            self._run_table(bytecode)
+        elif self._engine == "threaded":
+            self._run_threaded(bytecode)
+        elif self._engine == "jit":
+            from jit import TracingJIT
+
+            TracingJIT(self, self._jit_threshold).run(bytecode)
+        else:
+            self._run_match(bytecode)
+
+    def _build_dispatch_table(self) -> list:
+        """Build a list of bound handlers indexed by opcode value.
+
+        HALT maps to None so the run loop can stop without calling anything.
+        """
+        handlers = {
+            Opcode.HALT: None,
+            Opcode.LOAD: self._load,
+            Opcode.STORE: self._store,
+            Opcode.PUSH: self._push,
+            Opcode.POP: self._pop,
+            Opcode.DUP: self._dup,
+            Opcode.SWAP: self._swap,
+            Opcode.ADD: self._add,
+            Opcode.SUB: self._sub,
+            Opcode.MUL: self._mul,
+            Opcode.DIV: self._div,
+            Opcode.EQ: self._eq,
+            Opcode.NEQ: self._neq,
+            Opcode.LT: self._lt,
+            Opcode.GT: self._gt,
+            Opcode.LE: self._le,
+            Opcode.GE: self._ge,
+            Opcode.JMP: self._jmp,
+            Opcode.JZ: self._jz,
+            Opcode.JNZ: self._jnz,
+            Opcode.PRINT: self._print,
+            Opcode.LOAD_LOAD_MUL: self._load_load_mul,
+            Opcode.LOAD_LOAD_ADD: self._load_load_add,
+            Opcode.LOAD_ADD: self._load_add,
+            Opcode.PUSH_ADD: self._push_add,
+            Opcode.PUSH_SUB: self._push_sub,
+            Opcode.DUP_STORE: self._dup_store,
+            Opcode.PUSH_GE_JNZ: self._push_ge_jnz,
+            Opcode.MEMCPY: self._memcpy,
+            Opcode.MEMSET: self._memset,
+            Opcode.SUM: self._sum,
+            Opcode.MIN: self._min,
+            Opcode.MAX: self._max,
+            Opcode.VADD: self._vadd,
+            Opcode.VMUL: self._vmul,
+            Opcode.INPUT: self._input,
+            Opcode.EOF: self._eof,
+        }
+        table = [None] * (max(opcode.value for opcode in handlers) + 1)
+        for opcode, handler in handlers.items():
+            table[opcode.value] = handler
+        return table
+
+    def _run_table(self, bytecode: list[int], table: list | None = None) -> None:
+        """Run bytecode by indexing the dispatch table with the raw opcode.
+
+        Avoids building an Opcode enum and walking the match arms per step.
+        A replacement table with the same layout can be passed in.
+        """
+        if table is None:
+            table = self._dispatch_table
+        size = len(table)
+        while True:
+            operation = bytecode[self._pc]
+            if not 0 <= operation < size:
+                raise VirtualMachineError(
+                    f"Invalid opcode at pc {self._pc}: {operation}"
+                )
+            handler = table[operation]
+            if handler is None:
+                break
+            handler(bytecode)
+
+    def _run_budget(
+        self, bytecode: list[int], budget: int, table: list | None = None
+    ) -> RunState:
+        """Run at most `budget` instructions from the dispatch table.
+
+        HALT is not counted as a step, but is only reached when the loop
+        dispatches it: a run that stops just before HALT halts on the next
+        run without executing anything.
+        """
+        if table is None:
+            table = self._dispatch_table
+        size = len(table)
+        for steps in range(budget):
+            operation = bytecode[self._pc]
+            if not 0 <= operation < size:
+                raise VirtualMachineError(
+                    f"Invalid opcode at pc {self._pc}: {operation}"
+                )
+            handler = table[operation]
+            if handler is None:
+                return RunState(self, bytecode, True, steps)
+            handler(bytecode)
+        return RunState(self, bytecode, False, budget)
+
+    def _run_threaded(self, bytecode: list[int]) -> None:
+        """Run bytecode from its cached pre-decoded form.
+
+        Each step only fetches a slot and calls its handler; operands were
+        read once when the program was decoded.
+        """
+        from threaded import decode
+
+        program = decode(bytecode)
+        pc = self._pc
+        try:
+            while True:
+                handler, operand, next_pc = program[pc]
+                if handler is None:
+                    break
+                pc = handler(self, operand, next_pc)
+        finally:
+            self._pc = pc
+
+    def _run_verified(self, bytecode: list[int]) -> bool:
+        """Run bytecode without runtime checks if it verifies.
+
+        Verification assumes execution starts at pc 0 with an empty stack,
+        so a VM in any other state, or with an ArrayStack, is left to the
+        checked engines. Returns True if the program ran.
+        """
+        from unchecked import decode
+
+        if self._pc != 0 or not isinstance(self._stack, Stack):
+            return False
+        if not self._stack.is_empty():
+            return False
+        program = decode(bytecode, len(self._memory))
+        if program is None:
+            return False
+
+        items = self._stack._items
+        memory = self._memory
+        pc = 0
+        try:
+            while True:
+                handler, operand, next_pc = program[pc]
+                if handler is None:
+                    break
+                pc = handler(self, items, memory, operand, next_pc)
+        finally:
+            self._pc = pc
+        return True
+
+    def _run_match(self, bytecode: list[int]) -> None:
+        """Run bytecode by decoding each opcode and matching on it."""
         while True:
             try:
                 opcode = Opcode(bytecode[self._pc])
@@ -30,27 +354,27 @@ class VirtualMachine:
                 case Opcode.PUSH:
                     self._push(bytecode)
                 case Opcode.PRINT:
-                    self._print()
+                    self._print(bytecode)
                 case Opcode.ADD:
-                    self._add()
+                    self._add(bytecode)
                 case Opcode.SUB:
-                    self._sub()
+                    self._sub(bytecode)
                 case Opcode.MUL:
-                    self._mul()
+                    self._mul(bytecode)
                 case Opcode.DIV:
-                    self._div()
+                    self._div(bytecode)
                 case Opcode.GT:
-                    self._gt()
+                    self._gt(bytecode)
                 case Opcode.LT:
-                    self._lt()
+                    self._lt(bytecode)
                 case Opcode.EQ:
-                    self._eq()
+                    self._eq(bytecode)
                 case Opcode.GE:
-                    self._ge()
+                    self._ge(bytecode)
                 case Opcode.LE:
-                    self._le()
+                    self._le(bytecode)
                 case Opcode.NEQ:
-                    self._neq()
+                    self._neq(bytecode)
                 case Opcode.JMP:
                     self._jmp(bytecode)
                 case Opcode.JZ:
@@ -58,18 +382,82 @@ class VirtualMachine:
                 case Opcode.JNZ:
                     self._jnz(bytecode)
                 case Opcode.DUP:
-                    self._dup()
+                    self._dup(bytecode)
                 case Opcode.SWAP:
-                    self._swap()
+                    self._swap(bytecode)
                 case Opcode.POP:
-                    self._pop()
+                    self._pop(bytecode)
                 case Opcode.STORE:
                     self._store(bytecode)
                 case Opcode.LOAD:
                     self._load(bytecode)
+                case Opcode.LOAD_LOAD_MUL:
+                    self._load_load_mul(bytecode)
+                case Opcode.LOAD_LOAD_ADD:
+                    self._load_load_add(bytecode)
+                case Opcode.LOAD_ADD:
+                    self._load_add(bytecode)
+                case Opcode.PUSH_ADD:
+                    self._push_add(bytecode)
+                case Opcode.PUSH_SUB:
+                    self._push_sub(bytecode)
+                case Opcode.DUP_STORE:
+                    self._dup_store(bytecode)
+                case Opcode.PUSH_GE_JNZ:
+                    self._push_ge_jnz(bytecode)
+                case Opcode.MEMCPY:
+                    self._memcpy(bytecode)
+                case Opcode.MEMSET:
+                    self._memset(bytecode)
+                case Opcode.SUM:
+                    self._sum(bytecode)
+                case Opcode.MIN:
+                    self._min(bytecode)
+                case Opcode.MAX:
+                    self._max(bytecode)
+                case Opcode.VADD:
+                    self._vadd(bytecode)
+                case Opcode.VMUL:
+                    self._vmul(bytecode)
+                case Opcode.INPUT:
+                    self._input(bytecode)
+                case Opcode.EOF:
+                    self._eof(bytecode)
                 case _:
                     raise NotImplementedError(f"Opcode not implemented: {opcode}")
 
+    def _instruction_at(self, bytecode: list[int], pc: int) -> int:
+        """Return the start of the instruction containing pc.
+
+        Handlers that raise may leave pc partway through their instruction;
+        this walks the instructions from pc 0 to find where it began.
+        """
+        start = 0
+        while start <= pc and start < len(bytecode):
+            try:
+                end = start + 1 + OPERAND_COUNTS.get(Opcode(bytecode[start]), 0)
+            except ValueError:
+                end = start + 1
+            if pc < end:
+                return start
+            start = end
+        return pc
+
+    def _read_memory(self, address: int) -> int:
+        """Return memory[address], checking the address is in range."""
+        if not (0 <= address < len(self._memory)):
+            raise VirtualMachineError(f"Invalid memory address: {address}")
+        return self._memory[address]
+
+    def _operands(self, bytecode: list[int], count: int) -> list[int]:
+        """Return the count operands of the instruction at pc."""
+        return [bytecode[self._pc + i] for i in range(1, count + 1)]
+
+    def _check_range(self, start: int, count: int) -> None:
+        """Check that count cells from start are all valid addresses."""
+        if not (count >= 1 and 0 <= start and start + count <= len(self._memory)):
+            raise VirtualMachineError(f"Invalid memory range: {count} cells at {start}")
+
     def _load(self, bytecode: list[int]) -> None:
         """Load a value from memory at specified location onto the stack."""
         self._pc += 1
@@ -90,129 +478,223 @@ class VirtualMachine:
         self._memory[address] = value
         self._pc += 1
 
-    def _pop(self) -> None:
+    def _pop(self, bytecode: list[int]) -> None:
         """Pop the top value from the stack."""
         self._stack.pop()
         self._pc += 1
 
-    def _swap(self) -> None:
+    def _swap(self, bytecode: list[int]) -> None:
         """Swap the top two values on the stack."""
-        first = self._stack.pop()
-        second = self._stack.pop()
-        self._stack.push(first)
-        self._stack.push(second)
+        second, first = self._stack.pop2()
+        self._stack.extend((first, second))
         self._pc += 1
 
-    def _dup(self) -> None:
+    def _dup(self, bytecode: list[int]) -> None:
         """Duplicate the top value on the stack."""
         value = self._stack.peek()
         self._stack.push(value)
         self._pc += 1
 
-    def _print(self) -> None:
+    def _print(self, bytecode: list[int]) -> None:
         value = self._stack.pop()
-        print(value)
+        self._write(value)
         self._pc += 1
 
-    def _push(self, bytecode) -> None:
+    def _input(self, bytecode: list[int]) -> None:
+        """Push the next input value. Raises EOFError past the end."""
+        self._stack.push(self._read())
+        self._pc += 1
+
+    def _eof(self, bytecode: list[int]) -> None:
+        """Push 1 if the input is exhausted, otherwise 0."""
+        self._stack.push(1 if self._at_end() else 0)
+        self._pc += 1
+
+    def _push(self, bytecode: list[int]) -> None:
         """Push a value onto the stack."""
         self._pc += 1
         value = bytecode[self._pc]
         self._stack.push(value)
         self._pc += 1
 
-    def _add(self) -> None:
+    def _add(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, add them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(left + right)
+        self._stack.binop(operator.add)
         self._pc += 1
 
-    def _sub(self) -> None:
+    def _sub(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, subtract them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(left - right)
+        self._stack.binop(operator.sub)
         self._pc += 1
 
-    def _mul(self) -> None:
+    def _mul(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, multiply them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(left * right)
+        self._stack.binop(operator.mul)
         self._pc += 1
 
-    def _div(self) -> None:
+    def _div(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, divide them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(left // right)
+        self._stack.binop(operator.floordiv)
         self._pc += 1
 
-    def _gt(self) -> None:
+    def _gt(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left > right else 0)
+        self._stack.binop(greater)
         self._pc += 1
 
-    def _lt(self) -> None:
+    def _lt(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left < right else 0)
+        self._stack.binop(less)
         self._pc += 1
 
-    def _eq(self) -> None:
+    def _eq(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left == right else 0)
+        self._stack.binop(equal)
         self._pc += 1
 
-    def _ge(self) -> None:
+    def _ge(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left >= right else 0)
+        self._stack.binop(greater_equal)
         self._pc += 1
 
-    def _le(self) -> None:
+    def _le(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left <= right else 0)
+        self._stack.binop(less_equal)
         self._pc += 1
 
-    def _neq(self) -> None:
+    def _neq(self, bytecode: list[int]) -> None:
         """Pop two values from the stack, compare them, and push the result."""
-        right = self._stack.pop()
-        left = self._stack.pop()
-        self._stack.push(1 if left != right else 0)
+        self._stack.binop(not_equal)
         self._pc += 1
 
-    def _jmp(self, bytecode) -> None:
+    def _jmp(self, bytecode: list[int]) -> None:
         """Jump to the specified address."""
         self._pc += 1
         address = bytecode[self._pc]
+        self._taken[self._pc + 1] += 1
         self._pc = address
 
-    def _jz(self, bytecode) -> None:
+    def _jz(self, bytecode: list[int]) -> None:
         """Pop a value from the stack and jump if it's zero."""
         value = self._stack.pop()
         self._pc += 1
         address = bytecode[self._pc]
         if value == 0:
+            self._taken[self._pc + 1] += 1
             self._pc = address
         else:
             self._pc += 1
 
-    def _jnz(self, bytecode) -> None:
+    def _jnz(self, bytecode: list[int]) -> None:
         """Pop a value from the stack and jump if it's not zero."""
         value = self._stack.pop()
         self._pc += 1
         address = bytecode[self._pc]
         if value != 0:
+            self._taken[self._pc + 1] += 1
             self._pc = address
         else:
             self._pc += 1
+
+    def _load_load_mul(self, bytecode: list[int]) -> None:
+        """Push memory[x] * memory[y] (fused LOAD x, LOAD y, MUL)."""
+        left = self._read_memory(bytecode[self._pc + 1])
+        right = self._read_memory(bytecode[self._pc + 2])
+        self._stack.push(left * right)
+        self._pc += 3
+
+    def _load_load_add(self, bytecode: list[int]) -> None:
+        """Push memory[x] + memory[y] (fused LOAD x, LOAD y, ADD)."""
+        left = self._read_memory(bytecode[self._pc + 1])
+        right = self._read_memory(bytecode[self._pc + 2])
+        self._stack.push(left + right)
+        self._pc += 3
+
+    def _load_add(self, bytecode: list[int]) -> None:
+        """Add memory[x] to the top of the stack (fused LOAD x, ADD)."""
+        right = self._read_memory(bytecode[self._pc + 1])
+        left = self._stack.pop()
+        self._stack.push(left + right)
+        self._pc += 2
+
+    def _push_add(self, bytecode: list[int]) -> None:
+        """Add a constant to the top of the stack (fused PUSH k, ADD)."""
+        left = self._stack.pop()
+        self._stack.push(left + bytecode[self._pc + 1])
+        self._pc += 2
+
+    def _push_sub(self, bytecode: list[int]) -> None:
+        """Subtract a constant from the top of the stack (fused PUSH k, SUB)."""
+        left = self._stack.pop()
+        self._stack.push(left - bytecode[self._pc + 1])
+        self._pc += 2
+
+    def _dup_store(self, bytecode: list[int]) -> None:
+        """Store the top value without popping it (fused DUP, STORE n)."""
+        address = bytecode[self._pc + 1]
+        value = self._stack.peek()
+        if not (0 <= address < len(self._memory)):
+            raise VirtualMachineError(f"Invalid memory address: {address}")
+        self._memory[address] = value
+        self._pc += 2
+
+    def _push_ge_jnz(self, bytecode: list[int]) -> None:
+        """Pop a value and jump if it is >= k (fused PUSH k, GE, JNZ a)."""
+        value = self._stack.pop()
+        if value >= bytecode[self._pc + 1]:
+            self._taken[self._pc + 3] += 1
+            self._pc = bytecode[self._pc + 2]
+        else:
+            self._pc += 3
+
+    def _memcpy(self, bytecode: list[int]) -> None:
+        """Copy count cells from src to dst (MEMCPY dst src count)."""
+        dst, src, count = self._operands(bytecode, 3)
+        self._check_range(dst, count)
+        self._check_range(src, count)
+        memcpy(self._memory, dst, src, count)
+        self._pc += 4
+
+    def _memset(self, bytecode: list[int]) -> None:
+        """Pop a value and fill count cells from dst with it (MEMSET dst count)."""
+        dst, count = self._operands(bytecode, 2)
+        value = self._stack.pop()
+        self._check_range(dst, count)
+        memset(self._memory, dst, count, value)
+        self._pc += 3
+
+    def _sum(self, bytecode: list[int]) -> None:
+        """Push the sum of count cells from start (SUM start count)."""
+        self._stack.push(sum(self._read_range(bytecode)))
+        self._pc += 3
+
+    def _min(self, bytecode: list[int]) -> None:
+        """Push the smallest of count cells from start (MIN start count)."""
+        self._stack.push(min(self._read_range(bytecode)))
+        self._pc += 3
+
+    def _max(self, bytecode: list[int]) -> None:
+        """Push the largest of count cells from start (MAX start count)."""
+        self._stack.push(max(self._read_range(bytecode)))
+        self._pc += 3
+
+    def _read_range(self, bytecode: list[int]):
+        """Return the memory range named by a SUM/MIN/MAX instruction."""
+        start, count = self._operands(bytecode, 2)
+        self._check_range(start, count)
+        return self._memory[start : start + count]
+
+    def _vadd(self, bytecode: list[int]) -> None:
+        """Store elementwise sums at dst (VADD dst left right count)."""
+        self._vector(bytecode, vadd)
+
+    def _vmul(self, bytecode: list[int]) -> None:
+        """Store elementwise products at dst (VMUL dst left right count)."""
+        self._vector(bytecode, vmul)
+
+    def _vector(self, bytecode: list[int], operation) -> None:
+        dst, left, right, count = self._operands(bytecode, 4)
+        for start in (dst, left, right):
+            self._check_range(start, count)
+        operation(self._memory, dst, left, right, count)
+        self._pc += 5
@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from vm import VirtualMachine
+
+LATENCY_SAMPLES = 10_000
+
+
+class PoolTimeout(Exception):
+    """Raised when no VM becomes free within a checkout timeout."""
+
+    pass
+
+
+@dataclass
+class PoolMetrics:
+    """Checkout counts and latencies for a VMPool.
+
+    `reuse_rate` is the share of checkouts that got a VM which had already
+    run a program. Latencies are in microseconds over the most recent
+    checkouts.
+    """
+
+    size: int
+    idle: int
+    checkouts: int
+    reuse_rate: float
+    mean_us: float
+    p50_us: float
+    p99_us: float
+    max_us: float
+
+    def format(self) -> str:
+        return (
+            f"{self.checkouts} checkouts from {self.size} VMs "
+            f"({self.idle} idle), reuse {self.reuse_rate:.1%}\n"
+            f"checkout latency: mean {self.mean_us:.2f}us "
+            f"p50 {self.p50_us:.2f}us p99 {self.p99_us:.2f}us "
+            f"max {self.max_us:.2f}us\n"
+        )
+
+
+class VMPool:
+    """A fixed set of pre-built VirtualMachines shared between threads.
+
+    All `size` VMs are built up front with vm_options; `memory`, if given,
+    is called once per VM to build its memory backend (e.g.
+    `lambda: memory.dense(1024)`). A VM is reset when it is checked back
+    in, so checkout only takes one from the idle queue. When every VM is in
+    use, checkout waits, up to `timeout` seconds if one is given.
+    """
+
+    def __init__(self, size=8, memory: Callable | None = None, **vm_options) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            backend = memory() if memory is not None else None
+            self._idle.put(VirtualMachine(memory=backend, **vm_options))
+        self._used = set()
+        self._lock = threading.Lock()
+        self._checkouts = 0
+        self._reuses = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def checkout(self, timeout: float | None = None) -> VirtualMachine:
+        """Take a clean VM from the pool. Return it with `checkin`."""
+        start = time.perf_counter_ns()
+        try:
+            vm = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No VM free after {timeout} seconds.") from None
+        elapsed = time.perf_counter_ns() - start
+        with self._lock:
+            self._checkouts += 1
+            if id(vm) in self._used:
+                self._reuses += 1
+            self._latencies.append(elapsed)
+        return vm
+
+    def checkin(self, vm: VirtualMachine) -> None:
+        """Reset vm and make it available again."""
+        vm.reset()
+        with self._lock:
+            self._used.add(id(vm))
+        self._idle.put(vm)
+
+    @contextmanager
+    def vm(self, timeout: float | None = None) -> Iterator[VirtualMachine]:
+        """Check out a VM for the duration of a with block."""
+        vm = self.checkout(timeout)
+        try:
+            yield vm
+        finally:
+            self.checkin(vm)
+
+    def metrics(self) -> PoolMetrics:
+        """Return checkout counts, reuse rate and latency percentiles."""
+        with self._lock:
+            latencies = sorted(self._latencies) or [0]
+            checkouts = self._checkouts
+            reuses = self._reuses
+
+        def percentile(p: float) -> float:
+            rank = max(1, -(-len(latencies) * p // 100))
+            return latencies[int(rank) - 1] / 1000
+
+        return PoolMetrics(
+            size=self._size,
+            idle=self._idle.qsize(),
+            checkouts=checkouts,
+            reuse_rate=reuses / checkouts if checkouts else 0.0,
+            mean_us=sum(latencies) / len(latencies) / 1000,
+            p50_us=percentile(50),
+            p99_us=percentile(99),
+            max_us=latencies[-1] / 1000,
+        )
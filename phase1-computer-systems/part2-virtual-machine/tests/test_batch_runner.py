@@ -0,0 +1,106 @@
+import signal
+
+import batch_runner
+import pytest
+from batch_runner import BatchReport, Job, ProgramResult, main, run_batch, summarize
+from bytecode_file import dump
+from opcodes import Opcode
+
+
+def print_program(value):
+    return [Opcode.PUSH.value, value, Opcode.PRINT.value, Opcode.HALT.value]
+
+
+def test_results_in_job_order():
+    """Test that results come back in the order jobs were given."""
+    jobs = [Job(print_program(n)) for n in range(50)]
+    results, report = run_batch(jobs, workers=2)
+    assert [result.output for result in results] == [f"{n}\n" for n in range(50)]
+    assert all(result.status == "ok" for result in results)
+    assert report.programs == 50
+
+
+def test_memory_size_and_initial_memory():
+    """Test that each job gets its own memory size and initial values."""
+    program = [
+        *(Opcode.LOAD.value, 1, Opcode.PUSH.value, 2, Opcode.MUL.value),
+        *(Opcode.STORE.value, 2, Opcode.HALT.value),
+    ]
+    results, _ = run_batch([Job(program, memory_size=3, memory=[0, 21])], workers=1)
+    assert results[0].memory == [0, 21, 42]
+
+
+def test_initial_memory_must_fit():
+    """Test that initial memory longer than memory_size is rejected."""
+    with pytest.raises(ValueError, match="Job 1 has 3 initial memory values"):
+        run_batch([Job(print_program(1)), Job(print_program(2), 2, [1, 2, 3])])
+
+
+def test_errors_are_reported_per_program():
+    """Test that a failing program does not affect the others."""
+    jobs = [Job([Opcode.POP.value, Opcode.HALT.value]), Job(print_program(7))]
+    results, _ = run_batch(jobs, workers=1)
+    assert results[0].status == "error"
+    assert "EmptyStackError" in results[0].error
+    assert results[1].output == "7\n"
+
+
+def test_timeout_stops_runaway_program():
+    """Test that an infinite loop is cut off by the per-program timeout."""
+    loop = [Opcode.JMP.value, 0]
+    results, _ = run_batch([Job(loop), Job(print_program(1))], workers=1, timeout=0.1)
+    assert results[0].status == "timeout"
+    assert results[0].seconds < 5
+    assert results[1].status == "ok"
+
+
+def test_late_alarm_is_a_timeout(monkeypatch):
+    """Test that an alarm firing after the run, before it is disarmed, is
+    reported as a timeout rather than raised out of the worker."""
+    block = batch_runner.shared_memory.SharedMemory(create=True, size=64)
+    image = batch_runner._image(print_program(5))
+    block.buf[: len(image)] = image
+    monkeypatch.setattr(batch_runner, "_images", block)
+    setitimer = signal.setitimer
+
+    def late_alarm(which, seconds, interval=0.0):
+        setitimer(which, seconds, interval)
+        if seconds == 0:
+            raise batch_runner.ProgramTimeout()
+
+    monkeypatch.setattr(signal, "setitimer", late_alarm)
+    handler = signal.getsignal(signal.SIGALRM)
+    try:
+        result = batch_runner._run_job((0, len(image), 4, [], "match", 5.0))
+    finally:
+        signal.signal(signal.SIGALRM, handler)
+        block.close()
+        block.unlink()
+    assert result.status == "timeout"
+    assert result.output == "5\n"
+
+
+def test_wide_values_use_varint_images():
+    """Test that programs with words over 64 bits still run."""
+    results, _ = run_batch([Job(print_program(1 << 70))], workers=1)
+    assert results[0].output == f"{1 << 70}\n"
+
+
+def test_summarize_percentiles():
+    """Test nearest-rank percentiles and throughput."""
+    results = [ProgramResult("", [], "ok", None, n / 100) for n in range(1, 101)]
+    report = summarize(results, workers=4, elapsed=2.0)
+    assert report == BatchReport(100, 4, 2.0, 50.0, 0.5, 0.95, 0.99, 1.0)
+
+
+def test_cli(tmp_path, capsys):
+    """Test that the CLI runs bytecode files and prints output in order."""
+    paths = []
+    for n in (3, 4):
+        path = tmp_path / f"p{n}.vmbc"
+        dump(print_program(n), path)
+        paths.append(str(path))
+    main([*paths, "--workers", "1", "--timeout", "5"])
+    out = capsys.readouterr().out
+    assert out.index("p3.vmbc: ok") < out.index("3\n") < out.index("p4.vmbc: ok")
+    assert "2 programs on 1 workers" in out
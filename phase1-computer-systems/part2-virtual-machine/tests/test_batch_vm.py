@@ -0,0 +1,176 @@
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from batch_vm import BatchError, BatchVM
+from opcodes import Opcode
+from peephole import fuse, trace
+from verifier import VerificationError
+from vm import VirtualMachine
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "examples"))
+
+from demo import factorial, fibonacci
+
+
+def run_scalar(bytecode, memory_size=256):
+    vm = VirtualMachine(memory_size=memory_size)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        vm.run(bytecode)
+    printed = [int(line) for line in output.getvalue().split()]
+    return printed, vm
+
+
+def assert_matches_scalar(programs, memory_size=256):
+    result = BatchVM(memory_size=memory_size).run(programs)
+    for lane, bytecode in enumerate(programs):
+        printed, vm = run_scalar(bytecode, memory_size)
+        assert result.outputs[lane] == printed
+        assert result.memory[lane].tolist() == vm._memory
+        assert result.stacks[lane] == vm._stack._items
+        assert result.pcs[lane] == vm._pc
+
+
+def test_factorial_lanes_match_vm():
+    """Test that factorial over many inputs matches one VM run per input."""
+    assert_matches_scalar([factorial(n) for n in range(1, 21)])
+
+
+def test_fibonacci_lanes_match_vm():
+    """Test that fibonacci lanes that loop different counts all match."""
+    assert_matches_scalar([fibonacci(n) for n in (1, 2, 7, 30, 90)])
+
+
+def test_fused_programs_match_vm():
+    """Test that superinstructions run as vector operations too."""
+    assert_matches_scalar([fuse(factorial(n)) for n in (3, 9, 15)])
+
+
+def test_divergent_branch_and_leftover_stack():
+    """Test that lanes taking different branches keep their own stacks."""
+    programs = [
+        [
+            *(Opcode.PUSH.value, n, Opcode.DUP.value, Opcode.JZ.value, 8),
+            *(Opcode.PUSH.value, 10, Opcode.MUL.value),
+            *(Opcode.DUP.value, Opcode.PRINT.value, Opcode.HALT.value),
+        ]
+        for n in (0, 4, -2)
+    ]
+    assert_matches_scalar(programs)
+
+
+def test_steps_do_not_grow_with_lanes():
+    """Test that the instruction count depends on the program, not lanes."""
+    one = BatchVM().run([factorial(10)])
+    many = BatchVM().run([factorial(10)] * 1000)
+    assert one.steps == many.steps == len(trace(factorial(10)))
+
+
+def test_programs_must_differ_only_in_constants():
+    """Test that programs with different addresses cannot share a batch."""
+    other = factorial(5)
+    other[3] = 2  # STORE address
+    with pytest.raises(BatchError):
+        BatchVM().run([factorial(5), other])
+    with pytest.raises(BatchError):
+        BatchVM().run([factorial(5), factorial(5)[:-1]])
+    with pytest.raises(BatchError):
+        BatchVM().run([])
+
+
+def test_unverifiable_program_is_rejected():
+    """Test that batches require programs that pass verification."""
+    with pytest.raises(VerificationError):
+        BatchVM().run([[Opcode.POP.value, Opcode.HALT.value]])
+
+
+def test_unsupported_opcode_is_rejected_before_running():
+    """Test that INPUT is rejected even where every lane fails before it."""
+    program = [Opcode.PUSH.value, 1, Opcode.PUSH.value, 0, Opcode.DIV.value]
+    program += [Opcode.INPUT.value, Opcode.PRINT.value, Opcode.POP.value]
+    program += [Opcode.HALT.value]
+    with pytest.raises(BatchError, match="INPUT"):
+        BatchVM().run([program, program])
+
+
+def test_division_by_zero_fails_only_its_lane():
+    """Test that a zero divisor stops just the lanes that divide by it."""
+    programs = [
+        [Opcode.PUSH.value, 6, Opcode.PUSH.value, d, Opcode.DIV.value]
+        + [Opcode.PRINT.value, Opcode.HALT.value]
+        for d in (2, 0, -4)
+    ]
+    result = BatchVM().run(programs)
+    assert result.outputs == [[3], [], [-2]]
+    assert result.errors[ZeroDivisionError].tolist() == [False, True, False]
+    assert result.pcs == [6, 4, 6]
+    assert result.stacks[1] == [6, 0]
+    assert not result.errors.keys() - {ZeroDivisionError}
+
+
+@pytest.mark.parametrize("fused", [False, True], ids=["plain", "fused"])
+def test_overflow_fails_only_its_lane(fused):
+    """Test that lanes leaving int64 stop with OverflowError, not wrap."""
+    programs = [factorial(n) for n in (5, 20, 21, 25)]
+    if fused:
+        programs = [fuse(program) for program in programs]
+    result = BatchVM().run(programs)
+    assert result.outputs[:2] == [[120], [2432902008176640000]]
+    assert result.outputs[2:] == [[], []]
+    assert result.failed.tolist() == [False, False, True, True]
+    assert result.errors[OverflowError].tolist() == result.failed.tolist()
+
+
+def test_overflow_checks_are_exact():
+    """Test the int64 overflow checks against Python ints near the limits."""
+    limit = 1 << 63
+    edges = [0, 1, -1, 2, -2, 3, 1 << 31, -(1 << 32), limit - 1, -limit]
+    edges += [limit // 2, -limit // 2, limit // 3, 3037000499, -3037000500]
+    programs = [
+        [
+            *(Opcode.PUSH.value, left, Opcode.PUSH.value, right),
+            *(opcode.value, Opcode.PRINT.value, Opcode.HALT.value),
+        ]
+        for opcode in (Opcode.ADD, Opcode.SUB, Opcode.MUL, Opcode.DIV)
+        for left in edges
+        for right in edges
+    ]
+    for program in programs:
+        result = BatchVM().run([program])
+        left, right, opcode = program[1], program[3], Opcode(program[4])
+        if opcode == Opcode.DIV and right == 0:
+            assert result.errors.keys() == {ZeroDivisionError}
+            continue
+        exact = {
+            Opcode.ADD: left + right,
+            Opcode.SUB: left - right,
+            Opcode.MUL: left * right,
+            Opcode.DIV: left // right if right else 0,
+        }[opcode]
+        if -limit <= exact < limit:
+            assert result.outputs == [[exact]]
+        else:
+            assert result.errors.keys() == {OverflowError}
+
+
+def test_sum_overflow_is_per_lane():
+    """Test that SUM fails only where the whole sum leaves int64."""
+    big = (1 << 62) + 1
+    programs = [
+        [
+            *(Opcode.PUSH.value, big, Opcode.STORE.value, 0),
+            *(Opcode.PUSH.value, big, Opcode.STORE.value, 1),
+            *(Opcode.PUSH.value, last, Opcode.STORE.value, 2),
+            *(Opcode.SUM.value, 0, 3, Opcode.PRINT.value, Opcode.HALT.value),
+        ]
+        for last in (-big, big)
+    ]
+    result = BatchVM(memory_size=3).run(programs)
+    assert result.outputs == [[big], []]
+    assert result.errors[OverflowError].tolist() == [False, True]
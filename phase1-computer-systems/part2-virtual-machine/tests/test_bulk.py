@@ -0,0 +1,120 @@
+import pytest
+from disassembler import disassemble
+from memory import SparseMemory, dense
+from opcodes import Opcode
+from sinks import ListSink
+from translator import compile_program
+from verifier import VerificationError, verify
+from vm import ENGINES, VirtualMachine, VirtualMachineError
+
+# Fills 0..3 with 2, copies it to 4..7, then sets 4..7 to (0..3 + 4..7) *
+# (0..3 + 4..7) and prints the sum, min and max of 4..7.
+PROGRAM = [
+    *(Opcode.PUSH.value, 2, Opcode.MEMSET.value, 0, 4),
+    *(Opcode.PUSH.value, 5, Opcode.STORE.value, 1),
+    *(Opcode.MEMCPY.value, 4, 0, 4),
+    *(Opcode.VADD.value, 4, 0, 4, 4),
+    *(Opcode.VMUL.value, 4, 4, 4, 4),
+    *(Opcode.SUM.value, 4, 4, Opcode.PRINT.value),
+    *(Opcode.MIN.value, 4, 4, Opcode.PRINT.value),
+    *(Opcode.MAX.value, 4, 4, Opcode.PRINT.value),
+    Opcode.HALT.value,
+]
+EXPECTED_MEMORY = [2, 5, 2, 2, 16, 100, 16, 16]
+
+# Sums memory 0..7 into the accumulator three times, so the loop gets hot.
+LOOP = [
+    *(Opcode.PUSH.value, 3, Opcode.MEMSET.value, 0, 8),
+    *(Opcode.PUSH.value, 0, Opcode.PUSH.value, 3),
+    # 9: counter on top, running total below
+    *(Opcode.SWAP.value, Opcode.SUM.value, 0, 8, Opcode.ADD.value, Opcode.SWAP.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value, Opcode.DUP.value, Opcode.JNZ.value, 9),
+    *(Opcode.POP.value, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_bulk_opcodes(engine):
+    """Test the bulk opcodes on every engine."""
+    vm = VirtualMachine(engine=engine, output=ListSink(), memory_size=8)
+    vm.run(PROGRAM)
+    assert vm.output.values == [148, 16, 100]
+    assert vm._memory == EXPECTED_MEMORY
+
+
+@pytest.mark.parametrize(
+    "options", [{"verify": True}, {"engine": "jit", "jit_threshold": 1}]
+)
+def test_bulk_opcodes_on_fast_paths(options):
+    """Test the bulk opcodes on the verified path and in JIT traces."""
+    vm = VirtualMachine(output=ListSink(), memory_size=8, **options)
+    vm.run(LOOP)
+    assert vm.output.values == [72]
+
+
+def test_bulk_opcodes_translate():
+    """Test that translated programs call the bulk functions."""
+    memory = [0] * 8
+    pc, stack = compile_program(PROGRAM, 8)(memory, ListSink().write)
+    assert memory == EXPECTED_MEMORY
+    assert stack == []
+
+
+@pytest.mark.parametrize("memory", [dense(8), SparseMemory(8)], ids=type)
+def test_bulk_opcodes_on_backends(memory):
+    """Test the bulk opcodes on typed and sparse memory."""
+    vm = VirtualMachine(output=ListSink(), memory=memory)
+    vm.run(PROGRAM)
+    assert vm.output.values == [148, 16, 100]
+    assert list(memory[0:8]) == EXPECTED_MEMORY
+
+
+def test_memcpy_overlapping_ranges():
+    """Test that MEMCPY behaves like memmove for overlapping ranges."""
+    vm = VirtualMachine(memory=[1, 2, 3, 4, 0, 0])
+    vm.run([Opcode.MEMCPY.value, 2, 0, 4, Opcode.HALT.value])
+    assert vm._memory == [1, 2, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "instruction",
+    [
+        pytest.param([Opcode.MEMCPY.value, 6, 0, 4], id="memcpy past end"),
+        pytest.param([Opcode.SUM.value, -1, 2], id="negative start"),
+        pytest.param([Opcode.MIN.value, 0, 0], id="empty range"),
+        pytest.param([Opcode.VADD.value, 0, 0, 7, 2], id="vadd operand"),
+    ],
+)
+def test_invalid_memory_range(engine, instruction):
+    """Test that ranges outside memory raise on every engine."""
+    vm = VirtualMachine(engine=engine, memory_size=8)
+    with pytest.raises(VirtualMachineError, match="Invalid memory range"):
+        vm.run(instruction + [Opcode.HALT.value])
+
+
+def test_verify_checks_ranges():
+    """Test that the verifier rejects ranges that do not fit in memory."""
+    assert verify([Opcode.SUM.value, 4, 4, Opcode.POP.value, 0], 8)
+    with pytest.raises(VerificationError, match="Invalid memory range"):
+        verify([Opcode.SUM.value, 5, 4, Opcode.POP.value, 0], 8)
+    with pytest.raises(VerificationError, match="Stack underflow"):
+        verify([Opcode.MEMSET.value, 0, 4, 0], 8)
+
+
+def test_disassemble_bulk_opcodes():
+    """Test that bulk opcodes disassemble with all their operands."""
+    assert disassemble([Opcode.VMUL.value, 4, 0, 2, 2, Opcode.HALT.value]) == (
+        "0000: VMUL 4 0 2 2\n0005: HALT\n"
+    )
+
+
+def test_batch_vm_bulk_opcodes():
+    """Test the bulk opcodes in the lane-per-input batch VM."""
+    pytest.importorskip("numpy")
+    from batch_vm import BatchVM
+
+    programs = [[*PROGRAM[:1], value, *PROGRAM[2:]] for value in (2, 3)]
+    result = BatchVM(memory_size=8).run(programs)
+    assert result.outputs == [[148, 16, 100], [208, 36, 100]]
+    assert result.memory[0].tolist() == EXPECTED_MEMORY
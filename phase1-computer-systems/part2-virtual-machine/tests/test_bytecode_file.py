@@ -0,0 +1,108 @@
+import contextlib
+import io
+
+import pytest
+from bytecode_file import BytecodeFileError, dump, dumps, load, loads
+from disassembler import disassemble
+from opcodes import Opcode
+from vm import ENGINES, VirtualMachine
+
+PROGRAM = [
+    Opcode.PUSH.value,
+    5,
+    Opcode.PUSH.value,
+    -3,
+    Opcode.ADD.value,
+    Opcode.PRINT.value,
+    Opcode.HALT.value,
+]
+
+
+def run_output(bytecode, engine="match"):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        VirtualMachine(engine=engine).run(bytecode)
+    return output.getvalue()
+
+
+def test_round_trip_fixed():
+    """Test that fixed-width encoding round-trips bytecode and symbols."""
+    image = loads(dumps(PROGRAM, symbols={"x": 3}))
+    assert list(image.code) == PROGRAM
+    assert image.symbols == {"x": 3}
+
+
+@pytest.mark.parametrize("value, size", [(100, 1), (-129, 2), (40000, 4), (1 << 40, 8)])
+def test_word_size_is_narrowest_fit(value, size):
+    """Test that the fixed encoding picks the narrowest word size."""
+    data = dumps([Opcode.PUSH.value, value, Opcode.HALT.value])
+    image = loads(data)
+    assert image.code.itemsize == size
+    assert list(image.code) == [Opcode.PUSH.value, value, Opcode.HALT.value]
+
+
+def test_round_trip_varint_handles_wide_values():
+    """Test that varint encoding round-trips values wider than 64 bits."""
+    bytecode = [Opcode.PUSH.value, 1 << 80, Opcode.PUSH.value, -(1 << 70), 0]
+    assert loads(dumps(bytecode, encoding="varint")).code == bytecode
+    with pytest.raises(BytecodeFileError):
+        dumps(bytecode)
+
+
+def test_varint_is_compact():
+    """Test that small programs take one byte per word with varint."""
+    assert len(dumps(PROGRAM, encoding="varint")) == 24 + len(PROGRAM)
+
+
+def test_fixed_code_is_a_view(tmp_path):
+    """Test that loading from a file keeps code as a view over the map."""
+    path = tmp_path / "program.vmbc"
+    dump(PROGRAM, path)
+    with load(path) as image:
+        assert isinstance(image.code, memoryview)
+        assert image.code.obj is not None
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_vm_runs_mapped_file(tmp_path, engine):
+    """Test that every engine runs bytecode straight from an mmap'd file."""
+    path = tmp_path / "program.vmbc"
+    dump(PROGRAM, path)
+    with load(path) as image:
+        assert run_output(image.code, engine) == "2\n"
+
+
+def test_disassemble_mapped_file(tmp_path):
+    """Test that disassemble accepts a memoryview over a mapped file."""
+    path = tmp_path / "program.vmbc"
+    dump(PROGRAM, path, encoding="fixed")
+    with load(path) as image:
+        assert disassemble(image.code) == disassemble(PROGRAM)
+
+
+def test_bad_magic():
+    """Test that data without the magic number is rejected."""
+    with pytest.raises(BytecodeFileError):
+        loads(b"NOPE" + bytes(20))
+
+
+def test_unsupported_version():
+    """Test that an unknown format version is rejected."""
+    data = bytearray(dumps(PROGRAM))
+    data[4] = 99
+    with pytest.raises(BytecodeFileError):
+        loads(bytes(data))
+
+
+def test_truncated_file():
+    """Test that a file shorter than its header claims is rejected."""
+    with pytest.raises(BytecodeFileError):
+        loads(dumps(PROGRAM)[:-8])
+    with pytest.raises(BytecodeFileError):
+        loads(b"VMBC")
+
+
+def test_unknown_encoding():
+    """Test that dumps rejects an unknown encoding name."""
+    with pytest.raises(BytecodeFileError):
+        dumps(PROGRAM, encoding="zip")
@@ -0,0 +1,332 @@
+import json
+import linecache
+import sys
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable
+
+import counters
+import pytest
+from bytecode_file import dumps, loads
+from counters import VMStats, append_json_line, write_prometheus
+from jit import Trace
+from opcodes import Opcode
+from peephole import fuse, trace
+from sinks import ListSink
+from vm import ENGINES, VirtualMachine
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "examples"))
+
+from demo import factorial, fibonacci
+
+# Counters may add at most this fraction to the work of a run() of the demo
+# loops. stats(), where the counting is paid for, is checked separately.
+MAX_OVERHEAD = 0.05
+
+# Prints 3, 2, 1; the JNZ at pc 8 jumps back to pc 2 twice.
+COUNTDOWN = [
+    *(Opcode.PUSH.value, 3),
+    *(Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+    Opcode.HALT.value,
+]
+
+# Stores 5 at 0, copies cells 0-1 to 2-3, then loads cell 2 and divides by 0.
+FAILING = [
+    *(Opcode.PUSH.value, 5, Opcode.STORE.value, 0),
+    *(Opcode.MEMCPY.value, 2, 0, 2),
+    *(Opcode.LOAD.value, 2, Opcode.PUSH.value, 0, Opcode.DIV.value),
+    Opcode.HALT.value,
+]
+
+# None of these verify. Pushes and pops five values, with a stray byte after
+# the HALT.
+PUSH_POP = [
+    *(Opcode.PUSH.value, 1) * 5,
+    *(Opcode.POP.value,) * 5,
+    *(Opcode.HALT.value, 99),
+]
+
+# Jumps over an invalid opcode to print 3.
+JUMP_OVER = [
+    *(Opcode.PUSH.value, 3, Opcode.JMP.value, 5, 99),
+    *(Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# Counts down from 3 like COUNTDOWN, leaving one more value each time round.
+GROWING = [
+    *(Opcode.PUSH.value, 3),
+    *(Opcode.DUP.value, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+    Opcode.HALT.value,
+]
+
+
+def counts(stats: VMStats) -> dict:
+    """Return stats without the wall times, which vary run to run."""
+    values = asdict(stats)
+    del values["wall_seconds"], values["last_wall_seconds"]
+    return values
+
+
+def test_countdown_counters(capsys):
+    """Test each counter on a small loop."""
+    vm = VirtualMachine()
+    vm.run(COUNTDOWN)
+    capsys.readouterr()
+    assert counts(vm.stats()) == {
+        "runs": 1,
+        "instructions": 19,
+        "jumps": 2,
+        "memory_cells": 0,
+        "prints": 3,
+        "peak_stack_depth": 2,
+    }
+
+
+@pytest.mark.parametrize("verify", [False, True], ids=["checked", "verified"])
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("program", [factorial(12), fibonacci(30), fuse(factorial(12))])
+def test_counts_agree_across_engines(engine, verify, program):
+    """Test that every engine counts the instructions trace() sees."""
+    vm = VirtualMachine(engine=engine, verify=verify, output=ListSink())
+    vm.run(program)
+    reference = VirtualMachine(engine="match", output=ListSink())
+    reference.run(program)
+    assert vm.stats().instructions == len(trace(program)) - 1
+    assert counts(vm.stats()) == counts(reference.stats())
+
+
+def test_jit_traces_are_counted():
+    """Test that iterations run in a compiled trace still count."""
+    vm = VirtualMachine(engine="jit", jit_threshold=1, output=ListSink())
+    vm.run(COUNTDOWN)
+    assert counts(vm.stats())["instructions"] == 19
+    assert vm.stats().jumps == 2
+
+
+def test_budgeted_runs_add_up():
+    """Test that a run split into slices counts the same as one run."""
+    vm = VirtualMachine(engine="threaded", output=ListSink())
+    state = vm.run(COUNTDOWN, budget=4)
+    while not state.halted:
+        state = state.resume(4)
+    stats = vm.stats()
+    assert stats.instructions == 19
+    assert stats.runs == 5
+
+
+def test_image_runs_count_after_close():
+    """Test that runs of a memoryview image count once it is released."""
+    vm = VirtualMachine(output=ListSink())
+    with loads(dumps(COUNTDOWN)) as image:
+        state = vm.run(image.code, budget=4)
+        while not state.halted:
+            state = state.resume(4)
+    reference = VirtualMachine(output=ListSink())
+    state = reference.run(COUNTDOWN, budget=4)
+    while not state.halted:
+        state = state.resume(4)
+    assert counts(vm.stats()) == counts(reference.stats())
+
+
+def test_runs_do_not_copy_bytecode():
+    """Test that starting a run allocates nothing the size of the program."""
+    program = [Opcode.PUSH.value, 1, Opcode.HALT.value] + [0] * (1 << 16) + [1 << 40]
+    vm = VirtualMachine()
+    vm.run(program)
+    with loads(dumps(program)) as image:
+        tracemalloc.start()
+        for _ in range(2):
+            vm.reset()
+            vm.run(program)
+            vm.reset()
+            vm.run(image.code)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    assert peak < len(program)
+    # Each run retires the PUSH and stops at the HALT.
+    assert vm.stats().instructions == vm.stats().runs == 5
+
+
+@pytest.mark.parametrize("engine", ["match", "table", "threaded"])
+@pytest.mark.parametrize(
+    "changed",
+    [
+        # COUNTDOWN after ten PUSH 0, POP pairs, so its jump ends past the old end.
+        [
+            *(Opcode.PUSH.value, 0, Opcode.POP.value) * 10,
+            *COUNTDOWN[:-2],
+            32,
+            Opcode.HALT.value,
+        ],
+        [*(Opcode.PUSH.value, 7, Opcode.PRINT.value) * 2, Opcode.HALT.value],
+    ],
+    ids=["longer", "shorter"],
+)
+def test_program_changed_between_runs(engine, changed):
+    """Test that a list changed in place is counted as the new program."""
+    vm = VirtualMachine(engine=engine, output=ListSink())
+    program = list(COUNTDOWN)
+    vm.run(program)
+    program[:] = changed
+    vm.reset()
+    vm.run(program)
+    reference = VirtualMachine(engine=engine, output=ListSink())
+    reference.run(COUNTDOWN)
+    reference.reset()
+    reference.run(list(changed))
+    assert counts(vm.stats()) == counts(reference.stats())
+    assert vm.stats().prints == len(vm.output.values)
+
+
+@pytest.mark.parametrize("engine", ["match", "table", "threaded"])
+def test_failed_run_counts_retired_instructions(engine):
+    """Test that the instruction that raised is not counted."""
+    vm = VirtualMachine(engine=engine)
+    with pytest.raises(ZeroDivisionError):
+        vm.run(FAILING)
+    assert counts(vm.stats()) == {
+        "runs": 1,
+        "instructions": 5,
+        "jumps": 0,
+        "memory_cells": 6,
+        "prints": 0,
+        "peak_stack_depth": 2,
+    }
+
+
+@pytest.mark.parametrize(
+    "program, peak", [(PUSH_POP, 5), (JUMP_OVER, 1), (GROWING, None)]
+)
+def test_unverified_peak(program, peak):
+    """Test the peak depth of code that does not verify, or None if unknown."""
+    vm = VirtualMachine(output=ListSink())
+    vm.run(program)
+    stats = vm.stats()
+    assert stats.peak_stack_depth == peak
+    if peak is None:
+        assert json.loads(stats.to_json_line())["peak_stack_depth"] is None
+        assert "vm_peak_stack_depth NaN" in stats.to_prometheus().splitlines()
+        vm.reset()
+        vm.run(COUNTDOWN)
+        assert vm.stats().peak_stack_depth is None
+        vm.counters.reset()
+        vm.reset()
+        vm.run(COUNTDOWN)
+        assert vm.stats().peak_stack_depth == 2
+
+
+def test_stats_accumulate_over_programs(capsys):
+    """Test that totals cover every run of every program."""
+    vm = VirtualMachine()
+    for program in (COUNTDOWN, factorial(5), COUNTDOWN):
+        vm.reset()
+        vm.run(program)
+    capsys.readouterr()
+    stats = vm.stats()
+    assert stats.runs == 3
+    assert stats.instructions == 2 * 19 + len(trace(factorial(5))) - 1
+    assert stats.prints == 7
+    assert 0 < stats.last_wall_seconds <= stats.wall_seconds
+
+
+def test_reset_stats():
+    """Test that resetting the counters zeroes them."""
+    vm = VirtualMachine(output=ListSink())
+    vm.run(COUNTDOWN)
+    vm.counters.reset()
+    assert vm.stats() == VMStats()
+
+
+def test_prometheus_format():
+    """Test the text exposition format, with labels."""
+    text = VMStats(runs=2, instructions=40).to_prometheus(engine="table")
+    lines = text.splitlines()
+    assert "# TYPE vm_runs_total counter" in lines
+    assert 'vm_runs_total{engine="table"} 2' in lines
+    assert 'vm_instructions_total{engine="table"} 40' in lines
+    assert "# TYPE vm_peak_stack_depth gauge" in lines
+
+
+def test_exports(tmp_path):
+    """Test writing a Prometheus textfile and appending JSON lines."""
+    vm = VirtualMachine(output=ListSink())
+    vm.run(COUNTDOWN)
+    stats = vm.stats()
+    path = tmp_path / "vm.prom"
+    write_prometheus(str(path), stats, worker="1")
+    assert 'vm_prints_total{worker="1"} 3' in path.read_text()
+    assert list(tmp_path.iterdir()) == [path]
+
+    log = tmp_path / "stats.jsonl"
+    for _ in range(2):
+        append_json_line(str(log), stats, worker=1)
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert records[1] == {"worker": 1, **asdict(stats)}
+
+
+def counted_opcodes(function: Callable[[], None]) -> tuple[int, int]:
+    """Return the Python bytecode instructions function runs, and how many
+    of them keep the counters.
+
+    A deterministic stand-in for run time: on a shared machine, timings
+    vary by more than the few percent being checked. Counting work is
+    everything in counters.py, Trace.count_jumps and the frame of
+    VirtualMachine.run itself, plus each line of the engines that updates
+    _taken; everything else is the engine's own work.
+    """
+    total = counting = 0
+    counting_code = {VirtualMachine.run.__code__, Trace.count_jumps.__code__}
+
+    def tracer(frame, event, arg):
+        nonlocal total, counting
+        frame.f_trace_opcodes = True
+        if event == "opcode":
+            total += 1
+            code = frame.f_code
+            line = linecache.getline(code.co_filename, frame.f_lineno or 0)
+            if (
+                code in counting_code
+                or code.co_filename == counters.__file__
+                or "_taken" in line
+            ):
+                counting += 1
+        return tracer
+
+    sys.settrace(tracer)
+    try:
+        function()
+    finally:
+        sys.settrace(None)
+    return total, counting
+
+
+@pytest.mark.parametrize("engine", ["match", "table", "threaded", "jit"])
+@pytest.mark.parametrize("program", [factorial(20), fibonacci(90)])
+def test_counter_overhead(engine, program):
+    """Test that always-on counters are at most a few percent of a run."""
+    vm = VirtualMachine(engine=engine, output=ListSink())
+    vm.run(program)
+    vm.reset()
+    total, counting = counted_opcodes(lambda: vm.run(program))
+    assert counting / (total - counting) < MAX_OVERHEAD
+
+
+def test_stats_cost_does_not_grow_with_runs():
+    """Test that stats() costs the same however long the program ran.
+
+    stats() is where the counting is paid for, rebuilding the execution
+    counts from a pass over the program, so it can cost as much as a short
+    run. It must not cost more for a longer one.
+    """
+    work = []
+    for program in (fibonacci(5), fibonacci(90)):
+        vm = VirtualMachine(output=ListSink())
+        vm.run(program)
+        work.append(counted_opcodes(vm.stats)[0])
+    short, long = work
+    assert len(fibonacci(5)) == len(fibonacci(90))
+    assert long <= short * (1 + MAX_OVERHEAD)
@@ -0,0 +1,101 @@
+import pytest
+from jit import TracingJIT
+from opcodes import Opcode
+from vm import VirtualMachine
+
+FACTORIAL = [
+    *(Opcode.PUSH.value, 10, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.MUL.value),
+    *(Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.GE.value, Opcode.JNZ.value, 8),
+    *(Opcode.LOAD.value, 1, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# Counter kept on the stack across iterations.
+STACK_LOOP = [
+    *(Opcode.PUSH.value, 0, Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.ADD.value, Opcode.DUP.value),
+    *(Opcode.PUSH.value, 8, Opcode.LT.value, Opcode.JNZ.value, 2),
+    *(Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# Prints the counter on every other iteration, so the inner JZ alternates.
+ALTERNATING = [
+    *(Opcode.PUSH.value, 6, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 0, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 1, Opcode.PUSH.value, 1, Opcode.SWAP.value),
+    *(Opcode.SUB.value, Opcode.DUP.value, Opcode.STORE.value, 1),
+    *(Opcode.JZ.value, 22, Opcode.LOAD.value, 0, Opcode.PRINT.value),
+    *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 0, Opcode.JNZ.value, 8),
+    Opcode.HALT.value,
+]
+
+
+@pytest.mark.parametrize("bytecode", [FACTORIAL, STACK_LOOP, ALTERNATING])
+@pytest.mark.parametrize("threshold", [1, 2, 5])
+def test_jit_matches_interpreter(bytecode, threshold, capsys):
+    """Test that traced loops give the same output, memory and stack."""
+    expected = VirtualMachine()
+    expected.run(bytecode)
+    expected_out = capsys.readouterr().out
+
+    vm = VirtualMachine(engine="jit", jit_threshold=threshold)
+    vm.run(bytecode)
+    assert capsys.readouterr().out == expected_out
+    assert vm._memory == expected._memory
+    assert vm._pc == expected._pc
+    assert repr(vm._stack) == repr(expected._stack)
+
+
+def test_hot_loop_is_traced(capsys):
+    """Test that the factorial loop header gets a compiled trace."""
+    vm = VirtualMachine()
+    jit = TracingJIT(vm, threshold=3)
+    jit.run(FACTORIAL)
+    assert list(jit.traces) == [8]
+    assert jit.counts[8] == 3
+    assert "s0 = s0 - 1" in jit.traces[8].source
+    assert capsys.readouterr().out == "3628800\n"
+
+
+def test_cold_loop_is_not_traced(capsys):
+    """Test that loops below the threshold stay interpreted."""
+    vm = VirtualMachine()
+    jit = TracingJIT(vm, threshold=100)
+    jit.run(FACTORIAL)
+    assert jit.traces == {}
+    assert jit.counts[8] == 9
+
+
+def test_stack_values_become_trace_locals(capsys):
+    """Test that a loop reading values below its entry depth loads them."""
+    vm = VirtualMachine()
+    jit = TracingJIT(vm, threshold=1)
+    jit.run(STACK_LOOP)
+    source = jit.traces[2].source
+    assert "s0, = items[-1:]" in source
+    assert "items.extend([s0])" in source
+
+
+def test_loop_leaving_through_halt_is_blacklisted():
+    """Test that a trace ending on HALT is abandoned and not retried."""
+    bytecode = [
+        *(Opcode.PUSH.value, 3, Opcode.PUSH.value, 1, Opcode.SUB.value),
+        *(Opcode.DUP.value, Opcode.JZ.value, 10, Opcode.JMP.value, 2),
+        Opcode.HALT.value,
+    ]
+    vm = VirtualMachine()
+    jit = TracingJIT(vm, threshold=2)
+    jit.run(bytecode)
+    assert jit.traces == {}
+    assert 2 in jit._blacklist
+
+
+def test_invalid_jit_threshold():
+    """Test that the compile threshold must be positive."""
+    with pytest.raises(ValueError):
+        VirtualMachine(engine="jit", jit_threshold=0)
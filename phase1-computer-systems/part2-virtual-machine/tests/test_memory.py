@@ -0,0 +1,103 @@
+import pytest
+from memory import MappedMemory, SparseMemory, dense
+from opcodes import Opcode
+from sinks import ListSink
+from vm import ENGINES, VirtualMachine, VirtualMachineError
+
+# Sums 1..4 into memory[2] using memory[1] as the counter.
+SUM = [
+    *(Opcode.PUSH.value, 4, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 2, Opcode.LOAD.value, 1, Opcode.ADD.value),
+    *(Opcode.STORE.value, 2),
+    *(Opcode.LOAD.value, 1, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 1, Opcode.JNZ.value, 4),
+    *(Opcode.LOAD.value, 2, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+
+@pytest.fixture(params=["dense", "mapped", "sparse"])
+def memory(request, tmp_path):
+    if request.param == "dense":
+        yield dense(8)
+    elif request.param == "mapped":
+        with MappedMemory(tmp_path / "memory.bin", 8) as mapped:
+            yield mapped.cells
+    else:
+        yield SparseMemory(8)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_program_runs_on_backend(memory, engine):
+    """Test that every engine loads and stores through each backend."""
+    vm = VirtualMachine(engine=engine, output=ListSink(), memory=memory)
+    vm.run(SUM)
+    assert vm.output.values == [10]
+    assert [memory[i] for i in range(3)] == [0, 0, 10]
+
+
+@pytest.mark.parametrize("options", [{"verify": True}, {"engine": "jit"}])
+def test_fast_paths_use_backend(memory, options):
+    """Test that the verified path and JIT traces write to the backend."""
+    vm = VirtualMachine(output=ListSink(), memory=memory, **options)
+    vm.run(SUM)
+    assert memory[2] == 10
+
+
+@pytest.mark.parametrize("address", [8, -1])
+def test_invalid_address(memory, address):
+    """Test that addresses outside the backend raise the usual error."""
+    with pytest.raises(VirtualMachineError, match="Invalid memory address"):
+        VirtualMachine(memory=memory).run([Opcode.LOAD.value, address, 0])
+    with pytest.raises(VirtualMachineError, match="Invalid memory address"):
+        VirtualMachine(memory=memory).run(
+            [Opcode.PUSH.value, 1, Opcode.STORE.value, address]
+        )
+
+
+def test_typed_backends_reject_values_over_64_bits():
+    """Test that int64 backends raise OverflowError instead of truncating."""
+    vm = VirtualMachine(memory=dense(1))
+    with pytest.raises(OverflowError):
+        vm.run([Opcode.PUSH.value, 1 << 70, Opcode.STORE.value, 0])
+
+
+def test_sparse_allocates_pages_on_write():
+    """Test that a huge sparse memory only allocates touched pages."""
+    memory = SparseMemory(1 << 40)
+    VirtualMachine(memory=memory).run(
+        [Opcode.PUSH.value, 5, Opcode.STORE.value, (1 << 40) - 1, 0]
+    )
+    vm = VirtualMachine(memory=memory)
+    vm.run([Opcode.LOAD.value, 123_456_789, Opcode.HALT.value])
+    assert memory.pages_allocated == 1
+    assert memory[(1 << 40) - 1] == 5
+    assert vm._stack.pop() == 0
+
+
+def test_mapped_memory_persists(tmp_path):
+    """Test that file-backed memory keeps its contents between mappings."""
+    path = tmp_path / "memory.bin"
+    with MappedMemory(path, 4) as mapped:
+        VirtualMachine(memory=mapped.cells).run(
+            [Opcode.PUSH.value, 42, Opcode.STORE.value, 3, Opcode.HALT.value]
+        )
+    with MappedMemory(path, 4) as mapped:
+        assert mapped.cells.tolist() == [0, 0, 0, 42]
+
+
+def test_numpy_array_through_memoryview():
+    """Test that a NumPy int64 array works as memory via memoryview."""
+    np = pytest.importorskip("numpy")
+    cells = np.zeros(8, dtype=np.int64)
+    vm = VirtualMachine(output=ListSink(), memory=memoryview(cells))
+    vm.run(SUM)
+    assert cells[2] == 10
+    assert type(vm.output.values[0]) is int
+
+
+def test_snapshot_of_backend_memory():
+    """Test that snapshots copy backend memory into shared pages."""
+    vm = VirtualMachine(memory=dense(4))
+    vm.run([Opcode.PUSH.value, 3, Opcode.STORE.value, 1], budget=2)
+    child = vm.fork()
+    assert child._memory == [0, 3, 0, 0]
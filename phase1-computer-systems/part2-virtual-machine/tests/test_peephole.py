@@ -0,0 +1,91 @@
+import pytest
+from opcodes import Opcode
+from peephole import decode_instructions, fuse, profile_sequences, trace
+from vm import ENGINES, VirtualMachine
+
+
+def factorial(n: int) -> list[int]:
+    """Factorial program from examples/demo.py."""
+    return [
+        *(Opcode.PUSH.value, n, Opcode.STORE.value, 0),
+        *(Opcode.PUSH.value, 1, Opcode.STORE.value, 1),
+        *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.MUL.value),
+        *(Opcode.STORE.value, 1),
+        *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+        *(Opcode.DUP.value, Opcode.STORE.value, 0),
+        *(Opcode.PUSH.value, 1, Opcode.GE.value, Opcode.JNZ.value, 8),
+        *(Opcode.LOAD.value, 1, Opcode.PRINT.value, Opcode.HALT.value),
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fused_factorial_matches(engine, capsys):
+    """Test that the fused program prints the same result on every engine."""
+    fused = fuse(factorial(6))
+    assert len(fused) < len(factorial(6))
+    vm = VirtualMachine(engine=engine)
+    vm.run(fused)
+    assert capsys.readouterr().out == "720\n"
+    assert vm._memory[1] == 720
+
+
+def test_fuse_remaps_jump_targets():
+    """Test that the loop jump points at the fused loop head."""
+    fused = fuse(factorial(5))
+    opcodes = [opcode for _, opcode, _ in decode_instructions(fused)]
+    assert opcodes == [
+        Opcode.PUSH,
+        Opcode.STORE,
+        Opcode.PUSH,
+        Opcode.STORE,
+        Opcode.LOAD_LOAD_MUL,
+        Opcode.STORE,
+        Opcode.LOAD,
+        Opcode.PUSH_SUB,
+        Opcode.DUP_STORE,
+        Opcode.PUSH_GE_JNZ,
+        Opcode.LOAD,
+        Opcode.PRINT,
+        Opcode.HALT,
+    ]
+    jump = decode_instructions(fused)[9]
+    assert jump[2] == [1, 8]
+
+
+def test_fuse_skips_sequences_with_jump_target_inside():
+    """Test that a sequence is left alone when a jump lands in its middle."""
+    bytecode = [
+        Opcode.PUSH.value,
+        2,
+        Opcode.JMP.value,
+        6,
+        Opcode.PUSH.value,
+        1,
+        Opcode.ADD.value,
+        Opcode.PRINT.value,
+        Opcode.HALT.value,
+    ]
+    # PUSH 1 ADD at 4..6 is not fused because JMP targets the ADD at 6.
+    assert fuse(bytecode) == bytecode
+
+
+def test_fuse_leaves_undecodable_programs():
+    """Test that unknown opcodes or mid-instruction jumps disable fusion."""
+    assert fuse([99, Opcode.HALT.value]) == [99, Opcode.HALT.value]
+    bytecode = [Opcode.JMP.value, 3, Opcode.PUSH.value, 0, Opcode.HALT.value]
+    assert fuse(bytecode) == bytecode
+
+
+def test_trace_records_executed_pcs():
+    """Test that trace lists every executed pc including HALT."""
+    bytecode = [Opcode.PUSH.value, 1, Opcode.PRINT.value, Opcode.HALT.value]
+    assert trace(bytecode) == [0, 2, 3]
+
+
+def test_profile_sequences_finds_loop_body():
+    """Test that the loop body sequences dominate the profile."""
+    counts = profile_sequences([factorial(10)], lengths=(3,))
+    assert counts[(Opcode.PUSH, Opcode.GE, Opcode.JNZ)] == 10
+    assert counts[(Opcode.LOAD, Opcode.LOAD, Opcode.MUL)] == 10
+    # Taken jumps break the window; only the final fall-through counts.
+    assert counts[(Opcode.GE, Opcode.JNZ, Opcode.LOAD)] == 1
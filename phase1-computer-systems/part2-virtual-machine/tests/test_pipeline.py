@@ -0,0 +1,62 @@
+import io
+import itertools
+
+import pytest
+from opcodes import Opcode
+from pipeline import run_pipeline, stream
+from sinks import BinaryIntSink, ListSink, read_ints
+from sources import BinaryIntSource
+
+# Prints every positive record doubled.
+FILTER = [
+    *(Opcode.EOF.value, Opcode.JNZ.value, 19),
+    *(Opcode.INPUT.value, Opcode.DUP.value, Opcode.PUSH.value, 0),
+    *(Opcode.GT.value, Opcode.JZ.value, 16),
+    *(Opcode.PUSH.value, 2, Opcode.MUL.value, Opcode.PRINT.value),
+    *(Opcode.JMP.value, 0),
+    *(Opcode.POP.value, Opcode.JMP.value, 0),
+    Opcode.HALT.value,
+]
+# Prints the sum of all input records.
+TOTAL = [
+    *(Opcode.PUSH.value, 0),
+    *(Opcode.EOF.value, Opcode.JNZ.value, 9),
+    *(Opcode.INPUT.value, Opcode.ADD.value, Opcode.JMP.value, 2),
+    *(Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+
+def test_stream_is_lazy():
+    """Test that stream works on an endless input."""
+    outputs = stream(FILTER, itertools.count(1), quantum=50)
+    assert list(itertools.islice(outputs, 5)) == [2, 4, 6, 8, 10]
+
+
+@pytest.mark.parametrize("engine", ["match", "threaded"])
+def test_pipeline_chains_programs(engine):
+    """Test that each stage reads the previous stage's output."""
+    sink = ListSink()
+    vm = run_pipeline(range(-3, 5), [FILTER, TOTAL], sink, engine=engine)
+    assert sink.values == [2 * (1 + 2 + 3 + 4)]
+    assert vm._stack.is_empty()
+
+
+def test_pipeline_binary_files():
+    """Test a pipeline from a binary reader to a binary sink."""
+    records = io.BytesIO()
+    sink = BinaryIntSink(records)
+    for value in range(1, 10_000):
+        sink.write(value if value % 2 else -value)
+    sink.flush()
+    records.seek(0)
+
+    output = io.BytesIO()
+    source = BinaryIntSource(records, buffer_size=256)
+    run_pipeline(source, [FILTER], BinaryIntSink(output, buffer_size=256))
+    assert read_ints(output.getvalue()) == [2 * v for v in range(1, 10_000, 2)]
+
+
+def test_pipeline_needs_a_program():
+    """Test that an empty pipeline is rejected."""
+    with pytest.raises(ValueError):
+        run_pipeline([], [], ListSink())
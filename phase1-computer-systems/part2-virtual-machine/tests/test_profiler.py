@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from opcodes import Opcode
+from vm import ENGINES, VirtualMachine
+
+# Counts 3 down to 1; the JNZ at pc 8 jumps back to pc 2 twice.
+COUNTDOWN = [
+    *(Opcode.PUSH.value, 3),
+    *(Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+    Opcode.HALT.value,
+]
+
+
+@pytest.fixture
+def profiled(capsys):
+    vm = VirtualMachine(profile=True)
+    vm.run(COUNTDOWN)
+    capsys.readouterr()
+    return vm.profiler
+
+
+def test_profiling_off_by_default():
+    """Test that a VM without profile=True has no profiler."""
+    assert VirtualMachine().profiler is None
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_profiled_run_matches_output(engine, capsys):
+    """Test that profiling does not change what a program prints."""
+    VirtualMachine(engine=engine, profile=True).run(COUNTDOWN)
+    assert capsys.readouterr().out == "3\n2\n1\n"
+
+
+def test_pc_and_opcode_counts(profiled):
+    """Test that counts are recorded per pc and per opcode."""
+    assert profiled.pc_counts[0] == 1
+    assert profiled.pc_counts[2] == 3
+    assert profiled.pc_counts[10] == 1
+    assert profiled.opcode_counts[Opcode.DUP] == 6
+    assert profiled.opcode_counts[Opcode.HALT] == 1
+    assert sum(profiled.opcode_counts.values()) == sum(profiled.pc_counts.values())
+
+
+def test_times_are_recorded(profiled):
+    """Test that per-pc times add up to per-opcode times."""
+    assert profiled.pc_times[2] > 0
+    assert sum(profiled.pc_times.values()) == sum(profiled.opcode_times.values())
+
+
+def test_loop_iterations(profiled):
+    """Test that taken backward jumps are counted per jump."""
+    assert profiled.loop_iterations == {(8, 2): 2}
+
+
+def test_max_stack_depth(profiled):
+    """Test that the deepest stack seen is recorded."""
+    assert profiled.max_stack_depth == 2
+
+
+def test_report_lines_up_with_disassembly(profiled):
+    """Test that the report annotates every disassembled line."""
+    report = profiled.report(COUNTDOWN, hot=1)
+    assert "0008: JNZ 2" in report
+    assert report.count("<<") == 1
+    assert "loop 0008 -> 0002: 2 iterations" in report
+    assert "max stack depth: 2" in report
+
+
+def test_json_export(profiled):
+    """Test that the JSON export holds counts, loops and depth."""
+    data = json.loads(profiled.to_json())
+    assert data["opcodes"]["DUP"]["count"] == 6
+    assert data["pcs"]["2"]["count"] == 3
+    assert data["loops"] == [{"jump": 8, "target": 2, "iterations": 2}]
+    assert data["max_stack_depth"] == 2
+
+
+def test_collapsed_export(profiled):
+    """Test that the collapsed-stack export has one line per executed pc."""
+    lines = profiled.collapsed(COUNTDOWN).splitlines()
+    assert lines[0].startswith("program;PUSH@0000 ")
+    assert len(lines) == len(profiled.pc_times)
+
+
+def test_results_accumulate_until_reset(profiled, capsys):
+    """Test that a second run adds to the counts and reset clears them."""
+    vm = VirtualMachine(profile=True)
+    vm.profiler = profiled
+    vm.run(COUNTDOWN)
+    assert profiled.pc_counts[2] == 6
+    profiled.reset()
+    assert not profiled.pc_counts
+    assert profiled.max_stack_depth == 0
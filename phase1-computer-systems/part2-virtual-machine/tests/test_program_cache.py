@@ -0,0 +1,102 @@
+import threading
+import tracemalloc
+
+from bytecode_file import dumps, loads
+from opcodes import Opcode
+from program_cache import program_cache
+from threaded import decode
+
+PROGRAM = [Opcode.PUSH.value, 1, Opcode.PRINT.value, Opcode.HALT.value]
+
+
+def counted():
+    """A cached function that records the code it was called with."""
+    calls = []
+
+    @program_cache(maxsize=4)
+    def function(code, memory_size):
+        calls.append(code)
+        return len(code) + memory_size
+
+    return function, calls
+
+
+def test_same_program_hits_without_copying():
+    """Test that a program seen before is found without hashing its content."""
+    function, calls = counted()
+    program = PROGRAM + [0] * (1 << 16)
+    assert function(program, 1) == len(program) + 1
+    tracemalloc.start()
+    for _ in range(3):
+        function(program, 1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < len(program)
+    assert function.cache_info().hits == 0
+    assert len(calls) == 1
+
+
+def test_equal_programs_share_a_result():
+    """Test that equal programs still share one result, keyed by content."""
+    function, calls = counted()
+    function(list(PROGRAM), 0)
+    function(tuple(PROGRAM), 0)
+    assert function.cache_info().hits == 1
+    assert calls == [tuple(PROGRAM)]
+
+
+def test_program_changed_in_place_is_recomputed():
+    """Test that a list changed since it was cached is looked up again."""
+    function, calls = counted()
+    program = list(PROGRAM)
+    function(program, 0)
+    program.append(Opcode.HALT.value)
+    assert function(program, 0) == len(PROGRAM) + 1
+    assert calls == [tuple(PROGRAM), tuple(program)]
+
+
+def test_image_is_not_copied_again():
+    """Test that a memoryview image is only copied the first time."""
+    function, calls = counted()
+    with loads(dumps(PROGRAM)) as image:
+        for _ in range(3):
+            function(image.code, 0)
+    assert len(calls) == 1
+    assert function.cache_info().misses == 1
+
+
+def test_oldest_identity_is_evicted():
+    """Test that at most maxsize programs are held by identity."""
+    function, calls = counted()
+    programs = [[Opcode.PUSH.value, n, Opcode.HALT.value] for n in range(6)]
+    for program in programs:
+        function(program, 0)
+    function(programs[-1], 0)
+    assert len(calls) == 6
+    function(programs[0], 0)
+    assert len(calls) == 7
+
+
+def test_concurrent_lookups():
+    """Test that threads looking up the same programs agree."""
+    results = []
+
+    def worker():
+        for _ in range(200):
+            results.append(decode(PROGRAM))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(result == results[0] for result in results)
+
+
+def test_image_slots_hold_tuples():
+    """Test that decoding an image gives tuple operands, not views into it."""
+    program = [Opcode.LOAD_LOAD_ADD.value, 0, 1, Opcode.HALT.value]
+    with loads(dumps(program)) as image:
+        slots = decode(image.code)
+    assert slots[0][1] == (0, 1)
+    assert isinstance(slots[0][1], tuple)
@@ -0,0 +1,130 @@
+import pytest
+from opcodes import Opcode
+from peephole import fuse, trace
+from register_vm import RegisterVM, format_registers, to_registers
+from sinks import ListSink
+from translator import TranslationError
+from vm import VirtualMachine
+
+FACTORIAL = [
+    *(Opcode.PUSH.value, 6, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.MUL.value),
+    *(Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.GE.value, Opcode.JNZ.value, 8),
+    *(Opcode.LOAD.value, 1, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+STACK_LOOP = [
+    *(Opcode.PUSH.value, 0, Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.ADD.value, Opcode.DUP.value),
+    *(Opcode.PUSH.value, 3, Opcode.LT.value, Opcode.JNZ.value, 2),
+    *(Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# (3 + 4) - (1 + 2) with the operands swapped in registers.
+REGISTER_SWAP = [
+    *(Opcode.PUSH.value, 1, Opcode.PUSH.value, 2, Opcode.ADD.value),
+    *(Opcode.PUSH.value, 3, Opcode.PUSH.value, 4, Opcode.ADD.value),
+    *(Opcode.SWAP.value, Opcode.SUB.value, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# Swap memory[0] and memory[1] through the stack.
+MEMORY_SWAP = [
+    *(Opcode.PUSH.value, 5, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 9, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.SWAP.value),
+    *(Opcode.STORE.value, 1, Opcode.STORE.value, 0),
+    *(Opcode.LOAD.value, 0, Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 2, Opcode.DIV.value, Opcode.HALT.value),
+]
+
+PROGRAMS = [FACTORIAL, fuse(FACTORIAL), STACK_LOOP, REGISTER_SWAP, MEMORY_SWAP]
+
+
+@pytest.mark.parametrize("bytecode", PROGRAMS)
+def test_register_vm_matches_stack_vm(bytecode, capsys):
+    """Test that output, memory and leftover stack match VirtualMachine."""
+    expected = VirtualMachine()
+    expected.run(bytecode)
+    expected_out = capsys.readouterr().out
+
+    vm = RegisterVM()
+    vm.run(bytecode)
+    assert capsys.readouterr().out == expected_out
+    assert vm._memory == expected._memory
+    assert repr(vm._stack) == repr(expected._stack._items)
+
+
+def test_register_form_listing():
+    """Test that operands fold into three-address instructions."""
+    listing = format_registers(to_registers(FACTORIAL))
+    assert "MUL m[0], m[1] -> r0" in listing
+    assert "SUB m[0], #1 -> r0" in listing
+    assert "BGE r0, #1 -> 0002" in listing
+
+
+def test_register_vm_cuts_dispatches(capsys):
+    """Test that the loop needs far fewer dispatches than the stack VM."""
+    vm = RegisterVM()
+    vm.run(FACTORIAL)
+    assert vm.dispatches * 2 < len(trace(FACTORIAL))
+
+
+# Stack depth 1 or 2 at the PRINT, depending on the branch.
+UNSTRUCTURED = [
+    *(Opcode.PUSH.value, 1, Opcode.PUSH.value, 0, Opcode.JZ.value, 8),
+    *(Opcode.PUSH.value, 5, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+# Reads two values, adds them and copies the sum from cell 0 to cell 1.
+STREAMING = [
+    *(Opcode.INPUT.value, Opcode.INPUT.value, Opcode.ADD.value),
+    *(Opcode.STORE.value, 0, Opcode.MEMCPY.value, 1, 0, 1),
+    *(Opcode.EOF.value, Opcode.HALT.value),
+]
+
+
+def test_register_vm_rejects_unstructured_programs():
+    """Test that inconsistent stack depths cannot be translated."""
+    with pytest.raises(TranslationError):
+        to_registers(UNSTRUCTURED)
+
+
+@pytest.mark.parametrize("bytecode", [UNSTRUCTURED, STREAMING])
+def test_register_vm_falls_back_to_stack_vm(bytecode):
+    """Test that untranslatable programs run on the stack VM instead."""
+    expected = VirtualMachine(output=ListSink(), input=[3, 4])
+    expected.run(bytecode)
+
+    vm = RegisterVM(output=ListSink(), input=[3, 4])
+    assert vm.run(bytecode) is False
+    assert vm.output.values == expected.output.values
+    assert vm._memory == expected._memory
+    assert vm._stack == expected._stack._items
+    assert vm.dispatches == expected.stats().instructions
+
+
+def test_register_vm_writes_memory_in_place():
+    """Test that runs use the VM's memory list rather than copies of it."""
+    vm = RegisterVM(memory_size=4, output=ListSink(), input=[1, 2])
+    memory = vm._memory
+    assert vm.run(FACTORIAL) is True
+    assert vm._memory is memory
+    assert memory == [0, 720, 0, 0]
+    vm.run(STREAMING)
+    assert vm._memory is memory
+    assert memory == [3, 3, 0, 0]
+
+
+def test_register_vm_division_by_zero_keeps_memory():
+    """Test that memory written before an error is kept."""
+    bytecode = [Opcode.PUSH.value, 7, Opcode.STORE.value, 0]
+    bytecode += [Opcode.LOAD.value, 0, Opcode.PUSH.value, 0, Opcode.DIV.value]
+    bytecode += [Opcode.HALT.value]
+    vm = RegisterVM()
+    with pytest.raises(ZeroDivisionError):
+        vm.run(bytecode)
+    assert vm._memory[0] == 7
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from opcodes import Opcode
+from scheduler import Scheduler
+from sinks import ListSink
+from stack import EmptyStackError
+
+
+def countdown(n):
+    """Bytecode that prints n down to 1."""
+    return [
+        *(Opcode.PUSH.value, n),
+        *(Opcode.DUP.value, Opcode.PRINT.value),
+        *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+        *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+        Opcode.HALT.value,
+    ]
+
+
+def test_runs_every_program_to_completion():
+    """Test that all spawned programs halt with their own output."""
+    scheduler = Scheduler(quantum=5)
+    tasks = [scheduler.spawn(countdown(n), output=ListSink()) for n in (3, 10, 1)]
+    asyncio.run(scheduler.run())
+    assert [task.status for task in tasks] == ["halted"] * 3
+    assert tasks[1].vm.output.values == list(range(10, 0, -1))
+    assert all(task.cpu_time >= 0 for task in tasks)
+    assert tasks[1].slices > tasks[2].slices
+
+
+def test_slices_interleave_fairly():
+    """Test that equal-priority programs take turns."""
+    scheduler = Scheduler(quantum=6)
+    sink = ListSink()
+    scheduler.spawn(countdown(4), output=sink)
+    scheduler.spawn(countdown(104), output=sink)
+    asyncio.run(scheduler.run())
+    # One iteration is 6 instructions, so the programs alternate values.
+    assert sink.values[:6] == [4, 104, 3, 103, 2, 102]
+
+
+def test_priority_gets_proportional_steps():
+    """Test that a priority 3 program runs three times the steps."""
+    scheduler = Scheduler(quantum=6)
+    low, high = ListSink(), ListSink()
+    scheduler.spawn(countdown(1000), output=low)
+    scheduler.spawn(countdown(1000), priority=3, output=high)
+
+    async def main():
+        runner = asyncio.create_task(scheduler.run())
+        for _ in range(40):
+            await asyncio.sleep(0)
+        runner.cancel()
+
+    asyncio.run(main())
+    assert len(high.values) == pytest.approx(3 * len(low.values), abs=2)
+
+
+def test_other_coroutines_keep_running():
+    """Test that the scheduler yields to the event loop between slices."""
+    scheduler = Scheduler(quantum=10)
+    scheduler.spawn(countdown(500), output=ListSink())
+    ticks = []
+
+    async def ticker():
+        while len(ticks) < 5:
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(scheduler.run(), ticker())
+
+    asyncio.run(main())
+    assert len(ticks) == 5
+
+
+def test_failed_program_is_reported():
+    """Test that an error fails only that program and wait re-raises it."""
+    scheduler = Scheduler()
+    bad = scheduler.spawn([Opcode.POP.value, Opcode.HALT.value])
+    good = scheduler.spawn(countdown(2), output=ListSink())
+
+    async def main():
+        await scheduler.run()
+        with pytest.raises(EmptyStackError):
+            await bad.wait()
+        return await good.wait()
+
+    vm = asyncio.run(main())
+    assert bad.status == "failed"
+    assert vm.output.values == [2, 1]
+
+
+def test_report_lists_accounting():
+    """Test that the report has a line per program."""
+    scheduler = Scheduler()
+    scheduler.spawn(countdown(2), name="two", output=ListSink())
+    asyncio.run(scheduler.run())
+    report = scheduler.report()
+    assert "two" in report and "halted" in report
+
+
+def test_invalid_settings():
+    """Test that quantum and priority must be positive."""
+    with pytest.raises(ValueError):
+        Scheduler(quantum=0)
+    with pytest.raises(ValueError):
+        Scheduler().spawn(countdown(1), priority=0)
@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from opcodes import Opcode
+from register_vm import RegisterVM
+from sinks import BinaryIntSink, BufferedTextSink, ListSink, read_ints
+from translator import run as run_translated
+from vm import ENGINES, VirtualMachine, VirtualMachineError
+
+# Prints 3, 2, 1.
+COUNTDOWN = [
+    *(Opcode.PUSH.value, 3),
+    *(Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+    Opcode.HALT.value,
+]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_list_sink_collects_values(engine, capsys):
+    """Test that every engine sends PRINT to the sink, not stdout."""
+    sink = ListSink()
+    VirtualMachine(engine=engine, output=sink).run(COUNTDOWN)
+    assert sink.values == [3, 2, 1]
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"verify": True}, {"profile": True}, {"engine": "jit", "jit_threshold": 1}],
+)
+def test_list_sink_with_vm_modes(options):
+    """Test that the verified, profiled and traced paths use the sink."""
+    sink = ListSink()
+    VirtualMachine(output=sink, **options).run(COUNTDOWN)
+    assert sink.values == [3, 2, 1]
+
+
+def test_translated_and_register_backends_use_sink():
+    """Test that translated code and the register VM use the sink."""
+    sink = ListSink()
+    assert run_translated(VirtualMachine(output=sink), COUNTDOWN)
+    assert sink.values == [3, 2, 1]
+    sink = ListSink()
+    RegisterVM(output=sink).run(COUNTDOWN)
+    assert sink.values == [3, 2, 1]
+
+
+def test_buffered_text_flushes_on_halt():
+    """Test that buffered text is written when the program halts."""
+    stream = io.StringIO()
+    VirtualMachine(output=BufferedTextSink(stream)).run(COUNTDOWN)
+    assert stream.getvalue() == "3\n2\n1\n"
+
+
+def test_buffered_text_holds_values_until_full():
+    """Test that values are written in batches of buffer_size."""
+    stream = io.StringIO()
+    sink = BufferedTextSink(stream, buffer_size=2)
+    for value in (1, 2, 3):
+        sink.write(value)
+    assert stream.getvalue() == "1\n2\n"
+    sink.flush()
+    assert stream.getvalue() == "1\n2\n3\n"
+
+
+def test_buffered_text_defaults_to_stdout(capsys):
+    """Test that a sink without a stream writes to sys.stdout."""
+    VirtualMachine(output=BufferedTextSink()).run(COUNTDOWN)
+    assert capsys.readouterr().out == "3\n2\n1\n"
+
+
+def test_output_flushed_when_run_fails():
+    """Test that values printed before an error are not lost."""
+    stream = io.StringIO()
+    vm = VirtualMachine(memory_size=1, output=BufferedTextSink(stream))
+    with pytest.raises(VirtualMachineError):
+        vm.run([Opcode.PUSH.value, 7, Opcode.PRINT.value, Opcode.LOAD.value, 5])
+    assert stream.getvalue() == "7\n"
+
+
+def test_binary_sink_round_trip():
+    """Test that packed integers decode back to the printed values."""
+    stream = io.BytesIO()
+    program = [
+        *(Opcode.PUSH.value, -5, Opcode.PRINT.value),
+        *(Opcode.PUSH.value, 1 << 40, Opcode.PRINT.value),
+        Opcode.HALT.value,
+    ]
+    VirtualMachine(output=BinaryIntSink(stream)).run(program)
+    assert len(stream.getvalue()) == 16
+    assert read_ints(stream.getvalue()) == [-5, 1 << 40]
+
+
+def test_buffer_size_must_be_positive():
+    """Test that an empty buffer size is rejected."""
+    with pytest.raises(ValueError):
+        BufferedTextSink(buffer_size=0)
+    with pytest.raises(ValueError):
+        BinaryIntSink(io.BytesIO(), buffer_size=0)
@@ -0,0 +1,217 @@
+import tracemalloc
+
+import pytest
+from bytecode_file import BytecodeFileError, dump
+from memory import MappedMemory, SparseMemory, dense
+from opcodes import Opcode
+from sinks import ListSink
+from snapshot import PAGE_SIZE, CowMemory, load, save, spawn
+from vm import ENGINES, VirtualMachine, VirtualMachineError
+
+# Stores 5 in memory[0], then counts it down, printing each value.
+COUNTDOWN = [
+    *(Opcode.PUSH.value, 5, Opcode.STORE.value, 0),
+    *(Opcode.LOAD.value, 0, Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 0),
+    *(Opcode.JNZ.value, 4),
+    Opcode.HALT.value,
+]
+
+
+def paused(budget=2, **options):
+    """A VM paused after storing 5, before the loop."""
+    vm = VirtualMachine(output=ListSink(), **options)
+    vm.run(COUNTDOWN, budget=budget)
+    return vm
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_restore_replays_continuation(engine):
+    """Test that restoring a snapshot replays the same continuation."""
+    vm = paused(engine=engine)
+    snapshot = vm.snapshot()
+    vm.run(COUNTDOWN)
+    first = list(vm.output.values)
+
+    vm.output.values.clear()
+    vm.restore(snapshot)
+    vm.run(COUNTDOWN)
+    assert vm.output.values == first == [5, 4, 3, 2, 1]
+    assert vm._memory == [0] * 256
+
+
+def test_snapshot_captures_pc_stack_and_memory():
+    """Test that a snapshot records the full VM state."""
+    vm = VirtualMachine(memory_size=4)
+    vm.run([Opcode.PUSH.value, 9, Opcode.STORE.value, 2, Opcode.PUSH.value, 7], 3)
+    snapshot = vm.snapshot()
+    assert snapshot.pc == 6
+    assert snapshot.stack == (7,)
+    assert snapshot.memory() == [0, 0, 9, 0]
+
+
+def test_fork_is_isolated():
+    """Test that writes in a child are invisible to parent and siblings."""
+    parent = paused()
+    first = parent.fork(output=ListSink())
+    second = parent.fork(output=ListSink())
+    first.run(COUNTDOWN)
+    assert first._memory[0] == 0
+    assert parent._memory[0] == 5
+    assert second._memory[0] == 5
+    second.run(COUNTDOWN)
+    assert first.output.values == second.output.values == [5, 4, 3, 2, 1]
+    assert parent.output.values == []
+
+
+def test_fork_copies_only_written_pages():
+    """Test that a child copies just the pages it writes to."""
+    parent = VirtualMachine(memory_size=PAGE_SIZE * 100)
+    child = parent.fork()
+    child.run([Opcode.PUSH.value, 1, Opcode.STORE.value, PAGE_SIZE * 50, 0])
+    assert child._memory.copied_pages() == 1
+    assert child._memory[PAGE_SIZE * 50] == 1
+    assert parent._memory[PAGE_SIZE * 50] == 0
+
+
+def test_fork_inherits_settings():
+    """Test that a child keeps the parent's engine unless overridden."""
+    parent = VirtualMachine(engine="threaded")
+    assert parent.fork()._engine == "threaded"
+    assert parent.fork(engine="table")._engine == "table"
+
+
+def test_many_children_from_one_snapshot():
+    """Test that spawn builds independent VMs from one snapshot."""
+    snapshot = paused().snapshot()
+    children = [spawn(snapshot, output=ListSink()) for _ in range(100)]
+    for child in children[:3]:
+        child.run(COUNTDOWN)
+    assert children[0].output.values == children[2].output.values == [5, 4, 3, 2, 1]
+    assert children[3]._memory[0] == 5
+
+
+def test_invalid_address_on_cow_memory():
+    """Test that copy-on-write memory keeps the invalid-address errors."""
+    vm = VirtualMachine(memory_size=4).fork()
+    with pytest.raises(VirtualMachineError, match="Invalid memory address"):
+        vm.run([Opcode.LOAD.value, 4, Opcode.HALT.value])
+    with pytest.raises(IndexError):
+        vm._memory[4] = 1
+
+
+def test_save_and_load(tmp_path):
+    """Test that a snapshot survives a round trip through a file."""
+    vm = paused()
+    vm._stack.push(1 << 70)
+    path = tmp_path / "checkpoint.vmss"
+    save(vm.snapshot(), path)
+    vm._stack.pop()
+
+    restored = spawn(load(path), output=ListSink())
+    assert restored._pc == vm._pc
+    assert restored._stack._items == [*vm._stack._items, 1 << 70]
+    assert restored._memory == vm._memory
+
+
+def test_load_rejects_plain_bytecode(tmp_path):
+    """Test that a bytecode file without snapshot symbols is rejected."""
+    path = tmp_path / "program.vmbc"
+    dump(COUNTDOWN, path)
+    with pytest.raises(BytecodeFileError):
+        load(path)
+
+
+def test_cow_memory_slices_and_equality():
+    """Test list-like reads on copy-on-write memory."""
+    memory = CowMemory.from_list(list(range(PAGE_SIZE + 3)))
+    assert len(memory) == PAGE_SIZE + 3
+    assert memory[PAGE_SIZE + 1] == PAGE_SIZE + 1
+    assert memory[-2:] == [PAGE_SIZE + 1, PAGE_SIZE + 2]
+    assert memory == list(range(PAGE_SIZE + 3))
+
+
+def test_fork_keeps_typed_memory():
+    """Test that int64 memory stays int64, with its overflow check."""
+    memory = dense(4)
+    parent = paused(memory=memory)
+    child = parent.fork()
+    assert parent._memory is memory
+    for vm in (parent, child):
+        assert list(vm._memory) == [5, 0, 0, 0]
+        vm.reset()
+        with pytest.raises(OverflowError):
+            vm.run([Opcode.PUSH.value, 1 << 70, Opcode.STORE.value, 1])
+
+
+def test_fork_keeps_sparse_memory_sparse():
+    """Test that only the pages sparse memory allocated are copied."""
+    size = 1 << 26
+    memory = SparseMemory(size)
+    parent = paused(memory=memory)
+    tracemalloc.start()
+    child = parent.fork()
+    child.run([Opcode.PUSH.value, 7, Opcode.STORE.value, size - 1, 0])
+    child.reset()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < size // 100
+    assert parent._memory is memory
+    assert memory[0] == 5 and memory[size - 1] == 0
+    assert child._memory.copied_pages() == 0
+
+
+@pytest.mark.parametrize("kind", ["list", "dense", "sparse", "mapped"])
+def test_snapshot_keeps_caller_memory(kind, tmp_path):
+    """Test that memory passed in stays live, and restores are written into it."""
+    with MappedMemory(tmp_path / "memory.bin", 4) as mapped:
+        memory = {
+            "list": [0] * 4,
+            "dense": dense(4),
+            "sparse": SparseMemory(4),
+            "mapped": mapped.cells,
+        }[kind]
+        vm = paused(memory=memory)
+        snapshot = vm.snapshot()
+        vm.fork()
+        vm.run(COUNTDOWN)
+        assert vm._memory is memory
+        assert memory[0] == 0
+        assert snapshot.memory() == [5, 0, 0, 0]
+
+        vm.restore(snapshot)
+        assert vm._memory is memory
+        assert list(memory[:4]) == [5, 0, 0, 0]
+        vm.run(COUNTDOWN)
+        assert vm.output.values == [5, 4, 3, 2, 1] * 2
+        assert memory[0] == 0
+
+
+def test_restore_checks_caller_memory_size():
+    """Test that a snapshot only restores into memory of its own size."""
+    snapshot = paused().snapshot()
+    vm = VirtualMachine(memory=dense(4))
+    with pytest.raises(ValueError, match="256 cells"):
+        vm.restore(snapshot)
+
+
+def test_save_sparse_memory_sparsely(tmp_path):
+    """Test that a saved snapshot holds only nonzero pages, typecode kept."""
+    size = 1 << 30
+    vm = paused(memory=SparseMemory(size))
+    vm._memory[size - 1] = 7
+    path = tmp_path / "checkpoint.vmss"
+    save(vm.snapshot(), path)
+    assert path.stat().st_size < 4 * PAGE_SIZE * 8
+    snapshot = load(path)
+    assert snapshot.memory()[size - 1] == 7
+    assert snapshot.memory()[0] == 5
+
+    typed = paused(memory=dense(4))
+    save(typed.snapshot(), path)
+    child = spawn(load(path), output=ListSink())
+    assert list(child._memory) == [5, 0, 0, 0]
+    child.reset()
+    with pytest.raises(OverflowError):
+        child.run([Opcode.PUSH.value, 1 << 70, Opcode.STORE.value, 1])
@@ -0,0 +1,117 @@
+import io
+
+import pytest
+from opcodes import Opcode
+from sinks import BinaryIntSink, ListSink
+from sources import BinaryIntSource, IteratorSource
+from translator import run as run_translated
+from vm import ENGINES, VirtualMachine
+
+# Prints every positive record doubled; memory[0] counts the records read.
+FILTER = [
+    *(Opcode.EOF.value, Opcode.JNZ.value, 26),
+    *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.ADD.value),
+    *(Opcode.STORE.value, 0),
+    *(Opcode.INPUT.value, Opcode.DUP.value, Opcode.PUSH.value, 0),
+    *(Opcode.GT.value, Opcode.JZ.value, 23),
+    *(Opcode.PUSH.value, 2, Opcode.MUL.value, Opcode.PRINT.value),
+    *(Opcode.JMP.value, 0),
+    *(Opcode.POP.value, Opcode.JMP.value, 0),
+    Opcode.HALT.value,
+]
+
+RECORDS = [3, -1, 4, 0, 5]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_filter_on_every_engine(engine):
+    """Test that every engine reads records until EOF."""
+    vm = VirtualMachine(engine=engine, input=RECORDS, output=ListSink())
+    vm.run(FILTER)
+    assert vm.output.values == [6, 8, 10]
+    assert vm._memory[0] == 5
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"verify": True}, {"profile": True}, {"engine": "jit", "jit_threshold": 1}],
+)
+def test_filter_on_fast_paths(options):
+    """Test INPUT and EOF on the verified, profiled and traced paths."""
+    vm = VirtualMachine(input=iter(RECORDS), output=ListSink(), **options)
+    vm.run(FILTER)
+    assert vm.output.values == [6, 8, 10]
+
+
+def test_translated_filter():
+    """Test that translated programs read from the VM's input."""
+    vm = VirtualMachine(input=RECORDS, output=ListSink())
+    assert run_translated(vm, FILTER)
+    assert vm.output.values == [6, 8, 10]
+
+
+def test_input_past_end_raises():
+    """Test that INPUT with no values left raises EOFError."""
+    vm = VirtualMachine()
+    with pytest.raises(EOFError):
+        vm.run([Opcode.INPUT.value, Opcode.HALT.value])
+
+
+def test_input_is_read_lazily():
+    """Test that only the values the program asks for are consumed."""
+    consumed = []
+
+    def values():
+        for value in range(100):
+            consumed.append(value)
+            yield value
+
+    vm = VirtualMachine(input=values())
+    vm.run([Opcode.INPUT.value, Opcode.INPUT.value, Opcode.ADD.value, 0])
+    assert consumed == [0, 1]
+    assert vm._stack.pop() == 1
+
+
+def test_state_carries_across_budgeted_runs():
+    """Test that a paused filter resumes mid-stream with its state."""
+    vm = VirtualMachine(input=RECORDS, output=ListSink())
+    state = vm.run(FILTER, budget=20)
+    assert not state.halted
+    while not state.halted:
+        state = state.resume(7)
+    assert vm.output.values == [6, 8, 10]
+    assert vm._memory[0] == 5
+
+
+def test_iterator_source_at_end_looks_ahead():
+    """Test that at_end does not lose the value it looks ahead at."""
+    source = IteratorSource([7])
+    assert not source.at_end()
+    assert not source.at_end()
+    assert source.read() == 7
+    assert source.at_end()
+    with pytest.raises(EOFError):
+        source.read()
+
+
+def test_binary_source_reads_sink_output():
+    """Test that BinaryIntSource reads BinaryIntSink's format in chunks."""
+    data = io.BytesIO()
+    sink = BinaryIntSink(data)
+    for value in range(-5, 5):
+        sink.write(value * 1_000_000_007)
+    sink.flush()
+    data.seek(0)
+
+    source = BinaryIntSource(data, buffer_size=3)
+    values = []
+    while not source.at_end():
+        values.append(source.read())
+    assert values == [value * 1_000_000_007 for value in range(-5, 5)]
+
+
+def test_binary_source_rejects_partial_record():
+    """Test that a truncated stream raises instead of dropping bytes."""
+    source = BinaryIntSource(io.BytesIO(bytes(12)))
+    with pytest.raises(ValueError, match="partial record"):
+        source.read()
@@ -1,5 +1,7 @@
+import operator
+
 import pytest
-from stack import EmptyStackError, Stack
+from stack import ArrayStack, EmptyStackError, Stack, StackOverflowError
 
 
 def test_push():
@@ -108,3 +110,95 @@ def test_repr():
     assert repr(stack) == "Stack([1])"
     stack.pop()
     assert repr(stack) == "Stack([])"
+
+
+@pytest.fixture(params=[Stack, ArrayStack])
+def any_stack(request):
+    """Fixture for both stack implementations, holding 1, 2, 3."""
+    stack = request.param()
+    for value in (1, 2, 3):
+        stack.push(value)
+    return stack
+
+
+def test_pop2(any_stack):
+    """Test that pop2 returns the top two items as (second, top)."""
+    assert any_stack.pop2() == (2, 3)
+    assert any_stack.size() == 1
+
+
+def test_popn(any_stack):
+    """Test that popn returns the top k items bottom first."""
+    assert any_stack.popn(2) == [2, 3]
+    assert any_stack.popn(0) == []
+    assert list(any_stack) == [1]
+
+
+def test_binop(any_stack):
+    """Test that binop replaces the top two items with fn(second, top)."""
+    any_stack.binop(operator.sub)
+    assert list(any_stack) == [1, -1]
+
+
+def test_binop_leaves_stack_unchanged_on_error(any_stack):
+    """Test that a failing binop does not consume its operands."""
+    any_stack.push(0)
+    with pytest.raises(ZeroDivisionError):
+        any_stack.binop(operator.truediv)
+    assert list(any_stack) == [1, 2, 3, 0]
+
+
+def test_bulk_operations_underflow(any_stack):
+    """Test that bulk pops raise EmptyStackError without popping anything."""
+    with pytest.raises(EmptyStackError):
+        any_stack.popn(4)
+    any_stack.popn(2)
+    with pytest.raises(EmptyStackError):
+        any_stack.pop2()
+    with pytest.raises(EmptyStackError):
+        any_stack.binop(operator.add)
+    assert any_stack.size() == 1
+
+
+def test_extend_and_clear(any_stack):
+    """Test pushing many values at once and clearing the stack."""
+    any_stack.extend([4, 5])
+    assert any_stack.peek() == 5
+    assert any_stack.size() == 5
+    any_stack.clear()
+    assert any_stack.is_empty()
+
+
+def test_array_stack_overflow():
+    """Test that pushing past the capacity raises StackOverflowError."""
+    stack = ArrayStack(capacity=2)
+    stack.push(1)
+    stack.push(2)
+    with pytest.raises(StackOverflowError):
+        stack.push(3)
+    assert stack.size() == 2
+    assert stack.capacity == 2
+
+
+def test_array_stack_reuses_storage():
+    """Test that clearing keeps the preallocated storage."""
+    stack = ArrayStack(capacity=4)
+    data = stack._data
+    stack.extend([1, 2, 3, 4])
+    stack.clear()
+    stack.extend([5, 6, 7, 8])
+    assert stack._data is data and len(data) == 4
+
+
+def test_array_stack_rejects_other_types():
+    """Test that values the typed storage cannot hold are rejected."""
+    stack = ArrayStack()
+    with pytest.raises(TypeError):
+        stack.push("x")
+    assert stack.is_empty()
+
+
+def test_array_stack_capacity_must_be_positive():
+    """Test that a stack needs room for at least one item."""
+    with pytest.raises(ValueError):
+        ArrayStack(capacity=0)
@@ -0,0 +1,47 @@
+import pytest
+from opcodes import Opcode
+from threaded import _decode, decode
+from vm import VirtualMachine, VirtualMachineError
+
+
+def test_decode_slots():
+    """Test that each pc gets a handler, operand and next pc."""
+    bytecode = [Opcode.PUSH.value, 42, Opcode.PRINT.value, Opcode.HALT.value]
+    program = decode(bytecode)
+    assert len(program) == len(bytecode)
+    assert program[0][1:] == (42, 2)
+    assert program[2][1:] == (None, 3)
+    assert program[3][0] is None
+
+
+def test_decode_is_cached_by_content():
+    """Test that equal bytecode lists share one decoded program."""
+    _decode.cache_clear()
+    first = decode([Opcode.PUSH.value, 1, Opcode.HALT.value])
+    second = decode([Opcode.PUSH.value, 1, Opcode.HALT.value])
+    assert first is second
+    assert _decode.cache_info().hits == 1
+    assert _decode.cache_info().misses == 1
+
+
+def test_threaded_leaves_pc_at_halt():
+    """Test that the threaded engine stops with pc on HALT like the match loop."""
+    bytecode = [Opcode.PUSH.value, 1, Opcode.POP.value, Opcode.HALT.value]
+    vm = VirtualMachine(engine="threaded")
+    vm.run(bytecode)
+    assert vm._pc == 3
+
+
+def test_threaded_invalid_opcode_message():
+    """Test that invalid opcodes report their pc only when reached."""
+    bytecode = [Opcode.JMP.value, 3, 99, Opcode.HALT.value]
+    VirtualMachine(engine="threaded").run(bytecode)
+
+    with pytest.raises(VirtualMachineError, match="Invalid opcode at pc 2: 99"):
+        VirtualMachine(engine="threaded").run([Opcode.PUSH.value, 1, 99])
+
+
+def test_threaded_missing_operand():
+    """Test that a truncated instruction fails like the other engines."""
+    with pytest.raises(IndexError):
+        VirtualMachine(engine="threaded").run([Opcode.PUSH.value])
@@ -0,0 +1,149 @@
+import importlib.util
+
+import pytest
+from opcodes import Opcode
+from peephole import fuse
+from translator import (
+    TranslationError,
+    compile_program,
+    run,
+    stack_depths,
+    translate,
+    write_module,
+)
+from vm import VirtualMachine, VirtualMachineError
+
+LOOP = [
+    Opcode.PUSH.value,
+    0,
+    Opcode.DUP.value,
+    Opcode.PRINT.value,
+    Opcode.PUSH.value,
+    1,
+    Opcode.ADD.value,
+    Opcode.DUP.value,
+    Opcode.PUSH.value,
+    3,
+    Opcode.LT.value,
+    Opcode.JNZ.value,
+    2,
+    Opcode.PRINT.value,
+    Opcode.HALT.value,
+]
+
+SWAP_DIV = [
+    Opcode.PUSH.value,
+    4,
+    Opcode.PUSH.value,
+    84,
+    Opcode.SWAP.value,
+    Opcode.DIV.value,
+    Opcode.DUP.value,
+    Opcode.STORE.value,
+    3,
+    Opcode.PUSH.value,
+    21,
+    Opcode.EQ.value,
+    Opcode.JZ.value,
+    17,
+    Opcode.LOAD.value,
+    3,
+    Opcode.PRINT.value,
+    Opcode.PUSH.value,
+    7,
+    Opcode.HALT.value,
+]
+
+FACTORIAL = [
+    *(Opcode.PUSH.value, 6, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.LOAD.value, 1, Opcode.MUL.value),
+    *(Opcode.STORE.value, 1),
+    *(Opcode.LOAD.value, 0, Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.STORE.value, 0),
+    *(Opcode.PUSH.value, 1, Opcode.GE.value, Opcode.JNZ.value, 8),
+    *(Opcode.LOAD.value, 1, Opcode.PRINT.value, Opcode.HALT.value),
+]
+
+
+@pytest.mark.parametrize(
+    "bytecode", [LOOP, SWAP_DIV, FACTORIAL, fuse(FACTORIAL), fuse(LOOP)]
+)
+def test_translated_matches_interpreter(bytecode, capsys):
+    """Test that output, memory, stack and final pc match the VM."""
+    expected = VirtualMachine()
+    expected.run(bytecode)
+    expected_out = capsys.readouterr().out
+
+    vm = VirtualMachine()
+    assert run(vm, bytecode)
+    assert capsys.readouterr().out == expected_out
+    assert vm._memory == expected._memory
+    assert vm._pc == expected._pc
+    assert repr(vm._stack) == repr(expected._stack)
+
+
+def test_constants_are_folded():
+    """Test that PUSH k, SUB becomes a single statement on a local."""
+    source = translate(FACTORIAL)
+    assert "s0 = s0 - 1" in source
+    assert "memory[1] = s0" in source
+
+
+def test_compile_program_is_cached():
+    """Test that equal bytecode reuses the compiled function."""
+    assert compile_program(list(FACTORIAL)) is compile_program(list(FACTORIAL))
+
+
+def test_write_module(tmp_path, capsys):
+    """Test that the written module runs like the interpreter."""
+    path = tmp_path / "factorial_program.py"
+    write_module(FACTORIAL, path)
+    spec = importlib.util.spec_from_file_location("factorial_program", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    memory = [0] * 256
+    assert module.program(memory) == (31, [])
+    assert memory[1] == 720
+    assert capsys.readouterr().out == "720\n"
+
+
+def test_stack_depths():
+    """Test the depth before each reachable instruction of the loop."""
+    depths = stack_depths(LOOP)
+    assert depths[0] == 0
+    assert depths[2] == 1
+    assert depths[11] == 2
+    assert depths[14] == 0
+
+
+@pytest.mark.parametrize(
+    "bytecode",
+    [
+        [99, Opcode.HALT.value],
+        [Opcode.ADD.value, Opcode.HALT.value],
+        [Opcode.LOAD.value, 300, Opcode.HALT.value],
+        [Opcode.PUSH.value, 1],
+        [Opcode.JMP.value, 3, Opcode.PUSH.value, 0, Opcode.HALT.value],
+        # The loop pushes one extra value per iteration.
+        [Opcode.PUSH.value, 1, Opcode.DUP.value, Opcode.JNZ.value, 2],
+    ],
+)
+def test_untranslatable_programs(bytecode):
+    """Test that unstructured programs raise TranslationError."""
+    with pytest.raises(TranslationError):
+        translate(bytecode)
+
+
+def test_run_falls_back_to_interpreter(capsys):
+    """Test that run uses the VM when translation is not possible."""
+    # Stack depth at PRINT is 1 via the jump and 2 via the fall-through.
+    bytecode = [Opcode.PUSH.value, 1, Opcode.PUSH.value, 0, Opcode.JZ.value, 8]
+    bytecode += [Opcode.PUSH.value, 5, Opcode.PRINT.value, Opcode.HALT.value]
+    vm = VirtualMachine()
+    assert not run(vm, bytecode)
+    assert capsys.readouterr().out == "1\n"
+
+    with pytest.raises(VirtualMachineError):
+        run(VirtualMachine(), [Opcode.LOAD.value, 300, Opcode.HALT.value])
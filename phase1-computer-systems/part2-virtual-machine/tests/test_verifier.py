@@ -0,0 +1,121 @@
+import pytest
+from opcodes import Opcode
+from stack import EmptyStackError
+from unchecked import decode
+from verifier import VerificationError, verify
+from vm import ENGINES, VirtualMachine, VirtualMachineError
+
+# Counts 3 down to 1, printing each value.
+COUNTDOWN = [
+    *(Opcode.PUSH.value, 3),
+    *(Opcode.DUP.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 1, Opcode.SUB.value),
+    *(Opcode.DUP.value, Opcode.JNZ.value, 2),
+    Opcode.HALT.value,
+]
+
+
+def test_verify_returns_depths():
+    """Test that verify returns the stack depth before each instruction."""
+    depths = verify(COUNTDOWN)
+    assert depths == {0: 0, 2: 1, 3: 2, 4: 1, 6: 2, 7: 1, 8: 2, 10: 1}
+
+
+@pytest.mark.parametrize(
+    "bytecode",
+    [
+        pytest.param([99], id="unknown opcode"),
+        pytest.param([Opcode.PUSH.value], id="missing operand"),
+        pytest.param([Opcode.POP.value, Opcode.HALT.value], id="underflow"),
+        pytest.param(
+            [Opcode.PUSH.value, 1, Opcode.JMP.value, 1, Opcode.HALT.value],
+            id="jump into operand",
+        ),
+        pytest.param(
+            [Opcode.HALT.value, Opcode.JMP.value, 7], id="unreachable bad jump"
+        ),
+        pytest.param([Opcode.PUSH.value, 1, Opcode.PRINT.value], id="runs off end"),
+        pytest.param([Opcode.LOAD.value, 256, Opcode.HALT.value], id="bad address"),
+        pytest.param(
+            [
+                *(Opcode.PUSH.value, 1, Opcode.JZ.value, 6),
+                *(Opcode.PUSH.value, 2),
+                Opcode.HALT.value,
+            ],
+            id="inconsistent depth",
+        ),
+    ],
+)
+def test_verify_rejects(bytecode):
+    """Test that unsafe programs fail verification."""
+    with pytest.raises(VerificationError):
+        verify(bytecode)
+
+
+def test_verify_uses_memory_size():
+    """Test that addresses are checked against the given memory size."""
+    bytecode = [Opcode.LOAD.value, 10, Opcode.POP.value, Opcode.HALT.value]
+    assert verify(bytecode, memory_size=11)
+    with pytest.raises(VerificationError):
+        verify(bytecode, memory_size=10)
+
+
+def test_decode_returns_none_when_unverified():
+    """Test that the unchecked decoder refuses unverified programs."""
+    assert decode(COUNTDOWN) is not None
+    assert decode([Opcode.POP.value, Opcode.HALT.value]) is None
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_verified_run_matches_engine(engine, capsys):
+    """Test that verified programs print the same on the fast path."""
+    vm = VirtualMachine(engine=engine, verify=True)
+    vm.run(COUNTDOWN)
+    assert capsys.readouterr().out == "3\n2\n1\n"
+    assert vm._pc == len(COUNTDOWN) - 1
+    assert vm._stack._items == [0]
+
+
+def test_verified_program_skips_engine(capsys):
+    """Test that a verified program does not reach the checked engine."""
+    vm = VirtualMachine(verify=True)
+    vm._run_match = None
+    vm.run(COUNTDOWN)
+    assert capsys.readouterr().out == "3\n2\n1\n"
+
+
+def test_verified_program_updates_memory():
+    """Test that memory writes on the fast path land in the VM's memory."""
+    vm = VirtualMachine(memory_size=4, verify=True)
+    vm.run([Opcode.PUSH.value, 7, Opcode.STORE.value, 3, Opcode.HALT.value])
+    assert vm._memory == [0, 0, 0, 7]
+
+
+def test_unverified_program_keeps_checks():
+    """Test that programs failing verification raise the usual errors."""
+    vm = VirtualMachine(memory_size=4, verify=True)
+    with pytest.raises(VirtualMachineError, match="Invalid memory address"):
+        vm.run([Opcode.LOAD.value, 4, Opcode.HALT.value])
+    vm = VirtualMachine(verify=True)
+    with pytest.raises(EmptyStackError):
+        vm.run([Opcode.POP.value, Opcode.HALT.value])
+
+
+def test_non_fresh_vm_uses_checked_engine(capsys):
+    """Test that a VM with values already on its stack is not fast-pathed."""
+    vm = VirtualMachine(verify=True)
+    vm._stack.push(5)
+    vm.run([Opcode.PRINT.value, Opcode.HALT.value])
+    assert capsys.readouterr().out == "5\n"
+
+
+def test_division_by_zero_still_raises():
+    """Test that runtime-only errors are still raised on the fast path."""
+    vm = VirtualMachine(verify=True)
+    with pytest.raises(ZeroDivisionError):
+        vm.run(
+            [
+                *(Opcode.PUSH.value, 1, Opcode.PUSH.value, 0),
+                *(Opcode.DIV.value, Opcode.HALT.value),
+            ]
+        )
@@ -1,11 +1,13 @@
 import pytest
 from opcodes import Opcode
-from vm import VirtualMachine, VirtualMachineError
+from sinks import ListSink
+from stack import ArrayStack, StackOverflowError
+from vm import ENGINES, VirtualMachine, VirtualMachineError
 
 
-@pytest.fixture
-def vm():
-    return VirtualMachine()
+@pytest.fixture(params=ENGINES)
+def vm(request):
+    return VirtualMachine(engine=request.param)
 
 
 def test_vm_initialization(vm):
@@ -379,3 +381,110 @@ def test_vm_invalid_memory_address_store(vm):
     ]
     with pytest.raises(VirtualMachineError):
         vm.run(bytecode)
+
+
+def test_vm_negative_opcode(vm):
+    """Test VM rejects negative opcodes instead of indexing from the end."""
+    bytecode = [-1, Opcode.HALT.value]
+    with pytest.raises(VirtualMachineError, match="Invalid opcode at pc 0: -1"):
+        vm.run(bytecode)
+
+
+def test_vm_unknown_engine():
+    """Test VM rejects an unknown engine name."""
+    with pytest.raises(ValueError):
+        VirtualMachine(engine="turbo")
+
+
+def test_vm_budget_pauses_and_resumes(vm, capsys):
+    """Test that a budgeted run pauses and resumes where it stopped."""
+    bytecode = [
+        *(Opcode.PUSH.value, 1, Opcode.PRINT.value),
+        *(Opcode.PUSH.value, 2, Opcode.PRINT.value),
+        Opcode.HALT.value,
+    ]
+    state = vm.run(bytecode, budget=3)
+    assert not state.halted
+    assert state.steps == 3
+    assert vm._pc == 5
+    assert capsys.readouterr().out == "1\n"
+
+    state = state.resume(10)
+    assert state.halted
+    assert state.steps == 1
+    assert capsys.readouterr().out == "2\n"
+
+
+def test_vm_budget_stopping_before_halt(vm):
+    """Test that a run ending just before HALT halts on the next run."""
+    bytecode = [Opcode.PUSH.value, 1, Opcode.HALT.value]
+    assert not vm.run(bytecode, budget=1).halted
+    state = vm.run(bytecode, budget=1)
+    assert state.halted
+    assert state.steps == 0
+
+
+def test_vm_budget_must_be_positive(vm):
+    """Test that a budget below one is rejected."""
+    with pytest.raises(ValueError):
+        vm.run([Opcode.HALT.value], budget=0)
+
+
+def test_vm_without_budget_returns_none(vm):
+    """Test that plain runs keep returning None."""
+    assert vm.run([Opcode.HALT.value]) is None
+
+
+# Prints 7 - 2, 7 // 2, 2 < 7 and 7 > 2 == 1, using every stack shape.
+ARITHMETIC = [
+    *(Opcode.PUSH.value, 7, Opcode.PUSH.value, 2, Opcode.SUB.value),
+    Opcode.PRINT.value,
+    *(Opcode.PUSH.value, 7, Opcode.PUSH.value, 2, Opcode.DIV.value),
+    Opcode.PRINT.value,
+    *(Opcode.PUSH.value, 7, Opcode.PUSH.value, 2, Opcode.SWAP.value),
+    *(Opcode.LT.value, Opcode.PRINT.value),
+    *(Opcode.PUSH.value, 7, Opcode.PUSH.value, 2, Opcode.GT.value),
+    *(Opcode.PUSH.value, 1, Opcode.EQ.value, Opcode.PRINT.value),
+    Opcode.HALT.value,
+]
+
+
+@pytest.mark.parametrize("engine", ["match", "table", "threaded"])
+@pytest.mark.parametrize("options", [{}, {"verify": True}, {"profile": True}])
+def test_vm_array_stack(engine, options):
+    """Test that engines give the same results on a fixed-capacity stack."""
+    vm = VirtualMachine(engine=engine, output=ListSink(), stack_capacity=8, **options)
+    assert isinstance(vm._stack, ArrayStack)
+    vm.run(ARITHMETIC)
+    assert vm.output.values == [5, 3, 1, 1]
+
+
+def test_vm_array_stack_overflow():
+    """Test that a program pushing past the capacity raises."""
+    vm = VirtualMachine(stack_capacity=4)
+    with pytest.raises(StackOverflowError):
+        vm.run([Opcode.PUSH.value, 1, Opcode.JMP.value, 0])
+
+
+def test_vm_array_stack_holds_int64():
+    """Test that values outside int64 raise rather than wrap."""
+    vm = VirtualMachine(stack_capacity=4)
+    with pytest.raises(OverflowError):
+        vm.run([Opcode.PUSH.value, 1 << 63, Opcode.HALT.value])
+
+
+def test_vm_array_stack_fork_and_reset():
+    """Test that forks keep the capacity and reset keeps the storage."""
+    vm = VirtualMachine(stack_capacity=4)
+    vm.run([Opcode.PUSH.value, 1, Opcode.PUSH.value, 2, 0], budget=2)
+    child = vm.fork()
+    assert child._stack.capacity == 4 and list(child._stack) == [1, 2]
+    stack = vm._stack
+    vm.reset()
+    assert vm._stack is stack and stack.is_empty()
+
+
+def test_vm_jit_needs_list_stack():
+    """Test that the JIT engine rejects a fixed-capacity stack."""
+    with pytest.raises(ValueError):
+        VirtualMachine(engine="jit", stack_capacity=8)
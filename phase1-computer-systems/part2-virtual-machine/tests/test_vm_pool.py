@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+from memory import SparseMemory, dense
+from opcodes import Opcode
+from sinks import ListSink
+from vm import VirtualMachine
+from vm_pool import PoolTimeout, VMPool
+
+# Stores 7 at memory[3] and leaves 7 on the stack.
+PROGRAM = [
+    *(Opcode.PUSH.value, 7, Opcode.DUP.value, Opcode.STORE.value, 3),
+    Opcode.HALT.value,
+]
+
+
+@pytest.mark.parametrize(
+    "memory", [None, dense(8), SparseMemory(8)], ids=["list", "dense", "sparse"]
+)
+def test_reset_clears_state_in_place(memory):
+    """Test that reset zeroes pc, stack and memory without replacing them."""
+    vm = VirtualMachine(memory_size=8, memory=memory)
+    vm.run(PROGRAM)
+    stack, cells = vm._stack, vm._memory
+    vm.reset()
+    assert vm._pc == 0
+    assert vm._stack is stack and stack.is_empty()
+    assert vm._memory is cells and list(cells[0:8]) == [0] * 8
+
+
+def test_reset_vm_runs_again():
+    """Test that a reset VM runs a program as a fresh one would."""
+    vm = VirtualMachine(output=ListSink())
+    vm.run([Opcode.PUSH.value, 1, Opcode.PRINT.value, Opcode.HALT.value])
+    vm.reset()
+    vm.run([Opcode.PUSH.value, 2, Opcode.PRINT.value, Opcode.HALT.value])
+    assert vm.output.values == [1, 2]
+
+
+def test_pool_reuses_vms():
+    """Test that checked-in VMs are reset and handed out again."""
+    pool = VMPool(size=2)
+    for _ in range(10):
+        with pool.vm() as vm:
+            assert vm._memory[3] == 0 and vm._stack.is_empty()
+            vm.run(PROGRAM)
+    metrics = pool.metrics()
+    assert metrics.checkouts == 10
+    assert metrics.idle == 2
+    assert metrics.reuse_rate == 0.9
+    assert "reuse 90.0%" in metrics.format()
+
+
+def test_pool_memory_layout():
+    """Test that the pool builds each VM's memory with the given factory."""
+    pool = VMPool(size=2, memory=lambda: dense(16), engine="threaded")
+    first, second = pool.checkout(), pool.checkout()
+    assert len(first._memory) == 16 and first._memory is not second._memory
+    assert first._engine == "threaded"
+
+
+def test_pool_checkout_timeout():
+    """Test that checkout gives up when every VM stays in use."""
+    pool = VMPool(size=1)
+    pool.checkout()
+    with pytest.raises(PoolTimeout):
+        pool.checkout(timeout=0.01)
+
+
+def test_pool_is_thread_safe():
+    """Test that threads sharing a small pool never see each other's state."""
+    pool = VMPool(size=2)
+    errors = []
+
+    def worker(value):
+        for _ in range(200):
+            with pool.vm() as vm:
+                vm.run([Opcode.PUSH.value, value, Opcode.STORE.value, 0, 0])
+                if vm._memory[0] != value or not vm._stack.is_empty():
+                    errors.append(value)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert pool.metrics().checkouts == 1600
+
+
+def test_pool_size_must_be_positive():
+    """Test that an empty pool is rejected."""
+    with pytest.raises(ValueError):
+        VMPool(size=0)